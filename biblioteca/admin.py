@@ -0,0 +1,256 @@
+# biblioteca/admin.py
+"""
+Admin da biblioteca, para consultas e correções em massa da equipe.
+
+Feito para tabelas grandes (10^6 empréstimos):
+- list_select_related: o __str__ de Emprestimo usa livro e leitor, e sem
+  ele a listagem faria duas consultas a mais por linha.
+- A busca usa as mesmas rotinas do sistema (busca.py): prefixo nas colunas
+  normalizadas e indexadas de Leitor/Funcionario e FTS para Livro, no lugar
+  do icontains do admin padrão, que varre a tabela inteira. search_fields
+  continua declarado porque o autocomplete exige.
+- show_full_result_count=False: ao filtrar, não roda o COUNT(*) da tabela
+  inteira só para mostrar "N de M".
+- Ordenações cobertas pelos índices (nome, id) e (data_emprestimo, id).
+- A hierarquia de datas monta anos/meses/dias a partir da primeira e da
+  última data (duas buscas no índice) em vez do SELECT DISTINCT
+  date_trunc(...) do admin, que lê todas as linhas (segundos com 10^6).
+  Meses ou dias sem empréstimo aparecem no menu e levam a uma lista vazia.
+- Ações em massa com UPDATEs únicos (emprestimos.devolver_consulta), que
+  também acertam livros, painel e cache do acervo.
+
+Status de livros e empréstimos não é editado à mão aqui: muda só pelas
+operações de emprestimos.py, que mantêm os dois em sincronia.
+
+Empréstimos arquivados (archive_emprestimos) são só para consulta.
+"""
+import datetime
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from . import emprestimos
+from .busca import buscar_pessoas, ids_livros
+from .models import Emprestimo, EmprestimoArquivado, Funcionario, Leitor, Livro
+
+
+class PessoaAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'cpf', 'email', 'telefone')
+    ordering = ('nome', 'id')
+    search_fields = ('nome_normalizado',)
+    search_help_text = "Início do nome, CPF ou e-mail."
+    show_full_result_count = False
+    readonly_fields = ('data_criacao', 'data_atualizacao')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return buscar_pessoas(queryset, search_term), False
+
+
+@admin.register(Leitor)
+class LeitorAdmin(PessoaAdmin):
+    list_display = PessoaAdmin.list_display + ('emprestimos_ativos',)
+    readonly_fields = ('emprestimos_ativos',) + PessoaAdmin.readonly_fields
+
+
+@admin.register(Funcionario)
+class FuncionarioAdmin(PessoaAdmin):
+    # A senha ainda é guardada em texto puro e o login do sistema aceitaria
+    # uma senha vazia: funcionários são criados e têm a senha trocada só
+    # pelo cadastro do próprio sistema
+    exclude = ('senha',)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Livro)
+class LivroAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'autor', 'isbn', 'genero', 'status')
+    list_filter = ('status',)
+    ordering = ('nome', 'id')
+    search_fields = ('nome', 'autor', 'isbn')
+    search_help_text = "Título, autor ou ISBN."
+    show_full_result_count = False
+    readonly_fields = ('status', 'emprestimo_atual', 'data_criacao', 'data_atualizacao')
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term.strip():
+            # pk IN (subconsulta do FTS), e não o join de buscar_livros: com o
+            # filtro de status o SQLite partiria do índice de status e
+            # refaria o MATCH para cada livro. A ordem é a do admin (nome).
+            queryset = queryset.filter(pk__in=ids_livros(queryset, search_term))
+        if request.GET.get('model_name') == 'emprestimo' and request.GET.get('field_name') == 'livro':
+            # Autocomplete do novo empréstimo: só oferece livros disponíveis
+            queryset = queryset.filter(status='disponivel')
+        return queryset, False
+
+
+class _DatasPorCalendario:
+    """
+    Faz o papel de cl.queryset para a tag {% date_hierarchy %} do admin, que
+    só chama aggregate(first=Min, last=Max) e dates(campo, tipo).
+    """
+
+    def __init__(self, queryset, campo):
+        self.queryset = queryset
+        self.campo = campo
+
+    @cached_property
+    def limites(self):
+        # ORDER BY campo LIMIT 1 nos dois sentidos: o MIN e o MAX juntos
+        # numa consulta só não aproveitam o índice no SQLite
+        datas = self.queryset.values_list(self.campo, flat=True)
+        return datas.order_by(self.campo).first(), datas.order_by(f'-{self.campo}').first()
+
+    def aggregate(self, **kwargs):
+        primeira, ultima = self.limites
+        return {'first': primeira, 'last': ultima}
+
+    def dates(self, campo, tipo):
+        primeira, ultima = self.limites
+        if primeira is None:
+            return []
+        if tipo == 'year':
+            return [datetime.date(ano, 1, 1) for ano in range(primeira.year, ultima.year + 1)]
+        if tipo == 'month':
+            return [
+                datetime.date(ano, mes, 1)
+                for ano in range(primeira.year, ultima.year + 1)
+                for mes in range(1, 13)
+                if (primeira.year, primeira.month) <= (ano, mes) <= (ultima.year, ultima.month)
+            ]
+        return [primeira + datetime.timedelta(days=dias) for dias in range((ultima - primeira).days + 1)]
+
+
+class _ListaComCalendario:
+    """O próprio ChangeList, mas com o queryset trocado por _DatasPorCalendario."""
+
+    def __init__(self, changelist):
+        self.changelist = changelist
+        self.queryset = _DatasPorCalendario(changelist.queryset, changelist.date_hierarchy)
+
+    def __getattr__(self, nome):
+        return getattr(self.changelist, nome)
+
+
+class EmprestimoChangeList(ChangeList):
+
+    @cached_property
+    def hierarquia_datas(self):
+        # Usado por templates/admin/biblioteca/emprestimo/change_list.html
+        return _ListaComCalendario(self)
+
+
+class EmprestimoAdminForm(forms.ModelForm):
+
+    def clean_livro(self):
+        livro = self.cleaned_data['livro']
+        if self.instance.pk is None and livro.status != 'disponivel':
+            raise forms.ValidationError("Este livro não está disponível.")
+        return livro
+
+    def clean_leitor(self):
+        leitor = self.cleaned_data['leitor']
+        if self.instance.pk is None and not emprestimos.pode_emprestar(leitor):
+            raise forms.ValidationError(emprestimos.mensagem_limite(leitor))
+        return leitor
+
+
+@admin.register(Emprestimo)
+class EmprestimoAdmin(admin.ModelAdmin):
+    form = EmprestimoAdminForm
+    list_display = (
+        'livro', 'leitor', 'funcionario', 'data_emprestimo',
+        'data_devolucao_prevista', 'data_devolucao_real', 'status',
+    )
+    list_select_related = ('livro', 'leitor', 'funcionario')
+    list_filter = ('status',)
+    date_hierarchy = 'data_emprestimo'
+    ordering = ('-data_emprestimo', '-id')
+    autocomplete_fields = ('livro', 'leitor', 'funcionario')
+    search_fields = ('livro__nome', 'leitor__nome_normalizado')
+    search_help_text = "Título, autor ou ISBN do livro; nome, CPF ou e-mail do leitor."
+    show_full_result_count = False
+    actions = ['marcar_devolvidos']
+
+    def get_changelist(self, request, **kwargs):
+        return EmprestimoChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        leitores = buscar_pessoas(Leitor.objects.all(), search_term)
+        # Duas subconsultas pequenas, atendidas pelos índices de livro_id e leitor_id
+        filtro = Q(livro__in=ids_livros(Livro.objects.all(), search_term)) | Q(leitor__in=leitores.values('pk'))
+        return queryset.filter(filtro), False
+
+    def get_fields(self, request, obj=None):
+        if obj is None:
+            # O empréstimo novo passa por emprestimos.emprestar: datas e
+            # status são os do balcão
+            return ('livro', 'leitor', 'funcionario')
+        return super().get_fields(request, obj)
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            return ()
+        # O leitor também: mudá-lo desacertaria o emprestimos_ativos dos dois
+        return ('livro', 'leitor', 'status', 'data_devolucao_real', 'data_criacao', 'data_atualizacao')
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            super().save_model(request, obj, form, change)
+            return
+        # clean_livro já recusou livros indisponíveis; se outro balcão levar o
+        # livro entre a validação e aqui, o erro desfaz a transação do admin
+        criado = emprestimos.emprestar(obj.livro, obj.leitor, obj.funcionario)
+        for campo in Emprestimo._meta.concrete_fields:
+            setattr(obj, campo.attname, getattr(criado, campo.attname))
+        obj._state.adding = False
+
+    def delete_model(self, request, obj):
+        emprestimos.excluir(obj)
+
+    def delete_queryset(self, request, queryset):
+        emprestimos.excluir_consulta(queryset)
+
+    @admin.action(description="Marcar como devolvidos")
+    def marcar_devolvidos(self, request, queryset):
+        try:
+            devolvidos = emprestimos.devolver_consulta(queryset)
+        except emprestimos.ErroEmprestimo as erro:
+            self.message_user(request, str(erro), messages.ERROR)
+            return
+        self.message_user(request, f"{devolvidos} empréstimo(s) devolvido(s); os já devolvidos foram ignorados.")
+
+
+@admin.register(EmprestimoArquivado)
+class EmprestimoArquivadoAdmin(admin.ModelAdmin):
+    list_display = (
+        'livro', 'leitor', 'funcionario', 'data_emprestimo',
+        'data_devolucao_prevista', 'data_devolucao_real', 'data_arquivamento',
+    )
+    list_select_related = ('livro', 'leitor', 'funcionario')
+    date_hierarchy = 'data_emprestimo'
+    ordering = ('-data_emprestimo', '-id')
+    search_fields = EmprestimoAdmin.search_fields
+    search_help_text = EmprestimoAdmin.search_help_text
+    show_full_result_count = False
+    get_search_results = EmprestimoAdmin.get_search_results
+
+    def get_changelist(self, request, **kwargs):
+        return EmprestimoChangeList
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
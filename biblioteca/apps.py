@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class BibliotecaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'biblioteca'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (registra os contadores do painel)
+        from .busca import garantir_triggers_fts
+
+        post_migrate.connect(garantir_triggers_fts, sender=self)
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biblioteca.settings')
+# Liga as views assíncronas do acervo (ver BIBLIOTECA_ASGI em settings.py)
+os.environ.setdefault('BIBLIOTECA_ASGI', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,306 @@
+# biblioteca/busca.py
+"""
+Busca textual de livros.
+
+No SQLite usamos a tabela virtual FTS5 `biblioteca_livro_fts` (criada pela
+migração 0006), que espelha nome, autor, isbn e gênero de cada Livro e é
+mantida por triggers a cada INSERT, UPDATE e DELETE. O tokenizador remove
+acentos, então "Jose Saramago" encontra "José Saramago", e cada termo é
+buscado por prefixo ("sara" encontra "Saramago"). Os resultados vêm
+ordenados por relevância (BM25).
+
+No PostgreSQL a busca usa o índice GIN sobre o tsvector de nome, autor,
+isbn e gênero criado pela migração 0012, com a configuração de texto
+`biblioteca_busca` (sem acentos quando a extensão unaccent existe). Os
+termos também são prefixos e a ordem é a do ts_rank.
+
+Sem nenhum dos dois (outro banco, SQLite sem FTS5 ou Postgres sem a
+migração), caímos no filtro antigo com `icontains`.
+
+Leitores e funcionários são buscados pelas colunas normalizadas
+(`nome_normalizado`, `cpf_normalizado`, `email_normalizado`), sempre por
+igualdade ou prefixo, para que a consulta use o índice. No Postgres com
+pg_trgm o nome é buscado em qualquer posição (índice GIN de trigramas).
+"""
+import re
+import unicodedata
+
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+TABELA_FTS = 'biblioteca_livro_fts'
+
+# Pesos do BM25 na ordem das colunas: nome, autor, isbn, genero
+PESOS_BM25 = (10.0, 5.0, 2.0, 1.0)
+
+# Configuração de texto criada pela migração 0012 e o vetor indexado por ela.
+# O planejador só usa o índice GIN se a expressão da consulta for idêntica à
+# do índice, por isso as duas precisam andar juntas.
+CONFIG_PG = 'biblioteca_busca'
+VETOR_LIVRO_PG = (
+    "setweight(to_tsvector('biblioteca_busca'::regconfig, biblioteca_livro.nome), 'A') || "
+    "setweight(to_tsvector('biblioteca_busca'::regconfig, biblioteca_livro.autor), 'B') || "
+    "setweight(to_tsvector('biblioteca_busca'::regconfig, replace(biblioteca_livro.isbn, '-', '')), 'C') || "
+    "setweight(to_tsvector('biblioteca_busca'::regconfig, coalesce(biblioteca_livro.genero, '')), 'D')"
+)
+
+# Abaixo disso o índice de trigramas não ajuda (cada trigrama casa com quase tudo)
+MINIMO_TRIGRAMA = 3
+
+_TERMO = re.compile(r'\w+', re.UNICODE)
+_PALAVRA_PG = re.compile(r'[^\W_]+', re.UNICODE)
+_ISBN = re.compile(r'^[\d\s-]+[\dXx]?$')
+
+_motor = None
+_trigrama_disponivel = None
+
+
+def normalizar_texto(valor):
+    """Minúsculas, sem acentos e com espaços simples: 'José  Saramago' -> 'jose saramago'."""
+    if not valor:
+        return ''
+    decomposto = unicodedata.normalize('NFKD', str(valor))
+    sem_acentos = ''.join(ch for ch in decomposto if not unicodedata.combining(ch))
+    return ' '.join(sem_acentos.lower().split())
+
+
+def somente_digitos(valor):
+    """Remove pontuação de CPF/telefone: '123.456.789-00' -> '12345678900'."""
+    return re.sub(r'\D', '', valor or '')
+
+
+def filtro_prefixo(campo, prefixo):
+    """
+    Prefixo como intervalo (campo >= 'abc' AND campo < 'abc' + U+FFFF). Ao
+    contrário de LIKE 'abc%', usa o índice em qualquer banco, já que a coluna
+    normalizada dispensa comparação sem diferenciar maiúsculas.
+    """
+    return Q(**{f'{campo}__gte': prefixo, f'{campo}__lt': prefixo + '\uffff'})
+
+
+def buscar_pessoas(queryset, termo):
+    """
+    Busca de Leitor ou Funcionario pelo tipo do termo digitado:
+    - só dígitos e pontuação de CPF -> CPF exato (11 dígitos) ou por prefixo
+    - contém '@'                    -> e-mail por prefixo
+    - qualquer outra coisa          -> nome (sem acentos) por prefixo
+    """
+    termo = (termo or '').strip()
+    if re.fullmatch(r'[\d.\-/\s]+', termo):
+        digitos = somente_digitos(termo)
+        if len(digitos) == 11:
+            return queryset.filter(cpf_normalizado=digitos)
+        return queryset.filter(filtro_prefixo('cpf_normalizado', digitos))
+    if '@' in termo:
+        return queryset.filter(filtro_prefixo('email_normalizado', termo.lower()))
+    nome = normalizar_texto(termo)
+    if len(nome) >= MINIMO_TRIGRAMA and trigrama_disponivel():
+        # LIKE '%nome%', atendido pelo índice gin_trgm_ops da migração 0012
+        return queryset.filter(nome_normalizado__contains=nome)
+    return queryset.filter(filtro_prefixo('nome_normalizado', nome))
+
+
+def motor_busca():
+    """
+    Verifica (uma vez por processo) qual busca de livros o banco oferece:
+    'fts5' (SQLite com a tabela FTS), 'postgres' (configuração da migração
+    0012) ou None (icontains).
+    """
+    global _motor
+    if _motor is None:
+        _motor = ''
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                if TABELA_FTS in connection.introspection.table_names(cursor):
+                    _motor = 'fts5'
+        elif connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1 FROM pg_ts_config WHERE cfgname = %s', [CONFIG_PG])
+                if cursor.fetchone():
+                    _motor = 'postgres'
+    return _motor or None
+
+
+def fts_disponivel():
+    """Verifica (uma vez por processo) se a tabela FTS5 existe no banco."""
+    return motor_busca() == 'fts5'
+
+
+def trigrama_disponivel():
+    """Verifica (uma vez por processo) se o Postgres tem a extensão pg_trgm."""
+    global _trigrama_disponivel
+    if _trigrama_disponivel is None:
+        _trigrama_disponivel = False
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                _trigrama_disponivel = cursor.fetchone() is not None
+    return _trigrama_disponivel
+
+
+def expressao_fts(termo):
+    """
+    Converte o texto digitado numa expressão MATCH segura. Cada palavra vira
+    um prefixo entre aspas ("jose"* "sara"*), o que também neutraliza a
+    sintaxe do FTS5 (AND, OR, NEAR, aspas soltas...). Termos com cara de
+    ISBN são comparados sem hífens contra a coluna isbn.
+    """
+    termo = (termo or '').strip()
+    palavras = ' '.join(f'"{palavra}"*' for palavra in _TERMO.findall(termo))
+    if palavras and _ISBN.match(termo):
+        # Pode ser um ISBN ou um título numérico ("1984"): busca os dois
+        digitos = re.sub(r'[^\dXx]', '', termo)
+        return f'(isbn : "{digitos}"*) OR ({palavras})'
+    return palavras
+
+
+def expressao_tsquery(termo):
+    """
+    Equivalente de expressao_fts para o to_tsquery do Postgres: cada palavra
+    vira um prefixo ('jose':* & 'sara':*). Só passam letras e dígitos, então
+    os operadores do tsquery (& | ! <-> parênteses) não chegam à consulta.
+    """
+    termo = (termo or '').strip()
+    palavras = ' & '.join(f"'{palavra}':*" for palavra in _PALAVRA_PG.findall(termo))
+    if palavras and _ISBN.match(termo):
+        digitos = re.sub(r'[^\dXx]', '', termo)
+        return f"'{digitos}':* | ({palavras})"
+    return palavras
+
+
+def filtro_icontains(termo, campos=('nome', 'autor', 'isbn')):
+    filtro = Q()
+    for campo in campos:
+        filtro |= Q(**{f'{campo}__icontains': termo})
+    return filtro
+
+
+def buscar_livros(queryset, termo, campos_fallback=('nome', 'autor', 'isbn')):
+    """
+    Filtra `queryset` (de Livro) pelo termo de busca.
+
+    Retorna `(queryset, ordenacao)`: com FTS5 ou Postgres o queryset vem
+    anotado com `relevancia` (BM25 ou -ts_rank, menor é melhor) e a ordenação
+    é ('relevancia', 'id'); no fallback continua sendo ('nome', 'id').
+    """
+    return _aplicar_busca(queryset, termo, campos_fallback, motor_busca())
+
+
+async def abuscar_livros(queryset, termo, campos_fallback=('nome', 'autor', 'isbn')):
+    """
+    Versão para views assíncronas. Só a checagem do motor de busca (feita uma
+    vez por processo) toca o banco; o queryset devolvido é avaliado pelo
+    chamador com o ORM assíncrono.
+    """
+    if _motor is None:
+        await sync_to_async(motor_busca)()
+    return _aplicar_busca(queryset, termo, campos_fallback, motor_busca())
+
+
+def _aplicar_busca(queryset, termo, campos_fallback, motor):
+    if motor == 'postgres':
+        return _aplicar_busca_postgres(queryset, termo, campos_fallback)
+    expressao = expressao_fts(termo)
+    if not expressao or motor != 'fts5':
+        return queryset.filter(filtro_icontains(termo, campos_fallback)), ('nome', 'id')
+
+    pesos = ', '.join(str(peso) for peso in PESOS_BM25)
+    tabela = queryset.model._meta.db_table
+    # Junta a tabela FTS na própria consulta (um único MATCH) em vez de uma
+    # subconsulta correlacionada por livro: com termos comuns, que casam com
+    # milhares de livros, a subconsulta refazia o MATCH para cada linha.
+    queryset = queryset.extra(
+        tables=[TABELA_FTS],
+        where=[f'{TABELA_FTS}.rowid = {tabela}.id', f'{TABELA_FTS} MATCH %s'],
+        params=[expressao],
+    ).annotate(relevancia=RawSQL(f'bm25({TABELA_FTS}, {pesos})', ()))
+    return queryset, ('relevancia', 'id')
+
+
+def _aplicar_busca_postgres(queryset, termo, campos_fallback):
+    expressao = expressao_tsquery(termo)
+    if not expressao:
+        return queryset.filter(filtro_icontains(termo, campos_fallback)), ('nome', 'id')
+    consulta = f"to_tsquery('{CONFIG_PG}'::regconfig, %s)"
+    # ts_rank pesa A (nome) > B (autor) > C (isbn) > D (gênero); o sinal fica
+    # negativo para a ordenação crescente valer nos dois bancos
+    queryset = queryset.extra(
+        where=[f'({VETOR_LIVRO_PG}) @@ {consulta}'],
+        params=[expressao],
+    ).annotate(relevancia=RawSQL(f'-ts_rank({VETOR_LIVRO_PG}, {consulta})', (expressao,)))
+    return queryset, ('relevancia', 'id')
+
+
+def ids_livros(queryset, termo):
+    """
+    IDs dos livros que casam com `termo`, para usar dentro de outra consulta
+    (ex: Emprestimo.objects.filter(livro__in=ids_livros(...))). Ao contrário
+    de buscar_livros, a subconsulta não depende do nome da tabela de fora,
+    que o Django troca por um apelido (U0) quando a consulta vira subconsulta.
+    """
+    motor = motor_busca()
+    if motor == 'fts5':
+        expressao = expressao_fts(termo)
+        if expressao:
+            return RawSQL(f'SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s', (expressao,))
+    elif motor == 'postgres':
+        expressao = expressao_tsquery(termo)
+        if expressao:
+            tabela = queryset.model._meta.db_table
+            return RawSQL(
+                f"SELECT id FROM {tabela} WHERE ({VETOR_LIVRO_PG}) @@ to_tsquery('{CONFIG_PG}'::regconfig, %s)",
+                (expressao,),
+            )
+    return queryset.filter(filtro_icontains(termo)).values('pk')
+
+
+# Triggers que mantêm a tabela FTS em dia. São os mesmos da migração 0006;
+# ficam aqui também porque o SQLite descarta os triggers quando uma migração
+# recria a tabela biblioteca_livro (ALTER de colunas), então eles são
+# recriados depois de cada `migrate` (ver BibliotecaConfig.ready).
+TRIGGERS_FTS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS biblioteca_livro_fts_ai AFTER INSERT ON biblioteca_livro BEGIN
+        INSERT INTO biblioteca_livro_fts(rowid, nome, autor, isbn, genero)
+        VALUES (new.id, new.nome, new.autor, replace(new.isbn, '-', ''), coalesce(new.genero, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS biblioteca_livro_fts_ad AFTER DELETE ON biblioteca_livro BEGIN
+        DELETE FROM biblioteca_livro_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS biblioteca_livro_fts_au
+    AFTER UPDATE OF nome, autor, isbn, genero ON biblioteca_livro BEGIN
+        DELETE FROM biblioteca_livro_fts WHERE rowid = old.id;
+        INSERT INTO biblioteca_livro_fts(rowid, nome, autor, isbn, genero)
+        VALUES (new.id, new.nome, new.autor, replace(new.isbn, '-', ''), coalesce(new.genero, ''));
+    END
+    """,
+]
+
+
+def garantir_triggers_fts(using='default', **kwargs):
+    """Recria os triggers da FTS caso tenham sido perdidos. Usado no post_migrate."""
+    conexao = connections[using]
+    if conexao.vendor != 'sqlite':
+        return
+    with conexao.cursor() as cursor:
+        if TABELA_FTS not in conexao.introspection.table_names(cursor):
+            return
+        for sql in TRIGGERS_FTS:
+            cursor.execute(sql)
+
+
+def reconstruir_indice_fts(using='default'):
+    """Apaga e repovoa a tabela FTS a partir de biblioteca_livro."""
+    conexao = connections[using]
+    with conexao.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA_FTS}')
+        cursor.execute(
+            f"INSERT INTO {TABELA_FTS}(rowid, nome, autor, isbn, genero) "
+            f"SELECT id, nome, autor, replace(isbn, '-', ''), coalesce(genero, '') FROM biblioteca_livro"
+        )
@@ -0,0 +1,197 @@
+# biblioteca/cache_acervo.py
+"""
+Cache da página pública do acervo (/acervo/).
+
+A página só depende do catálogo de livros e dos parâmetros da URL, então
+guardamos o HTML renderizado com uma chave que inclui a "versão do
+catálogo". Qualquer save/delete de Livro incrementa a versão (ver
+signals.py), o que torna todas as entradas antigas inalcançáveis sem precisar
+apagá-las: elas expiram sozinhas pelo timeout.
+
+A mesma versão alimenta o ETag, e a data da última alteração o
+Last-Modified, para que o navegador/crawler que já tem a página receba um
+304 sem nada ser renderizado. Funciona com o cache em memória local ou em
+arquivo (ver CACHES em settings.py); num servidor com vários processos use o
+FileBasedCache para que todos enxerguem a mesma versão.
+
+Visitantes com mensagens pendentes (django.contrib.messages, ex: o aviso
+de "você foi desconectado") não passam pelo cache, nem para ler nem para
+gravar: a mensagem é só deles e sai no HTML pelo base.html. A assinatura
+também muda nesse caso, para um 304 não esconder a mensagem.
+
+O decorator aceita tanto a view síncrona quanto a `async def` usada no modo
+ASGI. As chamadas ao cache continuam síncronas nos dois casos: com o cache
+em memória ou em arquivo elas não bloqueiam de forma relevante, e os
+métodos assíncronos do backend (aget/aset) apenas as repassariam para a
+thread do sync_to_async.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.db.models import Max
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+
+from .busca import normalizar_texto
+from .models import Livro
+
+CHAVE_VERSAO = 'acervo:versao'
+CHAVE_MODIFICADO = 'acervo:modificado'
+PARAMETROS = ('q', 'depois', 'antes', 'tamanho')
+
+
+def _cache():
+    return caches[getattr(settings, 'ACERVO_CACHE_ALIAS', 'default')]
+
+
+def versao_catalogo():
+    cache = _cache()
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        # Começa num valor derivado do relógio para não reaproveitar, depois
+        # de um restart, versões que ainda estejam num cache em arquivo
+        cache.add(CHAVE_VERSAO, int(time.time() * 1000), timeout=None)
+        versao = cache.get(CHAVE_VERSAO)
+    return versao
+
+
+def ultima_modificacao():
+    """Data da última alteração do catálogo (inclui exclusões)."""
+    cache = _cache()
+    modificado = cache.get(CHAVE_MODIFICADO)
+    if modificado is None:
+        modificado = Livro.objects.aggregate(ultima=Max('data_atualizacao'))['ultima']
+        modificado = modificado or datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+        cache.add(CHAVE_MODIFICADO, modificado, timeout=None)
+    return modificado
+
+
+async def aultima_modificacao():
+    """Versão assíncrona de ultima_modificacao (a consulta usa o ORM assíncrono)."""
+    modificado = _cache().get(CHAVE_MODIFICADO)
+    if modificado is None:
+        modificado = (await Livro.objects.aaggregate(ultima=Max('data_atualizacao')))['ultima']
+        modificado = modificado or datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+        _cache().add(CHAVE_MODIFICADO, modificado, timeout=None)
+    return modificado
+
+
+def invalidar(modificado=None):
+    """Chamado quando um Livro é criado, alterado ou excluído."""
+    cache = _cache()
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        cache.set(CHAVE_VERSAO, int(time.time() * 1000), timeout=None)
+    cache.set(CHAVE_MODIFICADO, modificado or datetime.now(dt_timezone.utc), timeout=None)
+
+
+def _anonimo(request):
+    return 'funcionario_logado_id' not in request.session
+
+
+def _com_mensagens(request):
+    # len() carrega as mensagens sem marcá-las como lidas
+    return len(get_messages(request)) > 0
+
+
+def _assinatura(request):
+    """Parâmetros que mudam a página, com o termo de busca normalizado."""
+    partes = [normalizar_texto(request.GET.get('q', ''))]
+    partes += [request.GET.get(nome, '') for nome in PARAMETROS[1:]]
+    # A barra de navegação muda para funcionários logados
+    partes.append('anonimo' if _anonimo(request) else 'funcionario')
+    if _com_mensagens(request):
+        partes.append('mensagens')
+    return hashlib.md5('\x1f'.join(partes).encode()).hexdigest()
+
+
+def _usa_cache(request):
+    return request.method == 'GET' and _anonimo(request) and not _com_mensagens(request)
+
+
+def _chave_pagina(request):
+    return f'acervo:resposta:{versao_catalogo()}:{_assinatura(request)}'
+
+
+def _resposta_guardada(chave):
+    guardada = _cache().get(chave)
+    if guardada is None:
+        return None
+    conteudo, cabecalhos = guardada
+    return HttpResponse(conteudo, headers=cabecalhos)
+
+
+def _guardar(chave, response):
+    if response.status_code != 200:
+        return
+    # Corpo e cabeçalhos (Content-Type, Vary...); cookies nunca, são de quem
+    # fez a requisição
+    cabecalhos = dict(response.headers.items())
+    _cache().set(chave, (response.content, cabecalhos), getattr(settings, 'ACERVO_CACHE_TIMEOUT', 600))
+
+
+def etag(request, *args, **kwargs):
+    return f'"{versao_catalogo()}-{_assinatura(request)}"'
+
+
+def last_modified(request, *args, **kwargs):
+    # Na view assíncrona o valor já foi buscado antes (ver _cache_do_acervo_async)
+    modificado = getattr(request, 'acervo_modificado', None)
+    return modificado or ultima_modificacao()
+
+
+def cache_do_acervo(view_func):
+    """
+    Decorator da acervo_view: GET condicional (ETag/Last-Modified) para todos
+    e cache do HTML renderizado para visitantes anônimos.
+    """
+    if iscoroutinefunction(view_func):
+        return _cache_do_acervo_async(view_func)
+
+    @wraps(view_func)
+    @condition(etag_func=etag, last_modified_func=last_modified)
+    def wrapper(request, *args, **kwargs):
+        if not _usa_cache(request):
+            return view_func(request, *args, **kwargs)
+
+        chave = _chave_pagina(request)
+        response = _resposta_guardada(chave)
+        if response is None:
+            response = view_func(request, *args, **kwargs)
+            _guardar(chave, response)
+        return response
+
+    return wrapper
+
+
+def _cache_do_acervo_async(view_func):
+    # O condition() chama etag/last_modified de forma síncrona mesmo em views
+    # assíncronas; por isso a sessão e a data da última alteração são
+    # carregadas antes, com I/O assíncrono, e lá dentro só o cache é lido.
+    @condition(etag_func=etag, last_modified_func=last_modified)
+    async def condicional(request, *args, **kwargs):
+        if not _usa_cache(request):
+            return await view_func(request, *args, **kwargs)
+
+        chave = _chave_pagina(request)
+        response = _resposta_guardada(chave)
+        if response is None:
+            response = await view_func(request, *args, **kwargs)
+            _guardar(chave, response)
+        return response
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        await request.session.aget('funcionario_logado_id')
+        request.acervo_modificado = await aultima_modificacao()
+        return await condicional(request, *args, **kwargs)
+
+    return wrapper
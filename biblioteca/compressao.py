@@ -0,0 +1,190 @@
+# biblioteca/compressao.py
+"""
+Compressão das respostas dinâmicas e GET condicional das listagens.
+
+compressao_middleware (middleware.py, ligado por padrão; desligue com
+BIBLIOTECA_COMPRESSAO=0 se um proxy na frente já comprimir):
+- comprime com brotli (se o módulo `brotli` estiver instalado e o navegador
+  aceitar) ou gzip as respostas de texto (HTML, CSV, JSON...) a partir de
+  TAMANHO_MINIMO bytes. Abaixo disso o ganho não paga o custo.
+- respostas em streaming (exportações CSV) são comprimidas pedaço a pedaço,
+  sem juntar o corpo na memória, nos modos síncrono e assíncrono.
+- acrescenta Accept-Encoding ao Vary sem perder o Vary: Cookie que a sessão
+  põe nas páginas de quem está logado, e troca uma ETag forte por fraca
+  (os bytes mudaram, o conteúdo não).
+- o gzip leva um nome de arquivo de tamanho aleatório no cabeçalho, como o
+  GZipMiddleware do Django, contra o ataque BREACH; o token de CSRF também
+  muda a cada resposta.
+
+etag_fraco: decorator das listagens de quem está logado. Calcula uma ETag
+fraca (W/"md5 do HTML sem compressão") e responde 304 quando o navegador já
+tem a mesma página. O HTML ainda é gerado, mas as centenas de KB de uma
+listagem grande não trafegam de novo. A mesma ETag vale para a versão gzip,
+br ou sem compressão, por isso é fraca. Páginas com formulários POST não
+ganham 304 (o {% csrf_token %} muda a cada resposta), por isso o decorator
+fica só nas listagens.
+"""
+import gzip
+import hashlib
+import io
+import secrets
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from .estaticos import codificacoes_aceitas
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele só gzip
+    brotli = None
+
+# Respostas menores cabem num pacote de rede de qualquer jeito
+TAMANHO_MINIMO = 1024
+TIPOS_COMPRIMIVEIS = (
+    'text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+)
+# Níveis para conteúdo gerado a cada requisição: os máximos (gzip 9,
+# brotli 11) custam várias vezes mais CPU para alguns % a menos
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 5
+# Até quantos bytes de enchimento no cabeçalho gzip (o padrão do Django)
+ENCHIMENTO_MAXIMO = 100
+
+
+class _Gzip:
+    codificacao = 'gzip'
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.arquivo = gzip.GzipFile(
+            filename='a' * secrets.randbelow(ENCHIMENTO_MAXIMO), mode='wb',
+            compresslevel=NIVEL_GZIP, fileobj=self.buffer, mtime=0,
+        )
+
+    def comprimir(self, dados):
+        self.arquivo.write(dados)
+        return self._drenar()
+
+    def finalizar(self):
+        self.arquivo.close()
+        return self._drenar()
+
+    def _drenar(self):
+        dados = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return dados
+
+
+class _Brotli:
+    codificacao = 'br'
+
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=QUALIDADE_BROTLI)
+
+    def comprimir(self, dados):
+        return self.compressor.process(dados)
+
+    def finalizar(self):
+        return self.compressor.finish()
+
+
+def _compressor_para(request):
+    aceitas = codificacoes_aceitas(request)
+    if brotli is not None and 'br' in aceitas:
+        return _Brotli
+    if 'gzip' in aceitas:
+        return _Gzip
+    return None
+
+
+def _comprimivel(response):
+    tipo = response.get('Content-Type', '').partition(';')[0].strip().lower()
+    return tipo.startswith(TIPOS_COMPRIMIVEIS)
+
+
+def _comprimir_fluxo(compressor, partes):
+    # Sem flush a cada pedaço: o CSV sai linha a linha, e o compressor só
+    # devolve bytes quando junta um bloco
+    for parte in partes:
+        dados = compressor.comprimir(parte)
+        if dados:
+            yield dados
+    yield compressor.finalizar()
+
+
+async def _acomprimir_fluxo(compressor, partes):
+    async for parte in partes:
+        dados = compressor.comprimir(parte)
+        if dados:
+            yield dados
+    yield compressor.finalizar()
+
+
+def _enfraquecer_etag(response):
+    # A ETag forte descreve os bytes sem compressão
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = f'W/{etag}'
+
+
+def comprimir_resposta(request, response):
+    """Comprime `response` no lugar, se valer a pena; devolve a própria resposta."""
+    if response.status_code == 304:
+        # Sem corpo, mas os cabeçalhos têm de bater com os do 200 que o
+        # navegador guardou
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if _compressor_para(request) is not None:
+            _enfraquecer_etag(response)
+        return response
+    if response.has_header('Content-Encoding') or not _comprimivel(response):
+        return response
+    if not response.streaming and len(response.content) < TAMANHO_MINIMO:
+        return response
+
+    # Mesmo que este navegador não aceite compressão, caches no caminho
+    # precisam saber que a resposta muda com o Accept-Encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    classe = _compressor_para(request)
+    if classe is None:
+        return response
+
+    compressor = classe()
+    if response.streaming:
+        if response.is_async:
+            response.streaming_content = _acomprimir_fluxo(compressor, response.streaming_content)
+        else:
+            response.streaming_content = _comprimir_fluxo(compressor, response.streaming_content)
+        del response.headers['Content-Length']
+    else:
+        comprimido = compressor.comprimir(response.content) + compressor.finalizar()
+        if len(comprimido) >= len(response.content):
+            return response
+        response.content = comprimido
+        response['Content-Length'] = str(len(comprimido))
+
+    _enfraquecer_etag(response)
+    response['Content-Encoding'] = compressor.codificacao
+    return response
+
+
+def etag_fraco(view_func):
+    """GET condicional por ETag fraca do HTML gerado (ver o início do módulo)."""
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        if (
+            request.method not in ('GET', 'HEAD') or response.status_code != 200
+            or response.streaming or response.has_header('ETag')
+        ):
+            return response
+        etag = f'W/"{hashlib.md5(response.content, usedforsecurity=False).hexdigest()}"'
+        response['ETag'] = etag
+        # A página muda com o funcionário logado: só o navegador guarda, e
+        # sempre pergunta antes de reusar
+        patch_cache_control(response, private=True, no_cache=True)
+        return get_conditional_response(request, etag=etag, response=response)
+
+    return wrapper
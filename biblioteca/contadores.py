@@ -0,0 +1,134 @@
+# biblioteca/contadores.py
+"""
+Contadores materializados do dashboard. Em vez de quatro COUNT(*) por visita,
+home_view lê a linha única de ContadoresPainel. Os sinais (signals.py)
+aplicam +1/-1 com UPDATE ... SET campo = campo + 1 logo após o save/delete,
+dentro da transação da operação quando ela roda num atomic().
+
+Operações em massa que não passam por save()/delete() (bulk_create,
+QuerySet.update) precisam chamar `ajustar` por conta própria.
+
+emprestimos.excluir e excluir_consulta descontam emprestimos_ativos pelo
+próprio UPDATE condicional (o que conta é se o livro foi liberado agora,
+não o status lido antes) e desligam o desconto do post_delete com
+`sem_ajuste_automatico`, para nada ser descontado duas vezes.
+
+Livro.emprestimo_atual e Leitor.emprestimos_ativos são mantidos pelas
+operações de emprestimos.py; livros_divergentes, leitores_divergentes e
+corrigir_emprestimos_ativos (usados pelo verificar_consistencia) os conferem
+e acertam contra os próprios empréstimos.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from . import cache_acervo
+from .models import ContadoresPainel, Emprestimo, EmprestimoArquivado, Funcionario, Leitor, Livro
+
+PK_CONTADORES = 1
+
+_ajuste_automatico = contextvars.ContextVar('biblioteca_ajuste_automatico', default=True)
+
+
+def calcular_totais():
+    return {
+        'livros': Livro.objects.count(),
+        'leitores': Leitor.objects.count(),
+        'funcionarios': Funcionario.objects.count(),
+        'emprestimos_ativos': Emprestimo.objects.ativos().count(),
+        'emprestimos_arquivados': EmprestimoArquivado.objects.count(),
+    }
+
+
+def reconstruir():
+    """Recalcula todos os contadores do zero (usado pelo rebuild_counters)."""
+    with transaction.atomic():
+        contadores, _ = ContadoresPainel.objects.update_or_create(
+            pk=PK_CONTADORES, defaults=calcular_totais()
+        )
+    return contadores
+
+
+def obter():
+    """Lê os contadores numa única busca por chave primária."""
+    try:
+        return ContadoresPainel.objects.get(pk=PK_CONTADORES)
+    except ContadoresPainel.DoesNotExist:
+        return reconstruir()
+
+
+def ajustar(**deltas):
+    """Ex: ajustar(livros=1) ou ajustar(emprestimos_ativos=-3)."""
+    deltas = {campo: delta for campo, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    atualizados = ContadoresPainel.objects.filter(pk=PK_CONTADORES).update(
+        **{campo: F(campo) + delta for campo, delta in deltas.items()}
+    )
+    if not atualizados:
+        # Linha ainda não existe: a contagem completa já inclui esta operação
+        reconstruir()
+
+
+@contextmanager
+def sem_ajuste_automatico():
+    """Dentro do bloco, os sinais de Emprestimo não mexem em emprestimos_ativos."""
+    token = _ajuste_automatico.set(False)
+    try:
+        yield
+    finally:
+        _ajuste_automatico.reset(token)
+
+
+def ajuste_automatico():
+    return _ajuste_automatico.get()
+
+
+def _ativo_do_livro():
+    # Atendido pelo índice único parcial emprestimo_um_ativo_por_livro
+    return Emprestimo.objects.ativos().filter(livro=OuterRef('pk')).values('pk')[:1]
+
+
+def _ativos_do_leitor():
+    return Coalesce(Subquery(
+        Emprestimo.objects.ativos().filter(leitor=OuterRef('pk')).order_by()
+        .values('leitor').annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def livros_divergentes():
+    """Livros cujo emprestimo_atual ou status não batem com o empréstimo ativo."""
+    livros = Livro.objects.annotate(ativo=Subquery(_ativo_do_livro()))
+    return livros.filter(
+        Q(ativo__isnull=True) & (Q(emprestimo_atual__isnull=False) | ~Q(status='disponivel'))
+        | Q(ativo__isnull=False) & (
+            Q(emprestimo_atual__isnull=True) | ~Q(emprestimo_atual=F('ativo')) | ~Q(status='emprestado')
+        )
+    )
+
+
+def leitores_divergentes():
+    """Leitores cujo emprestimos_ativos não bate com a contagem dos empréstimos."""
+    return Leitor.objects.annotate(ativos=_ativos_do_leitor()).exclude(emprestimos_ativos=F('ativos'))
+
+
+def corrigir_emprestimos_ativos():
+    """
+    Regrava, a partir dos empréstimos, o emprestimo_atual e o status dos
+    livros divergentes e o emprestimos_ativos dos leitores divergentes.
+    Devolve (livros corrigidos, leitores corrigidos).
+    """
+    with transaction.atomic():
+        livros = Livro.objects.filter(pk__in=livros_divergentes().values('pk')).update(
+            emprestimo_atual=Subquery(_ativo_do_livro()),
+            status=Case(When(Exists(_ativo_do_livro()), then=Value('emprestado')), default=Value('disponivel')),
+        )
+        leitores = Leitor.objects.filter(pk__in=leitores_divergentes().values('pk')).update(
+            emprestimos_ativos=_ativos_do_leitor()
+        )
+        if livros:
+            transaction.on_commit(cache_acervo.invalidar)
+    return livros, leitores
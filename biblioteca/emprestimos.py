@@ -0,0 +1,409 @@
+# biblioteca/emprestimos.py
+"""
+Operações de empréstimo e devolução.
+
+Cada operação é uma transação curta feita de UPDATEs condicionais: o
+`WHERE status = 'disponivel'` do empréstimo (e o `status IN (ativos)` da
+devolução) garante que, com dois balcões atendendo ao mesmo tempo, só um
+consiga emprestar o mesmo exemplar ou devolver o mesmo empréstimo. A
+constraint `emprestimo_um_ativo_por_livro` (um empréstimo ativo por livro)
+protege o banco mesmo contra código que não passe por aqui.
+
+As operações em lote (vários livros de um mesmo leitor no balcão) validam
+todos os itens antes de gravar e são tudo-ou-nada: se um item falhar,
+nenhum é gravado e o relatório por item diz o motivo.
+
+As operações sobre uma consulta (devolver_consulta, excluir_consulta) servem
+às ações em massa do admin: não carregam os registros e ignoram os itens que
+não se aplicam (ex: empréstimos já devolvidos).
+
+UPDATEs via queryset e bulk_create não disparam sinais, então o painel
+(contadores) e o cache do acervo são ajustados aqui, como no import_livros.
+
+Junto com o status, cada operação grava as colunas desnormalizadas:
+Livro.emprestimo_atual (o empréstimo ativo do livro, ou None) e
+Leitor.emprestimos_ativos (quantos o leitor tem agora). Com elas, saber com
+quem está um livro ou quantos livros um leitor tem é a leitura de uma linha,
+sem contar empréstimos. Com BIBLIOTECA_LIMITE_EMPRESTIMOS o UPDATE que soma
+ao contador do leitor só passa abaixo do limite, então dois balcões não o
+ultrapassam juntos. O comando verificar_consistencia confere (e, com
+--corrigir, acerta) essas colunas contra os empréstimos.
+
+Os devolvidos antigos saem da tabela Emprestimo para EmprestimoArquivado
+(`arquivar`, chamado em lotes pelo comando archive_emprestimos). Assim a
+tabela e os índices que todo balcão usa ficam com os empréstimos ativos e
+os devolvidos recentes; o histórico lê as duas tabelas.
+"""
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.utils import timezone
+
+from . import cache_acervo, contadores
+from .models import STATUS_ATIVOS, Emprestimo, EmprestimoArquivado, Leitor, Livro
+
+
+class ErroEmprestimo(Exception):
+    """Operação recusada; a mensagem é exibida ao funcionário."""
+
+
+class LivroIndisponivel(ErroEmprestimo):
+    pass
+
+
+class EmprestimoInativo(ErroEmprestimo):
+    pass
+
+
+class LimiteEmprestimos(ErroEmprestimo):
+    pass
+
+
+class ErroLote(ErroEmprestimo):
+    """Lote recusado por inteiro; `itens` traz o resultado de cada item."""
+
+    def __init__(self, mensagem, itens):
+        super().__init__(mensagem)
+        self.itens = itens
+
+
+# Mesmo prazo que Emprestimo.save() aplica (bulk_create não chama o save)
+PRAZO_DEVOLUCAO = datetime.timedelta(days=14)
+
+
+def _invalidar_acervo(agora):
+    # A página pública mostra se o livro está disponível
+    transaction.on_commit(lambda: cache_acervo.invalidar(agora))
+
+
+def pode_emprestar(leitor, quantidade=1):
+    """Se `leitor` pode levar mais `quantidade` livros sem passar do limite (sem consultar o banco)."""
+    limite = settings.BIBLIOTECA_LIMITE_EMPRESTIMOS
+    return not limite or leitor.emprestimos_ativos + quantidade <= limite
+
+
+def mensagem_limite(leitor):
+    return (
+        f"{leitor.nome} já tem {leitor.emprestimos_ativos} empréstimo(s) ativo(s); "
+        f"o limite é {settings.BIBLIOTECA_LIMITE_EMPRESTIMOS} por leitor."
+    )
+
+
+def _somar_ao_leitor(leitor, quantidade):
+    """Soma `quantidade` aos empréstimos ativos do leitor; False se passaria do limite."""
+    leitores = Leitor.objects.filter(pk=leitor.pk)
+    limite = settings.BIBLIOTECA_LIMITE_EMPRESTIMOS
+    if limite:
+        leitores = leitores.filter(emprestimos_ativos__lte=limite - quantidade)
+    return bool(leitores.update(emprestimos_ativos=F('emprestimos_ativos') + quantidade))
+
+
+def _descontar_dos_leitores(quantidade_por_leitor):
+    """{leitor_id: devolvidos} -> um UPDATE por leitor (num lote costuma ser um só)."""
+    for leitor_id, quantidade in quantidade_por_leitor.items():
+        Leitor.objects.filter(pk=leitor_id).update(emprestimos_ativos=F('emprestimos_ativos') - quantidade)
+
+
+def _descontar_ativos_da_consulta(ativos):
+    """Tira dos leitores os empréstimos de `ativos` (ainda ativos) num UPDATE só."""
+    por_leitor = (
+        ativos.filter(leitor=OuterRef('pk')).order_by().values('leitor')
+        .annotate(total=Count('pk')).values('total')
+    )
+    Leitor.objects.filter(pk__in=ativos.values('leitor_id')).update(
+        emprestimos_ativos=F('emprestimos_ativos') - Subquery(por_leitor)
+    )
+
+
+def emprestar(livro, leitor, funcionario):
+    """
+    Empresta `livro` para `leitor`. Levanta LivroIndisponivel se outro
+    empréstimo chegou antes (ou o livro já não estava disponível) e
+    LimiteEmprestimos se o leitor já está no limite.
+    """
+    agora = timezone.now()
+    try:
+        with transaction.atomic():
+            reservado = Livro.objects.filter(pk=livro.pk, status='disponivel').update(
+                status='emprestado', data_atualizacao=agora
+            )
+            if not reservado:
+                raise LivroIndisponivel(f"O livro '{livro.nome}' não está disponível.")
+            if not _somar_ao_leitor(leitor, 1):
+                raise LimiteEmprestimos(mensagem_limite(Leitor.objects.get(pk=leitor.pk)))
+            emprestimo = Emprestimo.objects.create(livro=livro, leitor=leitor, funcionario=funcionario)
+            Livro.objects.filter(pk=livro.pk).update(emprestimo_atual=emprestimo)
+            _invalidar_acervo(agora)
+    except IntegrityError:
+        # Empréstimo ativo já existente para o livro (constraint parcial)
+        raise LivroIndisponivel(f"O livro '{livro.nome}' já possui um empréstimo ativo.")
+
+    livro.status = 'emprestado'
+    livro.emprestimo_atual = emprestimo
+    livro.data_atualizacao = agora
+    leitor.emprestimos_ativos += 1
+    return emprestimo
+
+
+def devolver(emprestimo):
+    """Registra a devolução e libera o livro. Levanta EmprestimoInativo se já foi devolvido."""
+    agora = timezone.now()
+    hoje = timezone.localdate()
+    with transaction.atomic():
+        devolvido = Emprestimo.objects.filter(pk=emprestimo.pk, status__in=STATUS_ATIVOS).update(
+            status='DEVOLVIDO', data_devolucao_real=hoje, data_atualizacao=agora
+        )
+        if not devolvido:
+            raise EmprestimoInativo("Este empréstimo já foi devolvido.")
+        Livro.objects.filter(pk=emprestimo.livro_id).update(
+            status='disponivel', emprestimo_atual=None, data_atualizacao=agora
+        )
+        _descontar_dos_leitores({emprestimo.leitor_id: 1})
+        contadores.ajustar(emprestimos_ativos=-1)
+        _invalidar_acervo(agora)
+
+    emprestimo.status = emprestimo._status_original = 'DEVOLVIDO'
+    emprestimo.data_devolucao_real = hoje
+    emprestimo.data_atualizacao = agora
+    return emprestimo
+
+
+def excluir(emprestimo):
+    """Exclui o registro; se ele ainda estava ativo, o livro volta a ficar disponível."""
+    agora = timezone.now()
+    with transaction.atomic(), contadores.sem_ajuste_automatico():
+        # Só libera o livro se este for o empréstimo atual dele: se outro
+        # balcão devolveu no meio tempo, o apontador já está vazio e nada
+        # é descontado duas vezes (nem do leitor, nem do painel; o status
+        # em memória pode estar velho, por isso o post_delete fica desligado)
+        liberado = Livro.objects.filter(pk=emprestimo.livro_id, emprestimo_atual=emprestimo.pk).update(
+            status='disponivel', emprestimo_atual=None, data_atualizacao=agora
+        )
+        emprestimo.delete()
+        if liberado:
+            _descontar_dos_leitores({emprestimo.leitor_id: 1})
+            contadores.ajustar(emprestimos_ativos=-1)
+            _invalidar_acervo(agora)
+
+
+def _item(objeto, erro=None):
+    return {'objeto': objeto, 'ok': erro is None, 'mensagem': erro or 'OK'}
+
+
+def emprestar_lote(livros, leitor, funcionario):
+    """
+    Empresta vários livros para o mesmo leitor numa transação. `livros` são
+    instâncias de Livro (ex: cleaned_data de um ModelMultipleChoiceField).
+    Devolve a lista de resultados por livro; levanta ErroLote sem gravar nada
+    se algum livro estiver indisponível ou repetido.
+    """
+    livros = list(livros)
+    vistos = set()
+    itens = []
+    for livro in livros:
+        if livro.pk in vistos:
+            itens.append(_item(livro, "Livro repetido no lote."))
+        elif livro.status != 'disponivel':
+            itens.append(_item(livro, "Livro não está disponível."))
+        else:
+            itens.append(_item(livro))
+        vistos.add(livro.pk)
+    if not livros or not all(item['ok'] for item in itens):
+        raise ErroLote("Nenhum livro foi emprestado: corrija os itens abaixo.", itens)
+    if not pode_emprestar(leitor, len(livros)):
+        raise ErroLote(f"Nenhum livro foi emprestado: {mensagem_limite(leitor)}", itens)
+
+    agora = timezone.now()
+    hoje = timezone.localdate()
+    ids = [livro.pk for livro in livros]
+    criados = None
+    no_limite = False
+    try:
+        with transaction.atomic():
+            reservados = Livro.objects.filter(pk__in=ids, status='disponivel').update(
+                status='emprestado', data_atualizacao=agora
+            )
+            if reservados != len(ids):
+                # Outro balcão levou algum destes livros depois da validação
+                transaction.set_rollback(True)
+            elif not _somar_ao_leitor(leitor, len(livros)):
+                # Outro balcão emprestou para o mesmo leitor depois da validação
+                no_limite = True
+                transaction.set_rollback(True)
+            else:
+                criados = Emprestimo.objects.bulk_create([
+                    Emprestimo(
+                        livro=livro, leitor=leitor, funcionario=funcionario,
+                        data_emprestimo=hoje, data_devolucao_prevista=hoje + PRAZO_DEVOLUCAO, status='EMPRESTADO',
+                    )
+                    for livro in livros
+                ])
+                # Cada livro aponta para o seu empréstimo, achado pelo índice
+                # único parcial (um ativo por livro)
+                Livro.objects.filter(pk__in=ids).update(emprestimo_atual=Subquery(
+                    Emprestimo.objects.ativos().filter(livro=OuterRef('pk')).values('pk')[:1]
+                ))
+                contadores.ajustar(emprestimos_ativos=len(criados))
+                _invalidar_acervo(agora)
+    except IntegrityError:
+        # Empréstimo ativo já existente para algum livro (constraint parcial)
+        criados = None
+    if no_limite:
+        leitor.refresh_from_db(fields=['emprestimos_ativos'])
+        raise ErroLote(f"Nenhum livro foi emprestado: {mensagem_limite(leitor)}", itens)
+    if criados is None:
+        disponiveis = set(Livro.objects.filter(pk__in=ids, status='disponivel').values_list('pk', flat=True))
+        itens = [_item(livro, None if livro.pk in disponiveis else "Emprestado por outro balcão agora há pouco.")
+                 for livro in livros]
+        raise ErroLote("Nenhum livro foi emprestado: outro balcão emprestou parte do lote.", itens)
+
+    for livro, emprestimo in zip(livros, criados):
+        livro.status = 'emprestado'
+        livro.emprestimo_atual = emprestimo
+        livro.data_atualizacao = agora
+    leitor.emprestimos_ativos += len(criados)
+    return [_item(emprestimo) for emprestimo in criados]
+
+
+def devolver_lote(emprestimos):
+    """
+    Devolve vários empréstimos numa transação (tudo-ou-nada). Levanta
+    ErroLote se algum já estiver devolvido ou for repetido.
+    """
+    emprestimos = list(emprestimos)
+    vistos = set()
+    itens = []
+    for emprestimo in emprestimos:
+        if emprestimo.pk in vistos:
+            itens.append(_item(emprestimo, "Empréstimo repetido no lote."))
+        elif emprestimo.status not in STATUS_ATIVOS:
+            itens.append(_item(emprestimo, "Empréstimo já devolvido."))
+        else:
+            itens.append(_item(emprestimo))
+        vistos.add(emprestimo.pk)
+    if not emprestimos or not all(item['ok'] for item in itens):
+        raise ErroLote("Nenhuma devolução foi registrada: corrija os itens abaixo.", itens)
+
+    agora = timezone.now()
+    hoje = timezone.localdate()
+    ids = [emprestimo.pk for emprestimo in emprestimos]
+    with transaction.atomic():
+        # Todos recebem os mesmos valores: um UPDATE ... WHERE id IN (...) basta,
+        # e o filtro por status recusa o lote se alguém devolveu um item antes
+        devolvidos = Emprestimo.objects.filter(pk__in=ids, status__in=STATUS_ATIVOS).update(
+            status='DEVOLVIDO', data_devolucao_real=hoje, data_atualizacao=agora
+        )
+        if devolvidos != len(ids):
+            transaction.set_rollback(True)
+        else:
+            Livro.objects.filter(pk__in=[emprestimo.livro_id for emprestimo in emprestimos]).update(
+                status='disponivel', emprestimo_atual=None, data_atualizacao=agora
+            )
+            _descontar_dos_leitores(Counter(emprestimo.leitor_id for emprestimo in emprestimos))
+            contadores.ajustar(emprestimos_ativos=-devolvidos)
+            _invalidar_acervo(agora)
+    if devolvidos != len(ids):
+        ativos = set(Emprestimo.objects.filter(pk__in=ids, status__in=STATUS_ATIVOS).values_list('pk', flat=True))
+        itens = [_item(emprestimo, None if emprestimo.pk in ativos else "Devolvido por outro balcão agora há pouco.")
+                 for emprestimo in emprestimos]
+        raise ErroLote("Nenhuma devolução foi registrada: parte do lote já tinha sido devolvida.", itens)
+
+    for emprestimo in emprestimos:
+        emprestimo.status = emprestimo._status_original = 'DEVOLVIDO'
+        emprestimo.data_devolucao_real = hoje
+        emprestimo.data_atualizacao = agora
+    return [_item(emprestimo) for emprestimo in emprestimos]
+
+
+def devolver_consulta(queryset):
+    """
+    Devolve os empréstimos ativos de `queryset` com um UPDATE nos livros e
+    outro nos empréstimos, sem carregá-los. Devolve quantos foram devolvidos;
+    levanta ErroEmprestimo sem gravar nada se outro balcão mexeu na seleção
+    entre os dois UPDATEs.
+    """
+    agora = timezone.now()
+    hoje = timezone.localdate()
+    # Subconsulta pelos IDs: o queryset pode vir com joins e extras da busca
+    ativos = Emprestimo.objects.filter(pk__in=queryset.values('pk'), status__in=STATUS_ATIVOS)
+    with transaction.atomic():
+        # Os livros primeiro: depois do segundo UPDATE os empréstimos já não
+        # seriam ativos. A constraint de um ativo por livro faz as contagens
+        # baterem, a menos que alguém tenha devolvido ou emprestado no meio.
+        liberados = Livro.objects.filter(pk__in=ativos.values('livro_id')).update(
+            status='disponivel', emprestimo_atual=None, data_atualizacao=agora
+        )
+        _descontar_ativos_da_consulta(ativos)
+        devolvidos = ativos.update(status='DEVOLVIDO', data_devolucao_real=hoje, data_atualizacao=agora)
+        if devolvidos != liberados:
+            transaction.set_rollback(True)
+        elif devolvidos:
+            contadores.ajustar(emprestimos_ativos=-devolvidos)
+            _invalidar_acervo(agora)
+    if devolvidos != liberados:
+        raise ErroEmprestimo("Nenhuma devolução foi registrada: parte da seleção mudou agora há pouco. Tente de novo.")
+    return devolvidos
+
+
+def excluir_consulta(queryset):
+    """
+    Exclui os empréstimos de `queryset`; os livros dos que estavam ativos
+    voltam a ficar disponíveis. Devolve quantos foram excluídos.
+    """
+    agora = timezone.now()
+    with transaction.atomic(), contadores.sem_ajuste_automatico():
+        ativos = Emprestimo.objects.filter(pk__in=queryset.values('pk'), status__in=STATUS_ATIVOS)
+        liberados = Livro.objects.filter(emprestimo_atual__in=ativos.values('pk')).update(
+            status='disponivel', emprestimo_atual=None, data_atualizacao=agora
+        )
+        _descontar_ativos_da_consulta(ativos)
+        _, por_modelo = queryset.delete()
+        if liberados:
+            # Como em excluir: o painel desconta os livros liberados, não o
+            # status que o post_delete leria
+            contadores.ajustar(emprestimos_ativos=-liberados)
+            _invalidar_acervo(agora)
+    return por_modelo.get(Emprestimo._meta.label, 0)
+
+
+def arquivar(ids):
+    """
+    Move para EmprestimoArquivado os empréstimos devolvidos entre `ids` (os
+    demais são ignorados): copia e exclui na mesma transação. Devolve quantos
+    foram movidos; levanta ErroEmprestimo sem gravar nada se algum deles foi
+    excluído por outra operação no meio.
+    """
+    agora = timezone.now()
+    campos = [campo.attname for campo in Emprestimo._meta.concrete_fields]
+    with transaction.atomic():
+        # No Postgres, trava as linhas até o fim: ninguém exclui um empréstimo
+        # entre a cópia e a exclusão
+        devolvidos = list(
+            Emprestimo.objects.devolvidos().filter(pk__in=ids).select_for_update().order_by().values(*campos)
+        )
+        if not devolvidos:
+            return 0
+        for linha in devolvidos:
+            # Datas de auditoria ilegíveis no SQLite (lidas como None) não
+            # impedem o arquivamento
+            linha['data_criacao'] = linha['data_criacao'] or agora
+            linha['data_atualizacao'] = linha['data_atualizacao'] or agora
+        EmprestimoArquivado.objects.bulk_create(
+            [EmprestimoArquivado(**linha, data_arquivamento=agora) for linha in devolvidos],
+            batch_size=len(devolvidos),
+        )
+        # delete() dispara o post_delete de cada um; devolvidos não mexem no painel
+        _, por_modelo = Emprestimo.objects.filter(
+            pk__in=[linha['id'] for linha in devolvidos], status='DEVOLVIDO'
+        ).delete()
+        movidos = por_modelo.get(Emprestimo._meta.label, 0)
+        if movidos != len(devolvidos):
+            transaction.set_rollback(True)
+        else:
+            contadores.ajustar(emprestimos_arquivados=movidos)
+    if movidos != len(devolvidos):
+        raise ErroEmprestimo("Nenhum empréstimo foi arquivado: parte do lote mudou agora há pouco. Tente de novo.")
+    return movidos
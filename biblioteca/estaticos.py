@@ -0,0 +1,176 @@
+# biblioteca/estaticos.py
+"""
+Arquivos estáticos servidos pela própria aplicação, sem CDN nem servidor web
+na frente (os terminais das agências ficam numa rede fechada).
+
+- Bootstrap, jQuery e Font Awesome ficam em static/vendor/, uma pasta por
+  biblioteca e versão, com os arquivos originais da distribuição.
+- ArmazenamentoEstatico (STORAGES['staticfiles']) é o ManifestStaticFilesStorage
+  do Django, que grava cada arquivo com o hash do conteúdo no nome
+  (bootstrap.min.3a1b2c....css), e no `collectstatic` também grava as versões
+  .gz e .br (esta só com o módulo `brotli` instalado) dos arquivos de texto.
+- arquivos_estaticos_middleware (middleware.py) serve o STATIC_ROOT: escolhe a
+  versão comprimida pelo Accept-Encoding, responde 304 a pedidos condicionais
+  e manda Cache-Control de um ano para os nomes com hash, que nunca mudam de
+  conteúdo. O índice dos arquivos é montado na subida do processo; depois de
+  um novo `collectstatic`, reinicie a aplicação.
+
+Em DEBUG o {% static %} usa os nomes sem hash e o runserver serve os
+arquivos direto de static/, sem precisar do collectstatic.
+"""
+import gzip
+import json
+import mimetypes
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele ficam só as versões .gz
+    brotli = None
+
+# Só vale comprimir texto; imagens e woff/woff2 já vêm comprimidos
+EXTENSOES_COMPRIMIVEIS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ttf', '.eot', '.ico')
+# A versão comprimida só é gravada se economizar pelo menos 5%
+ECONOMIA_MINIMA = 0.95
+
+# Em ordem de preferência quando o navegador aceita as duas
+CODIFICACOES = (('br', '.br'), ('gzip', '.gz'))
+
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+# Nomes sem hash (ex: links antigos) podem mudar no próximo deploy
+CACHE_PADRAO = 'public, max-age=60'
+
+
+def comprimir(caminho):
+    """Grava caminho.gz e caminho.br ao lado do arquivo, se valer a pena."""
+    if not caminho.endswith(EXTENSOES_COMPRIMIVEIS):
+        return
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+    # mtime=0: o mesmo arquivo gera sempre o mesmo .gz
+    versoes = [('.gz', lambda dados: gzip.compress(dados, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        versoes.append(('.br', lambda dados: brotli.compress(dados, quality=11)))
+    for sufixo, compressor in versoes:
+        destino = caminho + sufixo
+        if os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(caminho):
+            continue
+        comprimido = compressor(conteudo)
+        if len(comprimido) < len(conteudo) * ECONOMIA_MINIMA:
+            with open(destino, 'wb') as arquivo:
+                arquivo.write(comprimido)
+        elif os.path.exists(destino):
+            os.remove(destino)
+
+
+class ArmazenamentoEstatico(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage que também grava as versões .gz/.br no collectstatic."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Originais (servidos com cache curto) e as cópias com hash
+        for nome in sorted(set(paths) | set(self.hashed_files.values())):
+            comprimir(self.path(nome))
+
+
+class ArquivoEstatico:
+    __slots__ = ('caminho', 'tamanho', 'tipo', 'modificado', 'etag', 'cache', 'variantes')
+
+    def __init__(self, caminho, imutavel):
+        info = os.stat(caminho)
+        self.caminho = caminho
+        self.tamanho = info.st_size
+        self.tipo = mimetypes.guess_type(caminho)[0] or 'application/octet-stream'
+        if self.tipo.startswith('text/') or self.tipo == 'application/javascript':
+            self.tipo += '; charset=utf-8'
+        self.modificado = int(info.st_mtime)
+        self.etag = f'"{self.tamanho:x}-{self.modificado:x}"'
+        self.cache = CACHE_IMUTAVEL if imutavel else CACHE_PADRAO
+        # (codificação, caminho, tamanho) das versões comprimidas que existem
+        self.variantes = [
+            (codificacao, caminho + sufixo, os.path.getsize(caminho + sufixo))
+            for codificacao, sufixo in CODIFICACOES
+            if os.path.exists(caminho + sufixo)
+        ]
+
+
+def indexar(raiz, prefixo_url):
+    """
+    {'/static/css/estetica.css': ArquivoEstatico, ...} com tudo o que o
+    collectstatic gravou em `raiz`. Vazio se a pasta não existir.
+    """
+    if not raiz or not os.path.isdir(raiz):
+        return {}
+    com_hash = set()
+    manifesto = os.path.join(raiz, ArmazenamentoEstatico.manifest_name)
+    if os.path.exists(manifesto):
+        with open(manifesto, encoding='utf-8') as arquivo:
+            com_hash = set(json.load(arquivo).get('paths', {}).values())
+
+    arquivos = {}
+    sufixos = tuple(sufixo for _, sufixo in CODIFICACOES)
+    for pasta, _, nomes in os.walk(raiz):
+        for nome in nomes:
+            if nome.endswith(sufixos):
+                continue
+            caminho = os.path.join(pasta, nome)
+            relativo = os.path.relpath(caminho, raiz).replace(os.sep, '/')
+            arquivos[prefixo_url + relativo] = ArquivoEstatico(caminho, relativo in com_hash)
+    return arquivos
+
+
+def codificacoes_aceitas(request):
+    """Codificações do Accept-Encoding, sem as marcadas com q=0."""
+    aceitas = set()
+    for parte in request.headers.get('Accept-Encoding', '').split(','):
+        nome, _, parametros = parte.partition(';')
+        qualidade = parametros.replace(' ', '').lower()
+        if qualidade.startswith('q=') and not qualidade[2:].strip('0.'):
+            continue
+        aceitas.add(nome.strip().lower())
+    return aceitas
+
+
+def responder(request, arquivo, ler=False):
+    """
+    Resposta para um GET/HEAD de `arquivo`. Com ler=True o conteúdo vai
+    inteiro na resposta em vez de um FileResponse (para o modo assíncrono,
+    que não deve iterar arquivos abertos).
+    """
+    aceitas = codificacoes_aceitas(request)
+    codificacao, caminho, tamanho, etag = None, arquivo.caminho, arquivo.tamanho, arquivo.etag
+    for opcao, caminho_variante, tamanho_variante in arquivo.variantes:
+        if opcao in aceitas:
+            codificacao, caminho, tamanho = opcao, caminho_variante, tamanho_variante
+            # Cada representação tem a sua ETag
+            etag = f'{arquivo.etag[:-1]}-{opcao}"'
+            break
+
+    resposta = get_conditional_response(request, etag=etag, last_modified=arquivo.modificado)
+    if resposta is None:
+        if request.method == 'HEAD':
+            resposta = HttpResponse()
+        elif ler:
+            with open(caminho, 'rb') as conteudo:
+                resposta = HttpResponse(conteudo.read())
+        else:
+            resposta = FileResponse(open(caminho, 'rb'))
+            # O nome em disco pode ser o da versão .br/.gz
+            resposta.headers.pop('Content-Disposition', None)
+        resposta['Content-Type'] = arquivo.tipo
+        resposta['Content-Length'] = str(tamanho)
+        if codificacao:
+            resposta['Content-Encoding'] = codificacao
+    resposta['Cache-Control'] = arquivo.cache
+    resposta['ETag'] = etag
+    resposta['Last-Modified'] = http_date(arquivo.modificado)
+    if arquivo.variantes:
+        resposta['Vary'] = 'Accept-Encoding'
+    return resposta
@@ -0,0 +1,189 @@
+# biblioteca/exportacao.py
+"""
+Exportação dos relatórios em CSV e XLSX via StreamingHttpResponse.
+
+As linhas chegam de um `.values_list(...).iterator(chunk_size=...)` e são
+escritas e enviadas aos poucos, então a memória do processo fica estável
+com 100 ou 1.000.000 de linhas. O XLSX é montado à mão (um zip com o XML
+mínimo da planilha, usando strings inline) para também poder ser gerado em
+streaming, sem dependências extras. Textos que começam como fórmula
+(=, +, -, @, tab) saem com um apóstrofo na frente (ver formatar_valor).
+
+Um relatório pode juntar várias consultas com a mesma ordenação (ex: o
+histórico do livro, em Emprestimo e EmprestimoArquivado): cada uma é
+percorrida em lotes e as linhas são intercaladas com heapq.merge.
+"""
+import csv
+import datetime
+import heapq
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+
+TAMANHO_LOTE = 2000
+
+# Caracteres de controle que o XML 1.0 não aceita
+_INVALIDOS_XML = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+# Início de célula que o Excel/LibreOffice interpretam como fórmula
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def formatar_valor(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime.date):
+        return valor.strftime('%d/%m/%Y')
+    if isinstance(valor, str):
+        # Nomes, títulos e e-mails vêm de cadastros: com o apóstrofo na
+        # frente a planilha mostra o texto em vez de executar uma fórmula
+        return f"'{valor}" if valor.startswith(_INICIO_FORMULA) else valor
+    return str(valor)
+
+
+class _Eco:
+    """Arquivo falso: o write devolve o texto em vez de guardá-lo (padrão da doc do Django)."""
+
+    def write(self, valor):
+        return valor
+
+
+class _BufferZip:
+    """Arquivo só de escrita, sem seek, de onde o zip é drenado em pedaços."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def drenar(self):
+        dados = b''.join(self.partes)
+        self.partes = []
+        return dados
+
+
+def gerar_csv(cabecalho, linhas):
+    escritor = csv.writer(_Eco())
+    # BOM para o Excel reconhecer UTF-8 (acentos)
+    yield '\ufeff' + escritor.writerow(cabecalho)
+    for linha in linhas:
+        yield escritor.writerow([formatar_valor(valor) for valor in linha])
+
+
+def _linha_xlsx(numero, valores):
+    celulas = ''.join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">'
+        f'{escape(_INVALIDOS_XML.sub("", formatar_valor(valor)))}</t></is></c>'
+        for valor in valores
+    )
+    return f'<row r="{numero}">{celulas}</row>'
+
+
+_ARQUIVOS_FIXOS_XLSX = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def gerar_xlsx(cabecalho, linhas, nome_planilha='Relatorio'):
+    buffer = _BufferZip()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as arquivo_zip:
+        for nome, conteudo in _ARQUIVOS_FIXOS_XLSX.items():
+            arquivo_zip.writestr(nome, conteudo)
+        arquivo_zip.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(nome_planilha[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield buffer.drenar()
+
+        with arquivo_zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _linha_xlsx(1, cabecalho)
+            ).encode())
+            for numero, linha in enumerate(linhas, start=2):
+                planilha.write(_linha_xlsx(numero, linha).encode())
+                if numero % TAMANHO_LOTE == 0:
+                    yield buffer.drenar()
+            planilha.write(b'</sheetData></worksheet>')
+    yield buffer.drenar()
+
+
+def _linhas(querysets, campos, ordenacao):
+    """
+    Linhas de uma ou mais consultas. Com várias, busca também os campos da
+    `ordenacao` (todos no mesmo sentido, ex: ('-data_emprestimo', '-id')),
+    intercala por eles e os tira da linha.
+    """
+    if len(querysets) == 1:
+        return querysets[0].values_list(*campos).iterator(chunk_size=TAMANHO_LOTE)
+    nomes = [campo.lstrip('-') for campo in ordenacao]
+    decrescente = ordenacao[0].startswith('-')
+    if any(campo.startswith('-') != decrescente for campo in ordenacao):
+        raise ValueError("Para juntar consultas, a ordenação deve ter todos os campos no mesmo sentido.")
+    iteradores = [
+        queryset.order_by(*ordenacao).values_list(*nomes, *campos).iterator(chunk_size=TAMANHO_LOTE)
+        for queryset in querysets
+    ]
+    chave = len(nomes)
+    juntas = heapq.merge(*iteradores, key=lambda linha: linha[:chave], reverse=decrescente)
+    return (linha[chave:] for linha in juntas)
+
+
+def resposta_exportacao(formato, nome_arquivo, cabecalho, queryset, campos, ordenacao=None):
+    """
+    Monta a StreamingHttpResponse de um relatório. `campos` são os nomes do
+    values_list (podem atravessar relações, ex: 'leitor__nome'); a consulta
+    é percorrida com iterator() em lotes de TAMANHO_LOTE. `queryset` também
+    pode ser uma lista de consultas, juntas pela `ordenacao`.
+    """
+    querysets = queryset if isinstance(queryset, (list, tuple)) else [queryset]
+    linhas = _linhas(querysets, campos, ordenacao)
+    if formato == 'xlsx':
+        response = StreamingHttpResponse(
+            gerar_xlsx(cabecalho, linhas),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+        extensao = 'xlsx'
+    else:
+        response = StreamingHttpResponse(gerar_csv(cabecalho, linhas), content_type='text/csv; charset=utf-8')
+        extensao = 'csv'
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.{extensao}"'
+    return response
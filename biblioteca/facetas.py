@@ -0,0 +1,22 @@
+# biblioteca/facetas.py
+"""
+Contagens das abas (facetas) das telas de consulta numa única consulta SQL.
+
+Em vez de um `.count()` por aba, usamos agregação condicional:
+SELECT COUNT(id) FILTER (WHERE ...), COUNT(id) FILTER (WHERE ...) FROM ...
+O queryset recebido já pode vir com o filtro da busca aplicado, e as
+contagens o respeitam.
+"""
+from django.db.models import Count
+
+
+def contar_facetas(queryset, facetas):
+    """
+    `facetas` é um dict {nome: Q(...)}. Retorna {nome: total} com todas as
+    contagens calculadas numa só passada sobre o queryset.
+    """
+    if not facetas:
+        return {}
+    return queryset.order_by().aggregate(
+        **{nome: Count('pk', filter=filtro) for nome, filtro in facetas.items()}
+    )
@@ -1,6 +1,9 @@
 # biblioteca/forms.py
 from django import forms
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
 from .models import Funcionario, Leitor, Livro, Emprestimo 
+from . import emprestimos
 
 class FuncionarioForm(forms.ModelForm):
     # Definindo o tipo de input para o campo de senha
@@ -59,16 +62,175 @@ class LivroForm(forms.ModelForm):
         self.fields['data_publicacao'].widget = forms.DateInput(
             attrs={'type': 'date', 'class': 'form-control'}
         )
+# Máximo de itens numa operação em lote no balcão
+LIMITE_LOTE = 20
+
+
+class BuscaPorIdWidget(forms.Widget):
+    """
+    Campo hidden com o ID escolhido + caixa de texto que consulta um endpoint
+    JSON de sugestões (ver templates/busca_por_id.html). Diferente do
+    <select>, não lista o queryset inteiro na página.
+    """
+
+    def __init__(self, url_busca, rotulos, placeholder='', attrs=None):
+        super().__init__(attrs)
+        self.url_busca = url_busca  # nome da URL do endpoint de sugestões
+        self.rotulos = rotulos  # [pk] -> {pk: texto}, para quando o form volta com valores
+        self.placeholder = placeholder
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        id_campo = attrs.get('id') or f'id_{name}'
+        return format_html(
+            '<input type="hidden" name="{}" id="{}" value="{}">'
+            '<input type="text" class="form-control" id="{}_busca" value="{}" placeholder="{}" '
+            'autocomplete="off" data-busca-url="{}" data-busca-alvo="{}">'
+            '<div class="list-group busca-resultados" id="{}_resultados"></div>',
+            name, id_campo, value or '',
+            id_campo, self.rotulos([value]).get(str(value), '') if value else '', self.placeholder,
+            reverse(self.url_busca), id_campo,
+            id_campo,
+        )
+
+    def value_from_datadict(self, data, files, name):
+        return data.get(name) or None
+
+
+class BuscaVariosIdsWidget(BuscaPorIdWidget):
+    """
+    Variante para escolher vários itens: cada item escolhido vira uma
+    etiqueta com o seu próprio <input type="hidden"> de mesmo nome.
+    """
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        id_campo = attrs.get('id') or f'id_{name}'
+        valores = [str(valor) for valor in (value or [])]
+        rotulos = self.rotulos(valores) if valores else {}
+        etiquetas = format_html_join(
+            '', '<span class="badge badge-secondary p-2 mr-1 mb-1">{}'
+            '<input type="hidden" name="{}" value="{}">'
+            '<a href="#" class="text-white ml-2" data-busca-remover>&times;</a></span>',
+            ((rotulos.get(valor, valor), name, valor) for valor in valores),
+        )
+        return format_html(
+            '<div id="{}_escolhidos" class="mb-2">{}</div>'
+            '<input type="text" class="form-control" id="{}_busca" placeholder="{}" autocomplete="off" '
+            'data-busca-url="{}" data-busca-alvo="{}" data-busca-nome="{}" data-busca-multiplo="1">'
+            '<div class="list-group busca-resultados" id="{}_resultados"></div>',
+            id_campo, etiquetas,
+            id_campo, self.placeholder,
+            reverse(self.url_busca), id_campo, name,
+            id_campo,
+        )
+
+    def value_from_datadict(self, data, files, name):
+        return [valor for valor in data.getlist(name) if valor]
+
+
+def _rotulos(model, formatar):
+    """Função [pk] -> {pk: texto}, com uma consulta para todos os pks."""
+    def rotulos(pks):
+        pks = [str(pk) for pk in pks if str(pk).isdigit()]
+        if not pks:
+            return {}
+        return {str(obj.pk): formatar(obj) for obj in model.objects.filter(pk__in=pks)}
+    return rotulos
+
+
+def rotulo_leitor(leitor):
+    return f'{leitor.nome} — CPF {leitor.cpf}'
+
+
+def rotulo_livro(livro):
+    return f'{livro.nome} — ISBN {livro.isbn}'
+
 
 class EmprestimoForm(forms.ModelForm):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Filtra o campo 'livro' para mostrar apenas os livros com status 'disponivel'
-        self.fields['livro'].queryset = Livro.objects.filter(status='disponivel')
-        self.fields['livro'].empty_label = "Selecione um livro disponível"
-        self.fields['leitor'].empty_label = "Selecione um leitor"
+    # ModelChoiceField só busca o ID enviado (uma consulta por campo); com o
+    # BuscaPorIdWidget as opções nunca são carregadas.
+    leitor = forms.ModelChoiceField(
+        queryset=Leitor.objects.all(),
+        widget=BuscaPorIdWidget(
+            'buscar_leitores', _rotulos(Leitor, rotulo_leitor), placeholder="Digite o nome ou CPF do leitor..."
+        ),
+        error_messages={'required': "Selecione um leitor.", 'invalid_choice': "Leitor não encontrado."},
+    )
+    livro = forms.ModelChoiceField(
+        # Só livros disponíveis são aceitos
+        queryset=Livro.objects.filter(status='disponivel'),
+        widget=BuscaPorIdWidget(
+            'buscar_livros_disponiveis', _rotulos(Livro, rotulo_livro),
+            placeholder="Digite o título ou ISBN do livro...",
+        ),
+        error_messages={
+            'required': "Selecione um livro.",
+            'invalid_choice': "Livro não encontrado ou não está disponível.",
+        },
+    )
 
     class Meta:
         model = Emprestimo
         # Campos que o funcionário irá preencher no formulário
         fields = ['leitor', 'livro']
+
+    def clean_leitor(self):
+        leitor = self.cleaned_data['leitor']
+        # Lê o contador do leitor já carregado; emprestar() confere de novo
+        # na gravação, caso outro balcão empreste no meio tempo
+        if not emprestimos.pode_emprestar(leitor):
+            raise forms.ValidationError(emprestimos.mensagem_limite(leitor))
+        return leitor
+
+
+class HistoricoLivroForm(forms.Form):
+    """Escolha do livro no relatório de histórico (qualquer livro do acervo)."""
+    livro_id = forms.ModelChoiceField(
+        queryset=Livro.objects.all(),
+        label="Livro",
+        widget=BuscaPorIdWidget(
+            'buscar_livros_catalogo', _rotulos(Livro, rotulo_livro),
+            placeholder="Digite o título ou ISBN do livro...",
+        ),
+        error_messages={'required': "Escolha um livro na busca.", 'invalid_choice': "Livro não encontrado."},
+    )
+
+
+class EmprestimoLoteForm(forms.Form):
+    """Vários livros para o mesmo leitor; a disponibilidade é conferida pelo serviço, item a item."""
+    leitor = forms.ModelChoiceField(
+        queryset=Leitor.objects.all(),
+        widget=BuscaPorIdWidget(
+            'buscar_leitores', _rotulos(Leitor, rotulo_leitor), placeholder="Digite o nome ou CPF do leitor..."
+        ),
+        error_messages={'required': "Selecione um leitor.", 'invalid_choice': "Leitor não encontrado."},
+    )
+    livros = forms.ModelMultipleChoiceField(
+        queryset=Livro.objects.all(),
+        widget=BuscaVariosIdsWidget(
+            'buscar_livros_disponiveis', _rotulos(Livro, rotulo_livro),
+            placeholder="Digite o título ou ISBN e escolha cada livro...",
+        ),
+        error_messages={
+            'required': "Escolha ao menos um livro.",
+            'invalid_choice': "Livro %(value)s não encontrado.",
+        },
+    )
+
+    def clean_livros(self):
+        livros = list(self.cleaned_data['livros'])
+        if len(livros) > LIMITE_LOTE:
+            raise forms.ValidationError(f"No máximo {LIMITE_LOTE} livros por operação.")
+        return livros
+
+
+class DevolucaoLoteForm(forms.Form):
+    """Escolha do leitor cujos empréstimos ativos serão devolvidos em lote."""
+    leitor = forms.ModelChoiceField(
+        queryset=Leitor.objects.all(),
+        widget=BuscaPorIdWidget(
+            'buscar_leitores', _rotulos(Leitor, rotulo_leitor), placeholder="Digite o nome ou CPF do leitor..."
+        ),
+        error_messages={'required': "Selecione um leitor.", 'invalid_choice': "Leitor não encontrado."},
+    )
@@ -0,0 +1,97 @@
+# biblioteca/importacao.py
+"""
+Leitores em streaming para importar o catálogo de outras bibliotecas.
+
+Cada leitor é um gerador de dicts com os campos do LivroForm (nome, isbn,
+autor, genero, data_publicacao); nenhum carrega o arquivo inteiro na
+memória. Usados pelo comando import_livros.
+"""
+import csv
+import re
+
+CAMPOS_LIVRO = ('nome', 'isbn', 'autor', 'genero', 'data_publicacao')
+
+# Separadores do formato MARC21 / ISO 2709
+FIM_DE_CAMPO = b'\x1e'
+FIM_DE_REGISTRO = b'\x1d'
+DELIMITADOR_SUBCAMPO = b'\x1f'
+
+
+def ler_csv(arquivo, delimitador=','):
+    """Lê um CSV com cabeçalho; colunas desconhecidas são ignoradas."""
+    for linha in csv.DictReader(arquivo, delimiter=delimitador):
+        yield {campo: (linha.get(campo) or '').strip() for campo in CAMPOS_LIVRO}
+
+
+def _limpar(valor):
+    # Remove a pontuação ISBD do fim dos subcampos: "Dom Casmurro /" -> "Dom Casmurro"
+    return re.sub(r'[\s/:;,.=]+$', '', valor or '').strip()
+
+
+def _subcampos(dados, codificacao):
+    """Campo '10<US>aTítulo<US>bSubtítulo' -> [('a', 'Título'), ('b', 'Subtítulo')]"""
+    partes = dados.split(DELIMITADOR_SUBCAMPO)
+    for parte in partes[1:]:
+        if parte:
+            yield chr(parte[0]), parte[1:].decode(codificacao, errors='replace')
+
+
+def registros_marc(arquivo):
+    """
+    Percorre um arquivo MARC21 binário (ISO 2709) registro a registro, lendo
+    só o tamanho declarado no líder de cada um. Gera dicts {tag: [campos]},
+    onde campos de controle (00X) são strings e os demais listas de subcampos.
+    """
+    while True:
+        lider = arquivo.read(24)
+        if not lider or lider.strip(b'\x00\r\n ') == b'':
+            return
+        try:
+            tamanho = int(lider[:5])
+            base = int(lider[12:17])
+        except ValueError:
+            raise ValueError(f"Líder MARC inválido: {lider!r}")
+        resto = arquivo.read(tamanho - 24)
+        registro = lider + resto
+        # Posição 9 do líder: 'a' = UTF-8; senão assumimos MARC-8 ~ latin-1
+        codificacao = 'utf-8' if lider[9:10] == b'a' else 'latin-1'
+
+        diretorio = registro[24:base - 1]
+        campos = {}
+        for i in range(0, len(diretorio) - len(diretorio) % 12, 12):
+            entrada = diretorio[i:i + 12]
+            tag = entrada[:3].decode('ascii', errors='replace')
+            comprimento = int(entrada[3:7])
+            inicio = int(entrada[7:12])
+            dados = registro[base + inicio:base + inicio + comprimento].rstrip(FIM_DE_CAMPO)
+            if tag < '010':
+                campos.setdefault(tag, []).append(dados.decode(codificacao, errors='replace'))
+            else:
+                campos.setdefault(tag, []).append(list(_subcampos(dados, codificacao)))
+        yield campos
+
+
+def _primeiro(campos, tag, codigos):
+    for campo in campos.get(tag, []):
+        valores = [valor for codigo, valor in campo if codigo in codigos]
+        if valores:
+            return ' '.join(_limpar(valor) for valor in valores)
+    return ''
+
+
+def ler_marc(arquivo):
+    """
+    Converte registros MARC21 bibliográficos nos campos de Livro:
+    245 $a$b -> nome, 100/110 $a -> autor, 020 $a -> isbn,
+    650/655 $a -> genero, 260/264 $c (ano) -> data_publicacao (1º de janeiro).
+    """
+    for campos in registros_marc(arquivo):
+        isbn = _primeiro(campos, '020', 'a').split(' ')[0]
+        ano = re.search(r'\d{4}', _primeiro(campos, '260', 'c') or _primeiro(campos, '264', 'c'))
+        yield {
+            'nome': _primeiro(campos, '245', 'ab'),
+            'isbn': isbn,
+            'autor': _primeiro(campos, '100', 'a') or _primeiro(campos, '110', 'a'),
+            'genero': _primeiro(campos, '650', 'a') or _primeiro(campos, '655', 'a'),
+            'data_publicacao': f'{ano.group(0)}-01-01' if ano else '',
+        }
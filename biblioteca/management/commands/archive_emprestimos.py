@@ -0,0 +1,56 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from biblioteca import emprestimos
+from biblioteca.models import Emprestimo
+
+
+class Command(BaseCommand):
+    help = (
+        "Move para EmprestimoArquivado os empréstimos devolvidos há mais de --dias dias "
+        "(padrão: BIBLIOTECA_ARQUIVAR_APOS_DIAS), em lotes de uma transação cada. Pode rodar "
+        "agendado junto com o sweep_overdue; interromper no meio não perde nada, os lotes "
+        "já gravados ficam arquivados e o resto fica para a próxima execução."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=settings.BIBLIOTECA_ARQUIVAR_APOS_DIAS,
+            help="Arquiva os devolvidos antes desta quantidade de dias.",
+        )
+        parser.add_argument('--lote', type=int, default=2000, help="Empréstimos movidos por transação.")
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0:
+            raise CommandError("--dias não pode ser negativo.")
+        corte = timezone.localdate() - datetime.timedelta(days=options['dias'])
+        lote = max(1, options['lote'])
+
+        inicio = time.monotonic()
+        total = 0
+        while True:
+            # Dos mais antigos para os mais novos, pelo índice (status,
+            # data_devolucao_real); os já movidos saem da tabela e do índice
+            ids = list(
+                Emprestimo.objects.devolvidos()
+                .filter(data_devolucao_real__lt=corte)
+                .order_by('data_devolucao_real')
+                .values_list('pk', flat=True)[:lote]
+            )
+            if not ids:
+                break
+            try:
+                total += emprestimos.arquivar(ids)
+            except emprestimos.ErroEmprestimo as erro:
+                # O resto fica para a próxima execução
+                self.stdout.write(self.style.WARNING(f"Arquivamento interrompido: {erro}"))
+                break
+
+        duracao = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} empréstimo(s) devolvido(s) antes de {corte:%d/%m/%Y} arquivado(s) em {duracao:.2f}s."
+        ))
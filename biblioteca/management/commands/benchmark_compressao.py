@@ -0,0 +1,187 @@
+import http.client
+import io
+import json
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer, get_internal_wsgi_application
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from biblioteca import compressao
+from biblioteca.models import Emprestimo, Funcionario
+
+# (nome da URL, parâmetros da URL, query string). Com --escala 12.5 o
+# relatório de livros emprestados tem 5.000 linhas.
+PAGINAS = [
+    ('relatorio_livros_emprestados', {}, ''),
+    ('relatorio_leitores_atrasados', {}, ''),
+    ('consultar_emprestimos', {}, 'aba=historico'),
+    ('relatorio_exportar', {'relatorio': 'livros_emprestados', 'formato': 'csv'}, ''),
+]
+
+# (rótulo, Accept-Encoding enviado)
+CODIFICACOES = [
+    ('sem compressão', 'identity'),
+    ('gzip', 'gzip'),
+    ('brotli', 'br'),
+]
+
+
+class _HandlerSilencioso(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede os bytes transferidos e o tempo até o último byte das listagens grandes "
+        "(o relatório de livros emprestados tem 5.000 linhas com --escala 12.5) sem "
+        "compressão, com gzip e com brotli, e a revalidação com ETag fraca (304). Sobe um "
+        "servidor HTTP local sobre um banco de teste temporário gerado pelo seed_biblioteca; "
+        "o banco configurado não é alterado. O tempo estimado num link de --banda-mbps soma "
+        "o tempo medido localmente ao tempo de transmissão dos bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=float, default=12.5, help="Escala do seed_biblioteca.")
+        parser.add_argument('--semente', type=int, default=42, help="Semente do seed_biblioteca.")
+        parser.add_argument('--repeticoes', type=int, default=5, help="Requisições medidas por caso.")
+        parser.add_argument(
+            '--banda-mbps', type=float, default=10.0,
+            help="Velocidade do link das agências usada na estimativa (Mbit/s).",
+        )
+        parser.add_argument('--saida', help="Grava também um relatório JSON neste arquivo.")
+
+    def handle(self, *args, **options):
+        if not settings.BIBLIOTECA_COMPRESSAO:
+            self.stdout.write(self.style.WARNING(
+                "BIBLIOTECA_COMPRESSAO=0: o compressao_middleware está desligado e nada será comprimido."
+            ))
+        codificacoes = [
+            (rotulo, aceita) for rotulo, aceita in CODIFICACOES
+            if aceita != 'br' or compressao.brotli is not None
+        ]
+        if len(codificacoes) < len(CODIFICACOES):
+            self.stdout.write(self.style.WARNING("Módulo brotli não instalado: medindo só gzip."))
+
+        conexao = connections['default']
+        nome_original = conexao.settings_dict['NAME']
+        with tempfile.TemporaryDirectory() as pasta:
+            if conexao.vendor == 'sqlite':
+                conexao.settings_dict['TEST']['NAME'] = str(Path(pasta) / 'benchmark.sqlite3')
+            conexao.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                caches[settings.ACERVO_CACHE_ALIAS].clear()
+                call_command('seed_biblioteca', escala=options['escala'], semente=options['semente'], stdout=io.StringIO())
+                ativos = Emprestimo.objects.ativos().count()
+                self.stdout.write(
+                    f"Escala {options['escala']}: {ativos} empréstimos ativos "
+                    f"(linhas do relatório de livros emprestados)."
+                )
+                cookie = self.sessao_logada()
+                resultados = self.medir(cookie, codificacoes, options)
+            finally:
+                conexao.creation.destroy_test_db(nome_original, verbosity=0)
+
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                json.dump({
+                    'gerado_em': timezone.now().isoformat(),
+                    'escala': options['escala'],
+                    'emprestimos_ativos': ativos,
+                    'banda_mbps': options['banda_mbps'],
+                    'casos': resultados,
+                }, arquivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Relatório gravado em {options['saida']}.")
+
+    def sessao_logada(self):
+        cliente = Client()
+        sessao = cliente.session
+        sessao['funcionario_logado_id'] = Funcionario.objects.order_by('pk').values_list('pk', flat=True).first()
+        sessao['funcionario_logado_nome'] = 'Benchmark'
+        sessao.save()
+        return f'{settings.SESSION_COOKIE_NAME}={sessao.session_key}'
+
+    def medir(self, cookie, codificacoes, options):
+        servidor = WSGIServer(('127.0.0.1', 0), _HandlerSilencioso)
+        servidor.set_app(get_internal_wsgi_application())
+        thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+        thread.start()
+        porta = servidor.server_address[1]
+        bytes_por_segundo = options['banda_mbps'] * 1_000_000 / 8
+        repeticoes = max(1, options['repeticoes'])
+
+        self.stdout.write(
+            f"\n{'caso':<52} {'codificação':<15} {'status':>6} {'bytes':>10} "
+            f"{'1º byte':>9} {'último':>9} {'estimado':>10}"
+        )
+        resultados = []
+        try:
+            for nome, parametros, query in PAGINAS:
+                url = reverse(nome, kwargs=parametros)
+                if query:
+                    url = f'{url}?{query}'
+                etag = None
+                for rotulo, aceita in codificacoes:
+                    cabecalhos = {'Cookie': cookie, 'Accept-Encoding': aceita}
+                    medida = self.requisitar(porta, url, cabecalhos, repeticoes)
+                    etag = medida.pop('etag') or etag
+                    resultados.append(self.registrar(url, rotulo, medida, bytes_por_segundo))
+                if etag:
+                    # O navegador revalidando a página que já tem
+                    cabecalhos = {'Cookie': cookie, 'Accept-Encoding': 'gzip', 'If-None-Match': etag}
+                    medida = self.requisitar(porta, url, cabecalhos, repeticoes)
+                    medida.pop('etag')
+                    resultados.append(self.registrar(url, 'revalidação', medida, bytes_por_segundo))
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+        return resultados
+
+    def requisitar(self, porta, url, cabecalhos, repeticoes):
+        """Mediana de `repeticoes` requisições, depois de uma para aquecer."""
+        primeiros, ultimos = [], []
+        for indice in range(repeticoes + 1):
+            conexao = http.client.HTTPConnection('127.0.0.1', porta)
+            inicio = time.perf_counter()
+            conexao.request('GET', url, headers=cabecalhos)
+            resposta = conexao.getresponse()
+            primeiro = time.perf_counter() - inicio
+            corpo = resposta.read()  # sem descomprimir: são os bytes que trafegam
+            ultimo = time.perf_counter() - inicio
+            conexao.close()
+            if indice:
+                primeiros.append(primeiro)
+                ultimos.append(ultimo)
+        linha_status = len(f'HTTP/1.1 {resposta.status} {resposta.reason}\r\n')
+        return {
+            'status': resposta.status,
+            'codificacao': resposta.getheader('Content-Encoding', 'identity'),
+            'bytes': linha_status + len(bytes(resposta.msg)) + len(corpo),
+            'primeiro_byte_ms': statistics.median(primeiros) * 1000,
+            'ultimo_byte_ms': statistics.median(ultimos) * 1000,
+            'etag': resposta.getheader('ETag'),
+        }
+
+    def registrar(self, url, rotulo, medida, bytes_por_segundo):
+        medida['caso'] = url
+        medida['rotulo'] = rotulo
+        medida['estimado_ms'] = medida['ultimo_byte_ms'] + medida['bytes'] / bytes_por_segundo * 1000
+        for chave in ('primeiro_byte_ms', 'ultimo_byte_ms', 'estimado_ms'):
+            medida[chave] = round(medida[chave], 2)
+        self.stdout.write(
+            f"{url[:52]:<52} {rotulo:<15} {medida['status']:>6} {medida['bytes']:>10} "
+            f"{medida['primeiro_byte_ms']:>7.1f}ms {medida['ultimo_byte_ms']:>7.1f}ms "
+            f"{medida['estimado_ms']:>8.1f}ms"
+        )
+        return medida
@@ -0,0 +1,134 @@
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.utils import timezone
+
+from biblioteca.models import Emprestimo, Leitor, Livro
+
+PERFIS = {
+    'padrao': {},
+    'producao': settings.SQLITE_OPCOES_PRODUCAO,
+}
+
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede leituras e escritas concorrentes no SQLite com o perfil padrão e com o "
+        "perfil de produção (WAL, PRAGMAs e BEGIN IMMEDIATE, ver SQLITE_OPCOES_PRODUCAO). "
+        "Cada perfil roda numa cópia própria do banco atual; o banco original não é alterado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Balcões simultâneos.")
+        parser.add_argument('--segundos', type=float, default=5.0, help="Duração de cada perfil.")
+        parser.add_argument('--escritas', type=float, default=0.2, help="Fração das operações que escrevem.")
+
+    def handle(self, *args, **options):
+        base = connections.settings['default']
+        if base['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("O benchmark só faz sentido com o banco SQLite.")
+
+        self.livros = list(Livro.objects.values_list('id', flat=True)[:2000])
+        self.leitor_id = Leitor.objects.values_list('id', flat=True).first()
+        if not self.livros or self.leitor_id is None:
+            raise CommandError("O banco precisa de livros e de ao menos um leitor.")
+
+        with tempfile.TemporaryDirectory() as pasta:
+            resultados = []
+            for perfil, opcoes in PERFIS.items():
+                alias = f'benchmark_{perfil}'
+                copia = Path(pasta) / f'{perfil}.sqlite3'
+                # API de backup: copia também o que ainda estiver no arquivo -wal
+                with sqlite3.connect(base['NAME']) as origem, sqlite3.connect(copia) as destino:
+                    origem.backup(destino)
+                connections.settings[alias] = {**base, 'NAME': str(copia), 'OPTIONS': opcoes}
+                try:
+                    resultados.append((perfil, self.medir(alias, options)))
+                finally:
+                    connections[alias].close()
+                    del connections.settings[alias]
+
+        self.stdout.write(
+            f"{'perfil':<10} {'leituras/s':>11} {'escritas/s':>11} {'erros':>7} {'p95 leitura':>12} {'p95 escrita':>12}"
+        )
+        for perfil, r in resultados:
+            self.stdout.write(
+                f"{perfil:<10} {r['leituras'] / r['duracao']:>11.1f} {r['escritas'] / r['duracao']:>11.1f} "
+                f"{r['erros']:>7} {r['p95_leitura'] * 1000:>10.1f}ms {r['p95_escrita'] * 1000:>10.1f}ms"
+            )
+
+    def medir(self, alias, options):
+        fim = time.monotonic() + options['segundos']
+        tempos_leitura, tempos_escrita = [], []
+        erros = []
+        trava = threading.Lock()
+
+        def balcao(semente):
+            aleatorio = random.Random(semente)
+            leituras, escritas, falhas = [], [], 0
+            try:
+                while time.monotonic() < fim:
+                    escreve = aleatorio.random() < options['escritas']
+                    inicio = time.perf_counter()
+                    try:
+                        if escreve:
+                            self.escrever(alias, aleatorio)
+                        else:
+                            self.ler(alias, aleatorio)
+                    except OperationalError:
+                        # "database is locked": a requisição falharia para o usuário
+                        falhas += 1
+                        continue
+                    (escritas if escreve else leituras).append(time.perf_counter() - inicio)
+            finally:
+                connections[alias].close()
+                with trava:
+                    tempos_leitura.extend(leituras)
+                    tempos_escrita.extend(escritas)
+                    erros.append(falhas)
+
+        inicio = time.monotonic()
+        threads = [threading.Thread(target=balcao, args=(i,)) for i in range(max(1, options['threads']))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {
+            'duracao': time.monotonic() - inicio,
+            'leituras': len(tempos_leitura),
+            'escritas': len(tempos_escrita),
+            'erros': sum(erros),
+            'p95_leitura': percentil(tempos_leitura, 0.95),
+            'p95_escrita': percentil(tempos_escrita, 0.95),
+        }
+
+    def ler(self, alias, aleatorio):
+        # Uma página do acervo e a contagem do painel de empréstimos
+        list(Livro.objects.using(alias).order_by('nome', 'id').filter(id__gte=aleatorio.choice(self.livros))[:25])
+        Emprestimo.objects.using(alias).ativos().count()
+
+    def escrever(self, alias, aleatorio):
+        # Padrão das views de cadastro: lê o registro e grava dentro da mesma transação
+        with transaction.atomic(using=alias):
+            livro = Livro.objects.using(alias).get(pk=aleatorio.choice(self.livros))
+            Livro.objects.using(alias).filter(pk=livro.pk).update(data_atualizacao=timezone.now())
+            hoje = timezone.localdate()
+            # bulk_create: sem sinais, que mexeriam nos contadores do banco 'default'
+            Emprestimo.objects.using(alias).bulk_create([Emprestimo(
+                livro_id=livro.pk, leitor_id=self.leitor_id, status='DEVOLVIDO',
+                data_emprestimo=hoje, data_devolucao_prevista=hoje, data_devolucao_real=hoje,
+            )])
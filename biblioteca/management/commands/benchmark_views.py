@@ -0,0 +1,271 @@
+import io
+import json
+import platform
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from biblioteca import urls
+from biblioteca.models import Emprestimo, Funcionario, Leitor, Livro
+
+# Um caso por URL nomeada de biblioteca/urls.py:
+# (nome da URL, parâmetros da URL, query string, orçamento de consultas, anônimo)
+# {funcionario}, {livro} etc. são trocados por IDs do banco gerado (ver ids_do_banco).
+# O orçamento é o máximo de consultas SQL da requisição (sessão incluída) e não
+# pode depender do volume de dados: se crescer com a escala, é um N+1.
+CASOS = [
+    ('login', {}, '', 0, True),
+    ('home', {}, '', 2, False),
+    ('funcionario_index', {}, '', 1, False),
+    ('cadastrar_funcionario', {}, '', 1, False),
+    ('funcionario_consultar', {}, '', 2, False),
+    ('funcionario_consultar', {}, 'q=ana', 2, False),
+    ('atualizar_funcionario', {'pk': '{funcionario}'}, '', 2, False),
+    ('excluir_funcionario', {'pk': '{funcionario}'}, '', 2, False),
+    ('leitor_index', {}, '', 1, False),
+    ('cadastrar_leitor', {}, '', 1, False),
+    ('leitor_consultar', {}, '', 2, False),
+    ('leitor_consultar', {}, 'q=maria', 2, False),
+    ('atualizar_leitor', {'pk': '{leitor}'}, '', 2, False),
+    ('excluir_leitor', {'pk': '{leitor}'}, '', 2, False),
+    ('livro_index', {}, '', 1, False),
+    ('cadastrar_livro', {}, '', 1, False),
+    ('livro_consultar', {}, '', 3, False),
+    ('livro_consultar', {}, 'status=emprestado', 3, False),
+    ('livro_consultar', {}, 'q=sertao', 3, False),
+    ('atualizar_livro', {'pk': '{livro}'}, '', 2, False),
+    ('excluir_livro', {'pk': '{livro}'}, '', 2, False),
+    ('emprestimo_index', {}, '', 1, False),
+    ('cadastrar_emprestimo', {}, '', 1, False),
+    ('consultar_emprestimos', {}, '', 4, False),
+    ('consultar_emprestimos', {}, 'aba=atrasados', 4, False),
+    ('consultar_emprestimos', {}, 'aba=historico', 5, False),
+    ('emprestar_lote', {}, '', 1, False),
+    ('devolver_lote', {}, '', 1, False),
+    ('devolver_lote', {}, 'leitor={leitor_com_ativos}', 4, False),
+    ('buscar_leitores', {}, 'q=jo', 2, False),
+    ('buscar_livros_disponiveis', {}, 'q=mar', 2, False),
+    ('atualizar_emprestimo', {'pk': '{emprestimo}'}, '', 2, False),
+    ('excluir_emprestimo', {'pk': '{emprestimo}'}, '', 3, False),
+    ('relatorio_index', {}, '', 2, False),
+    ('relatorio_livros_emprestados', {}, '', 2, False),
+    ('buscar_livros_catalogo', {}, 'q=tempo', 2, False),
+    ('relatorio_historico_livro', {}, '', 1, False),
+    ('relatorio_historico_livro', {}, 'livro_id={livro_popular}', 7, False),
+    ('relatorio_leitores_atrasados', {}, '', 2, False),
+    ('relatorio_exportar', {'relatorio': 'livros_emprestados', 'formato': 'csv'}, '', 2, False),
+    ('relatorio_exportar', {'relatorio': 'leitores_atrasados', 'formato': 'xlsx'}, '', 2, False),
+    ('relatorio_exportar', {'relatorio': 'historico_livro', 'formato': 'csv'}, 'livro_id={livro_popular}', 4, False),
+    ('metricas', {}, '', 1, False),
+    ('acervo', {}, '', 2, False),
+    ('acervo', {}, 'q=noite', 2, False),
+    # Anônimo: servido do cache do acervo, aquecido pela primeira requisição
+    ('acervo', {}, 'q=noite', 0, True),
+    ('acervo_sugestoes', {}, 'q=cid', 1, False),
+]
+
+# URLs sem caso, com o motivo
+IGNORADAS = {
+    'logout': "encerraria a sessão do cliente do benchmark",
+}
+
+
+def ids_do_banco():
+    return {
+        'funcionario': Funcionario.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'leitor': Leitor.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'livro': Livro.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'emprestimo': Emprestimo.objects.ativos().order_by('pk').values_list('pk', flat=True).first(),
+        'leitor_com_ativos': Emprestimo.objects.ativos().order_by('pk').values_list('leitor', flat=True).first(),
+        'livro_popular': Emprestimo.objects.values('livro').annotate(total=Count('id'))
+        .order_by('-total', 'livro').values_list('livro', flat=True).first(),
+    }
+
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o tempo e o número de consultas SQL de cada URL de biblioteca/urls.py em "
+        "bancos gerados pelo seed_biblioteca em várias escalas, e falha se alguma view "
+        "passar do seu orçamento de consultas. Cada escala usa um banco de teste "
+        "temporário (como o `manage.py test`); o banco configurado não é alterado. "
+        "O relatório JSON pode ser comparado entre versões com --comparar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escalas', default='0.1,1', help="Escalas do seed_biblioteca, separadas por vírgula.")
+        parser.add_argument('--repeticoes', type=int, default=5, help="Requisições medidas por caso.")
+        parser.add_argument('--semente', type=int, default=42, help="Semente do seed_biblioteca.")
+        parser.add_argument('--saida', default='benchmark_views.json', help="Arquivo do relatório JSON.")
+        parser.add_argument('--comparar', help="Relatório JSON anterior para comparar.")
+
+    def handle(self, *args, **options):
+        try:
+            escalas = [float(escala) for escala in options['escalas'].split(',') if escala.strip()]
+        except ValueError:
+            raise CommandError("--escalas deve ser uma lista de números, ex: 0.1,1,5")
+        anterior = None
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as arquivo:
+                anterior = json.load(arquivo)
+
+        falhas = [
+            f"{nome}: URL sem caso no benchmark"
+            for nome in self.nomes_de_url() if nome not in IGNORADAS and nome not in {caso[0] for caso in CASOS}
+        ]
+        relatorio = {
+            'gerado_em': timezone.now().isoformat(),
+            'banco': connections['default'].vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'repeticoes': options['repeticoes'],
+            'semente': options['semente'],
+            'escalas': [],
+        }
+        for escala in escalas:
+            resultado = self.medir_escala(escala, options)
+            relatorio['escalas'].append(resultado)
+            falhas += [f"escala {escala}: {caso['caso']}: {caso['falha']}" for caso in resultado['casos'] if caso['falha']]
+        relatorio['falhas'] = falhas
+
+        with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+        if anterior:
+            self.comparar(anterior, relatorio)
+        self.stdout.write(f"Relatório gravado em {options['saida']}.")
+
+        if falhas:
+            for falha in falhas:
+                self.stdout.write(self.style.ERROR(falha))
+            raise CommandError(f"{len(falhas)} falha(s) no benchmark.")
+        self.stdout.write(self.style.SUCCESS("Todas as views dentro do orçamento de consultas."))
+
+    def nomes_de_url(self):
+        return {padrao.name for padrao in urls.urlpatterns if isinstance(padrao, URLPattern) and padrao.name}
+
+    def medir_escala(self, escala, options):
+        conexao = connections['default']
+        nome_original = conexao.settings_dict['NAME']
+        with tempfile.TemporaryDirectory() as pasta:
+            if conexao.vendor == 'sqlite':
+                # Em arquivo, como em produção (o padrão do teste seria em memória)
+                conexao.settings_dict['TEST']['NAME'] = str(Path(pasta) / 'benchmark.sqlite3')
+            conexao.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                # Os dados da escala anterior não podem vir do cache do acervo
+                caches[settings.ACERVO_CACHE_ALIAS].clear()
+                inicio = time.monotonic()
+                call_command('seed_biblioteca', escala=escala, semente=options['semente'], stdout=io.StringIO())
+                duracao_seed = time.monotonic() - inicio
+                volumes = {
+                    'funcionarios': Funcionario.objects.count(),
+                    'leitores': Leitor.objects.count(),
+                    'livros': Livro.objects.count(),
+                    'emprestimos': Emprestimo.objects.count(),
+                }
+                self.stdout.write(
+                    f"\nEscala {escala}: {volumes['livros']} livros, {volumes['emprestimos']} empréstimos "
+                    f"(gerados em {duracao_seed:.1f}s)"
+                )
+                casos = self.medir_casos(ids_do_banco(), max(1, options['repeticoes']))
+            finally:
+                conexao.creation.destroy_test_db(nome_original, verbosity=0)
+        return {'escala': escala, 'volumes': volumes, 'seed_segundos': round(duracao_seed, 2), 'casos': casos}
+
+    def clientes(self, ids):
+        anonimo = Client(SERVER_NAME='localhost')
+        logado = Client(SERVER_NAME='localhost')
+        sessao = logado.session
+        sessao['funcionario_logado_id'] = ids['funcionario']
+        sessao['funcionario_logado_nome'] = 'Benchmark'
+        sessao.save()
+        logado.cookies[settings.SESSION_COOKIE_NAME] = sessao.session_key
+        return anonimo, logado
+
+    def medir_casos(self, ids, repeticoes):
+        anonimo, logado = self.clientes(ids)
+        self.stdout.write(f"{'caso':<62} {'status':>6} {'SQL':>4} {'orç.':>4} {'mediana':>9} {'p95':>9}")
+        resultados = []
+        for nome, parametros, query, orcamento, sem_login in CASOS:
+            url = reverse(nome, kwargs={chave: valor.format(**ids) for chave, valor in parametros.items()})
+            if query:
+                url = f'{url}?{query.format(**ids)}'
+            caso = f'{url} (anônimo)' if sem_login else url
+            cliente = anonimo if sem_login else logado
+
+            self.requisitar(cliente, url)  # aquece caches e conexões
+            tempos, consultas, status = [], 0, 0
+            for _ in range(repeticoes):
+                with CaptureQueriesContext(connections['default']) as capturadas:
+                    inicio = time.perf_counter()
+                    status = self.requisitar(cliente, url)
+                    tempos.append(time.perf_counter() - inicio)
+                consultas = max(consultas, len(capturadas))
+
+            falha = None
+            if status >= 400:
+                falha = f"status {status}"
+            elif consultas > orcamento:
+                falha = f"{consultas} consultas, orçamento de {orcamento}"
+            resultado = {
+                'caso': caso,
+                'url': nome,
+                'status': status,
+                'consultas': consultas,
+                'orcamento': orcamento,
+                'mediana_ms': round(statistics.median(tempos) * 1000, 2),
+                'p95_ms': round(percentil(tempos, 0.95) * 1000, 2),
+                'falha': falha,
+            }
+            resultados.append(resultado)
+            linha = (
+                f"{caso[:62]:<62} {status:>6} {consultas:>4} {orcamento:>4} "
+                f"{resultado['mediana_ms']:>7.1f}ms {resultado['p95_ms']:>7.1f}ms"
+            )
+            self.stdout.write(self.style.ERROR(linha) if falha else linha)
+        return resultados
+
+    def requisitar(self, cliente, url):
+        resposta = cliente.get(url)
+        if resposta.streaming:
+            # As exportações consultam o banco enquanto o corpo é gerado
+            for _ in resposta.streaming_content:
+                pass
+        return resposta.status_code
+
+    def comparar(self, anterior, atual):
+        medidas = {
+            (escala['escala'], caso['caso']): caso
+            for escala in anterior.get('escalas', []) for caso in escala['casos']
+        }
+        self.stdout.write(f"\nComparação com o relatório de {anterior.get('gerado_em', '?')}:")
+        self.stdout.write(f"{'escala':>6} {'caso':<62} {'SQL':>9} {'mediana':>20}")
+        for escala in atual['escalas']:
+            for caso in escala['casos']:
+                antes = medidas.get((escala['escala'], caso['caso']))
+                if not antes:
+                    continue
+                variacao = (caso['mediana_ms'] / antes['mediana_ms'] - 1) * 100 if antes['mediana_ms'] else 0.0
+                self.stdout.write(
+                    f"{escala['escala']:>6} {caso['caso'][:62]:<62} {antes['consultas']:>4}->{caso['consultas']:<4} "
+                    f"{antes['mediana_ms']:>7.1f}->{caso['mediana_ms']:<7.1f} {variacao:+5.0f}%"
+                )
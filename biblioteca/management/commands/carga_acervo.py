@@ -0,0 +1,209 @@
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import quote, urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from biblioteca.models import Livro
+
+MODOS = ('wsgi', 'asgi')
+
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+def resumo(modo, duracoes, erros, total_segundos):
+    return {
+        'modo': modo,
+        'requisicoes': len(duracoes),
+        'erros': erros,
+        'rps': len(duracoes) / total_segundos if total_segundos else 0.0,
+        'p50_ms': percentil(duracoes, 0.50) * 1000,
+        'p95_ms': percentil(duracoes, 0.95) * 1000,
+    }
+
+
+def caminhos_de_teste(quantidade, semente=42):
+    """Mistura de páginas do acervo, buscas e sugestões com termos reais do catálogo."""
+    aleatorio = random.Random(semente)
+    palavras = []
+    for nome in Livro.objects.order_by('?').values_list('nome', flat=True)[:200]:
+        palavras += [palavra for palavra in nome.split() if len(palavra) >= 3]
+    palavras = palavras or ['livro']
+    caminhos = []
+    for i in range(quantidade):
+        termo = aleatorio.choice(palavras)
+        caminhos.append(['/acervo/', f'/acervo/?q={quote(termo)}', f'/acervo/sugestoes/?q={quote(termo[:3])}'][i % 3])
+    return caminhos
+
+
+def requisicao_wsgi(aplicacao, caminho):
+    partes = urlsplit(caminho)
+    environ = {'PATH_INFO': partes.path, 'QUERY_STRING': partes.query, 'wsgi.input': BytesIO()}
+    setup_testing_defaults(environ)
+    status = []
+    resposta = aplicacao(environ, lambda s, headers, exc_info=None: status.append(s))
+    try:
+        b''.join(resposta)
+    finally:
+        if hasattr(resposta, 'close'):
+            resposta.close()
+    return int(status[0].split()[0])
+
+
+async def requisicao_asgi(aplicacao, caminho):
+    partes = urlsplit(caminho)
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': partes.path, 'raw_path': partes.path.encode(),
+        'query_string': partes.query.encode(), 'headers': [(b'host', b'localhost')],
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+    }
+    corpo_enviado = False
+    fim = asyncio.Event()
+    status = []
+
+    async def receive():
+        nonlocal corpo_enviado
+        if not corpo_enviado:
+            corpo_enviado = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # O Django fica escutando um http.disconnect; o cliente nunca desconecta
+        await fim.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(mensagem):
+        if mensagem['type'] == 'http.response.start':
+            status.append(mensagem['status'])
+
+    try:
+        await aplicacao(scope, receive, send)
+    finally:
+        fim.set()
+    return status[0]
+
+
+def requisicao_http(url_base, caminho):
+    with urllib.request.urlopen(url_base.rstrip('/') + caminho) as resposta:
+        resposta.read()
+        return resposta.status
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga do acervo público (/acervo/, busca e sugestões) comparando o "
+        "caminho WSGI (biblioteca/wsgi.py, views síncronas) com o ASGI (biblioteca/asgi.py, "
+        "views assíncronas). Sem --url, cada modo roda em processo separado chamando a "
+        "aplicação diretamente; com --url, dispara HTTP contra um servidor já no ar "
+        "(ex: gunicorn biblioteca.wsgi ou uvicorn biblioteca.asgi:application)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisicoes', type=int, default=600, help="Total de requisições por modo.")
+        parser.add_argument('--concorrencia', type=int, default=20, help="Requisições simultâneas.")
+        parser.add_argument('--usar-cache', action='store_true',
+                            help="Mantém o cache do acervo (por padrão é desligado para medir as consultas).")
+        parser.add_argument('--url', help="URL base de um servidor em execução (mede só esse servidor).")
+        parser.add_argument('--modo', choices=MODOS, help="Uso interno: executa só este modo e imprime JSON.")
+
+    def handle(self, *args, **options):
+        caminhos = caminhos_de_teste(options['requisicoes'])
+        if options['url']:
+            self.exibir([self.medir_http(options['url'], caminhos, options['concorrencia'])])
+        elif options['modo']:
+            self.stdout.write(json.dumps(self.medir_em_processo(options['modo'], caminhos, options)))
+        else:
+            self.exibir([self.rodar_subprocesso(modo, options) for modo in MODOS])
+
+    def rodar_subprocesso(self, modo, options):
+        # Cada modo precisa de um processo próprio: o urls.py escolhe as views
+        # pela variável BIBLIOTECA_ASGI quando é importado.
+        comando = [
+            sys.executable, sys.argv[0], 'carga_acervo', '--modo', modo,
+            '--requisicoes', str(options['requisicoes']), '--concorrencia', str(options['concorrencia']),
+        ]
+        if options['usar_cache']:
+            comando.append('--usar-cache')
+        ambiente = dict(os.environ, BIBLIOTECA_ASGI='1' if modo == 'asgi' else '0')
+        processo = subprocess.run(comando, env=ambiente, capture_output=True, text=True)
+        if processo.returncode != 0:
+            raise CommandError(f"Falha no modo {modo}:\n{processo.stderr}")
+        return json.loads(processo.stdout.strip().splitlines()[-1])
+
+    def medir_em_processo(self, modo, caminhos, options):
+        if (modo == 'asgi') != settings.BIBLIOTECA_ASGI:
+            raise CommandError("Defina BIBLIOTECA_ASGI=1 para o modo asgi (e 0 para wsgi).")
+        ajustes = {}
+        if not options['usar_cache']:
+            ajustes = {
+                'CACHES': {**settings.CACHES, 'carga': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+                'ACERVO_CACHE_ALIAS': 'carga',
+            }
+        with override_settings(**ajustes):
+            if modo == 'asgi':
+                from biblioteca.asgi import application
+                return asyncio.run(self.medir_asgi(application, caminhos, options['concorrencia']))
+            from biblioteca.wsgi import application
+            return self.medir_com_threads('wsgi', lambda caminho: requisicao_wsgi(application, caminho),
+                                          caminhos, options['concorrencia'])
+
+    async def medir_asgi(self, aplicacao, caminhos, concorrencia):
+        await requisicao_asgi(aplicacao, caminhos[0])  # aquece (FTS, cache de templates)
+        fila = iter(caminhos)
+        duracoes, erros = [], 0
+
+        async def trabalhador():
+            nonlocal erros
+            for caminho in fila:
+                inicio = time.perf_counter()
+                if await requisicao_asgi(aplicacao, caminho) >= 400:
+                    erros += 1
+                duracoes.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+        return resumo('asgi', duracoes, erros, time.perf_counter() - inicio)
+
+    def medir_com_threads(self, modo, requisicao, caminhos, concorrencia):
+        requisicao(caminhos[0])  # aquece
+
+        def cronometrar(caminho):
+            inicio = time.perf_counter()
+            try:
+                falhou = requisicao(caminho) >= 400
+            except OSError:
+                falhou = True
+            return time.perf_counter() - inicio, falhou
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+            resultados = list(executor.map(cronometrar, caminhos))
+        total = time.perf_counter() - inicio
+        return resumo(modo, [duracao for duracao, _ in resultados], sum(falhou for _, falhou in resultados), total)
+
+    def medir_http(self, url_base, caminhos, concorrencia):
+        return self.medir_com_threads(url_base, lambda caminho: requisicao_http(url_base, caminho),
+                                      caminhos, concorrencia)
+
+    def exibir(self, resultados):
+        self.stdout.write(f"{'modo':<30} {'req':>6} {'erros':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        for r in resultados:
+            self.stdout.write(
+                f"{r['modo']:<30} {r['requisicoes']:>6} {r['erros']:>6} {r['rps']:>9.1f} "
+                f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f}"
+            )
@@ -0,0 +1,130 @@
+import csv
+import itertools
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from biblioteca import cache_acervo, contadores
+from biblioteca.forms import LivroForm
+from biblioteca.importacao import CAMPOS_LIVRO, ler_csv, ler_marc
+from biblioteca.models import Livro
+
+
+class LivroImportacaoForm(LivroForm):
+    """
+    Mesmas regras do LivroForm, sem a checagem de ISBN único linha a linha
+    (uma consulta por livro). A duplicidade é tratada por lote no comando.
+    """
+
+    def validate_unique(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa livros em massa de um arquivo CSV (colunas nome, isbn, autor, genero, "
+        "data_publicacao) ou MARC21 (.mrc), lendo em streaming e gravando por lotes. "
+        "Livros com ISBN já cadastrado são ignorados; linhas inválidas vão para o arquivo de erros."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help="Caminho do arquivo CSV ou MARC21.")
+        parser.add_argument('--formato', choices=['csv', 'marc'], help="Padrão: deduzido pela extensão.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Livros por lote/transação.")
+        parser.add_argument('--delimitador', default=',', help="Delimitador do CSV.")
+        parser.add_argument('--encoding', default='utf-8-sig', help="Codificação do CSV.")
+        parser.add_argument('--erros', default=None, help="Arquivo CSV de rejeitados (padrão: <arquivo>.erros.csv).")
+
+    def handle(self, *args, **options):
+        caminho = options['arquivo']
+        formato = options['formato'] or ('marc' if caminho.lower().endswith(('.mrc', '.marc')) else 'csv')
+        lote_maximo = max(1, options['batch_size'])
+        caminho_erros = options['erros'] or f'{caminho}.erros.csv'
+
+        try:
+            if formato == 'marc':
+                entrada = open(caminho, 'rb')
+                linhas = ler_marc(entrada)
+            else:
+                entrada = open(caminho, newline='', encoding=options['encoding'])
+                linhas = ler_csv(entrada, options['delimitador'])
+        except OSError as exc:
+            raise CommandError(f"Não foi possível abrir {caminho}: {exc}")
+
+        self.inicio = time.monotonic()
+        self.lidos = self.inseridos = self.duplicados = self.rejeitados = 0
+
+        with entrada, open(caminho_erros, 'w', newline='', encoding='utf-8') as arquivo_erros:
+            self.erros = csv.writer(arquivo_erros)
+            self.erros.writerow(['linha', *CAMPOS_LIVRO, 'erro'])
+
+            numeradas = enumerate(linhas, start=1)
+            while True:
+                lote = list(itertools.islice(numeradas, lote_maximo))
+                if not lote:
+                    break
+                self.processar_lote(lote)
+                self.relatar_progresso()
+
+        duracao = time.monotonic() - self.inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Concluído: {self.lidos} lidos, {self.inseridos} inseridos, {self.duplicados} duplicados, "
+            f"{self.rejeitados} rejeitados em {duracao:.1f}s."
+        ))
+        if self.rejeitados:
+            self.stdout.write(f"Linhas rejeitadas em {caminho_erros}")
+
+    def rejeitar(self, numero, dados, erro):
+        self.rejeitados += 1
+        self.erros.writerow([numero, *(dados.get(campo, '') for campo in CAMPOS_LIVRO), erro])
+
+    def processar_lote(self, lote):
+        validos = []
+        # Só os ISBNs deste lote: os de lotes anteriores já estão no banco e
+        # caem na consulta de existentes, então a memória não cresce com o arquivo
+        isbns_vistos = set()
+        for numero, dados in lote:
+            self.lidos += 1
+            form = LivroImportacaoForm(data=dados)
+            if not form.is_valid():
+                erro = '; '.join(f'{campo}: {" ".join(msgs)}' for campo, msgs in form.errors.items())
+                self.rejeitar(numero, dados, erro)
+                continue
+            isbn = form.cleaned_data['isbn']
+            if isbn in isbns_vistos:
+                self.duplicados += 1
+                continue
+            isbns_vistos.add(isbn)
+            validos.append(Livro(**form.cleaned_data))
+
+        for tentativa in range(2):
+            # Uma consulta por lote para descartar ISBNs que já estão no banco
+            existentes = set(
+                Livro.objects.filter(isbn__in=[livro.isbn for livro in validos]).values_list('isbn', flat=True)
+            )
+            novos = [livro for livro in validos if livro.isbn not in existentes]
+            try:
+                with transaction.atomic():
+                    Livro.objects.bulk_create(novos)
+                    if novos:
+                        # bulk_create não dispara sinais: o painel e o cache do
+                        # acervo acompanham cada lote gravado, mesmo que a
+                        # importação pare no meio do arquivo
+                        contadores.ajustar(livros=len(novos))
+                        transaction.on_commit(cache_acervo.invalidar)
+            except IntegrityError:
+                # Alguém cadastrou um destes ISBNs entre a checagem e o insert
+                if tentativa:
+                    raise
+                continue
+            self.duplicados += len(validos) - len(novos)
+            self.inseridos += len(novos)
+            return
+
+    def relatar_progresso(self):
+        duracao = max(time.monotonic() - self.inicio, 1e-6)
+        self.stdout.write(
+            f"{self.lidos} lidos | {self.inseridos} inseridos | {self.duplicados} duplicados | "
+            f"{self.rejeitados} rejeitados | {self.lidos / duracao:.0f} linhas/s"
+        )
@@ -0,0 +1,121 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.utils import timezone
+
+from biblioteca import contadores
+from biblioteca.models import Emprestimo, EmprestimoArquivado, ExecucaoTarefa, Funcionario, Leitor, Livro
+
+ORIGEM = 'sqlite_origem'
+
+# Na ordem das chaves estrangeiras. ContadoresPainel não é copiado: é
+# recalculado no destino no final.
+MODELOS = [Funcionario, Leitor, Livro, Emprestimo, EmprestimoArquivado, ExecucaoTarefa]
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia os dados da biblioteca de um arquivo SQLite para o banco configurado "
+        "(BIBLIOTECA_DB=postgres), mantendo IDs e datas. Rode `migrate` no Postgres antes; "
+        "o destino precisa estar vazio. Tudo roda numa transação: se algo falhar, nada fica gravado. "
+        "Sessões não são copiadas (os funcionários entram de novo)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--origem', default=str(settings.BASE_DIR / 'db.sqlite3'),
+            help="Arquivo SQLite de origem (padrão: db.sqlite3 do projeto).",
+        )
+        parser.add_argument('--lote', type=int, default=2000, help="Linhas por INSERT.")
+
+    def handle(self, *args, **options):
+        destino = connections['default']
+        if destino.vendor != 'postgresql':
+            raise CommandError("Configure o destino com BIBLIOTECA_DB=postgres (ver settings.py).")
+
+        # Alias temporário para ler a origem pelo ORM, que converte datas e
+        # decimais do formato do SQLite
+        connections.settings[ORIGEM] = connections.configure_settings({
+            'default': connections.settings['default'],
+            ORIGEM: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': options['origem']},
+        })[ORIGEM]
+        try:
+            ocupados = [modelo.__name__ for modelo in MODELOS if modelo.objects.exists()]
+            if ocupados:
+                raise CommandError(f"O destino já tem dados ({', '.join(ocupados)}); use um banco vazio.")
+
+            inicio = time.monotonic()
+            self.agora = timezone.now()
+            with transaction.atomic():
+                for modelo in MODELOS:
+                    copiados, corrigidos = self.copiar(modelo, max(1, options['lote']))
+                    aviso = f" ({corrigidos} com data de criação/atualização ilegível, gravada como agora)" if corrigidos else ''
+                    self.stdout.write(f"{modelo.__name__}: {copiados} registros{aviso}")
+                with destino.cursor() as cursor:
+                    # As sequências dos IDs continuam do maior ID copiado
+                    for sql in destino.ops.sequence_reset_sql(no_style(), MODELOS):
+                        cursor.execute(sql)
+                    # ...e também dos arquivados, que guardam os IDs de Emprestimo
+                    emprestimo = destino.ops.quote_name(Emprestimo._meta.db_table)
+                    arquivo = destino.ops.quote_name(EmprestimoArquivado._meta.db_table)
+                    cursor.execute(
+                        f"SELECT setval(pg_get_serial_sequence(%s, 'id'), max(id)) FROM {arquivo} "
+                        f"HAVING max(id) > (SELECT coalesce(max(id), 0) FROM {emprestimo})",
+                        [Emprestimo._meta.db_table],
+                    )
+                contadores.reconstruir()
+
+            for modelo in MODELOS:
+                na_origem = modelo.objects.using(ORIGEM).count()
+                no_destino = modelo.objects.count()
+                if na_origem != no_destino:
+                    raise CommandError(f"{modelo.__name__}: {na_origem} na origem e {no_destino} no destino.")
+        finally:
+            connections[ORIGEM].close()
+            del connections.settings[ORIGEM]
+
+        self.stdout.write(self.style.SUCCESS(f"Dados copiados em {time.monotonic() - inicio:.1f}s."))
+
+    def copiar(self, modelo, tamanho_lote):
+        campos = modelo._meta.local_concrete_fields
+        obrigatorios = [campo for campo in campos if not campo.null and not campo.primary_key]
+        total = corrigidos = 0
+        lote = []
+        for objeto in modelo.objects.using(ORIGEM).order_by('pk').iterator(chunk_size=tamanho_lote):
+            corrigidos += self.corrigir(objeto, obrigatorios)
+            lote.append(objeto)
+            if len(lote) == tamanho_lote:
+                total += self.inserir(modelo, campos, lote)
+                lote = []
+        if lote:
+            total += self.inserir(modelo, campos, lote)
+        return total, corrigidos
+
+    def corrigir(self, objeto, obrigatorios):
+        """
+        O SQLite aceita qualquer texto numa coluna de data (ex: '22062025' no
+        funcionário admin original), que o ORM lê como None e o Postgres
+        recusaria. Datas automáticas recebem o momento da migração; qualquer
+        outro campo obrigatório vazio interrompe a cópia.
+        """
+        corrigido = False
+        for campo in obrigatorios:
+            if getattr(objeto, campo.attname) is not None:
+                continue
+            if getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False):
+                setattr(objeto, campo.attname, self.agora)
+                corrigido = True
+            else:
+                raise CommandError(
+                    f"{type(objeto).__name__} {objeto.pk}: campo obrigatório '{campo.name}' vazio ou ilegível na origem."
+                )
+        return int(corrigido)
+
+    def inserir(self, modelo, campos, lote):
+        # raw=True grava os valores como vieram: sem save(), sinais nem
+        # auto_now/auto_now_add, que trocariam as datas originais por agora
+        modelo._base_manager._insert(lote, fields=campos, raw=True, using='default')
+        return len(lote)
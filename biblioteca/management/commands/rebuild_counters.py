@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca import contadores
+
+
+class Command(BaseCommand):
+    help = "Recalcula do zero os contadores do dashboard (use se os números divergirem)."
+
+    def handle(self, *args, **options):
+        antes = contadores.obter()
+        depois = contadores.reconstruir()
+        for campo in ('livros', 'leitores', 'funcionarios', 'emprestimos_ativos', 'emprestimos_arquivados'):
+            valor_antes, valor_depois = getattr(antes, campo), getattr(depois, campo)
+            marca = '' if valor_antes == valor_depois else f'  (era {valor_antes})'
+            self.stdout.write(f"{campo}: {valor_depois}{marca}")
+        self.stdout.write(self.style.SUCCESS("Contadores reconstruídos."))
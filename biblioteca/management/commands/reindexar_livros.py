@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from biblioteca.busca import fts_disponivel, garantir_triggers_fts, motor_busca, reconstruir_indice_fts
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice de busca (FTS5) dos livros a partir da tabela biblioteca_livro."
+
+    def handle(self, *args, **options):
+        if motor_busca() == 'postgres':
+            self.stdout.write("No PostgreSQL o índice GIN é mantido pelo próprio banco; nada a fazer.")
+            return
+        if not fts_disponivel():
+            raise CommandError("Índice FTS5 indisponível neste banco. Rode `migrate` no SQLite.")
+        garantir_triggers_fts()
+        reconstruir_indice_fts()
+        self.stdout.write(self.style.SUCCESS("Índice de busca de livros reconstruído."))
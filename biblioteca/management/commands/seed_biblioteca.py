@@ -0,0 +1,200 @@
+import datetime
+import random
+import time
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from biblioteca import cache_acervo, contadores
+from biblioteca.busca import normalizar_texto
+from biblioteca.emprestimos import PRAZO_DEVOLUCAO
+from biblioteca.models import Emprestimo, Funcionario, Leitor, Livro, preencher_campos_normalizados
+
+# Volumes com --escala 1: uma biblioteca de bairro com dois anos de histórico
+VOLUMES = {
+    'funcionarios': 10,
+    'leitores': 1000,
+    'livros': 5000,
+    'emprestimos': 20000,
+}
+DIAS_DE_HISTORICO = 730
+# Fração dos livros que está emprestada agora
+FRACAO_ATIVOS = 0.08
+
+PRENOMES = [
+    'Ana', 'João', 'Maria', 'José', 'Antônio', 'Francisca', 'Carlos', 'Paulo', 'Lúcia', 'Pedro',
+    'Marcos', 'Luís', 'Gabriel', 'Rafael', 'Júlia', 'Letícia', 'Fernanda', 'Mateus', 'Beatriz', 'André',
+    'Sérgio', 'Patrícia', 'Cláudia', 'Márcio', 'Vitória', 'Isabela', 'Caio', 'Raí', 'Débora', 'Conceição',
+]
+SOBRENOMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+    'Ribeiro', 'Carvalho', 'Araújo', 'Martins', 'Rocha', 'Barbosa', 'Mendanha', 'Conceição', 'Magalhães', 'Brandão',
+]
+PALAVRAS_TITULO = [
+    'Memórias', 'Crônicas', 'Sertão', 'Cidade', 'Rio', 'Noite', 'Sol', 'Tempo', 'Mar', 'Caminho',
+    'Segredo', 'Jardim', 'Fogo', 'Silêncio', 'Viagem', 'História', 'Coração', 'Sombra', 'Estrela', 'Casa',
+]
+COMPLEMENTOS_TITULO = [
+    'do Norte', 'de Pedra', 'Perdido', 'sem Fim', 'das Águas', 'de Inverno', 'Esquecido', 'da Serra',
+    'em Chamas', 'de Vidro', 'Antigo', 'do Cerrado', 'Distante', 'de Papel', 'Secreto',
+]
+GENEROS = [
+    'Romance', 'Ficção científica', 'Fantasia', 'Poesia', 'Biografia', 'História', 'Infantojuvenil',
+    'Suspense', 'Didático', 'Autoajuda', None,
+]
+
+
+def digito_isbn13(doze_digitos):
+    soma = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(doze_digitos))
+    return str((10 - soma % 10) % 10)
+
+
+def gerar_isbn(sequencia):
+    """ISBN-13 válido e único por sequência: 978-65-SSSSS-SS-D (17 caracteres)."""
+    numero = f'{sequencia:07d}'
+    return f'978-65-{numero[:5]}-{numero[5:]}-{digito_isbn13("97865" + numero)}'
+
+
+def gerar_cpf(sequencia):
+    """CPF com dígitos verificadores válidos e único por sequência."""
+    base = [int(d) for d in f'{sequencia:09d}']
+    for tamanho in (9, 10):
+        soma = sum(d * peso for d, peso in zip(base, range(tamanho + 1, 1, -1)))
+        base.append(0 if soma % 11 < 2 else 11 - soma % 11)
+    texto = ''.join(map(str, base))
+    return f'{texto[:3]}.{texto[3:6]}.{texto[6:9]}-{texto[9:]}'
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera dados de teste realistas (funcionários, leitores, livros e dois anos de "
+        f"empréstimos). Com --escala 1: {VOLUMES['livros']} livros, {VOLUMES['leitores']} leitores, "
+        f"{VOLUMES['funcionarios']} funcionários e {VOLUMES['emprestimos']} empréstimos. A mesma "
+        "--semente gera sempre os mesmos dados. O banco precisa estar sem dados da biblioteca."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=float, default=1.0, help="Multiplica os volumes (ex: 0.1, 1, 10).")
+        parser.add_argument('--semente', type=int, default=42, help="Semente do gerador aleatório.")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Registros por INSERT.")
+
+    def handle(self, *args, **options):
+        if options['escala'] <= 0:
+            raise CommandError("A escala precisa ser maior que zero.")
+        ocupados = [modelo.__name__ for modelo in (Funcionario, Leitor, Livro, Emprestimo) if modelo.objects.exists()]
+        if ocupados:
+            raise CommandError(f"O banco já tem dados ({', '.join(ocupados)}); use um banco vazio.")
+
+        volumes = {nome: max(1, round(base * options['escala'])) for nome, base in VOLUMES.items()}
+        self.aleatorio = random.Random(options['semente'])
+        self.hoje = timezone.localdate()
+        self.lote = max(1, options['batch_size'])
+
+        inicio = time.monotonic()
+        # bulk_create não dispara sinais: contadores e cache são acertados no final
+        with transaction.atomic():
+            funcionarios = self.criar_pessoas(Funcionario, volumes['funcionarios'], 'funcionario', inicio_cpf=1)
+            leitores = self.criar_pessoas(Leitor, volumes['leitores'], 'leitor', inicio_cpf=volumes['funcionarios'] + 1)
+            livros = self.criar_livros(volumes['livros'])
+            emprestimos = self.criar_emprestimos(volumes['emprestimos'], livros, leitores, funcionarios)
+            contadores.reconstruir()
+        cache_acervo.invalidar()
+
+        ativos = sum(1 for emprestimo in emprestimos if emprestimo.status != 'DEVOLVIDO')
+        self.stdout.write(self.style.SUCCESS(
+            f"Gerados {len(funcionarios)} funcionários, {len(leitores)} leitores, {len(livros)} livros e "
+            f"{len(emprestimos)} empréstimos ({ativos} ativos) em {time.monotonic() - inicio:.1f}s."
+        ))
+
+    def nome_pessoa(self):
+        nomes = [self.aleatorio.choice(PRENOMES)]
+        nomes += self.aleatorio.sample(SOBRENOMES, self.aleatorio.choice((1, 2, 2, 3)))
+        return ' '.join(nomes)
+
+    def criar_pessoas(self, modelo, quantidade, dominio, inicio_cpf):
+        pessoas = []
+        for i in range(quantidade):
+            nome = self.nome_pessoa()
+            usuario = normalizar_texto(nome).replace(' ', '.')
+            pessoa = modelo(
+                nome=nome,
+                cpf=gerar_cpf(inicio_cpf + i),
+                email=f'{usuario}.{i}@{dominio}.exemplo.com.br',
+                telefone=f'(65) 9{self.aleatorio.randint(8000, 9999)}-{self.aleatorio.randint(0, 9999):04d}',
+                data_nascimento=self.hoje - datetime.timedelta(days=self.aleatorio.randint(18 * 365, 80 * 365)),
+            )
+            if modelo is Funcionario:
+                pessoa.senha = 'senha123'
+            # O save() de Leitor e Funcionario preenche as colunas de busca
+            preencher_campos_normalizados(pessoa, {})
+            pessoas.append(pessoa)
+        return modelo.objects.bulk_create(pessoas, batch_size=self.lote)
+
+    def criar_livros(self, quantidade):
+        autores = [self.nome_pessoa() for _ in range(max(1, quantidade // 8))]
+        livros = []
+        for i in range(quantidade):
+            titulo = f'{self.aleatorio.choice(PALAVRAS_TITULO)} {self.aleatorio.choice(COMPLEMENTOS_TITULO)}'
+            if self.aleatorio.random() < 0.3:
+                titulo = f'{titulo} (vol. {self.aleatorio.randint(1, 5)})'
+            livros.append(Livro(
+                nome=titulo,
+                isbn=gerar_isbn(i + 1),
+                autor=self.aleatorio.choice(autores),
+                genero=self.aleatorio.choice(GENEROS),
+                data_publicacao=min(self.hoje, datetime.date(self.aleatorio.randint(1900, self.hoje.year), 1, 1)
+                                    + datetime.timedelta(days=self.aleatorio.randint(0, 364))),
+            ))
+        return Livro.objects.bulk_create(livros, batch_size=self.lote)
+
+    def criar_emprestimos(self, quantidade, livros, leitores, funcionarios):
+        # Poucos livros concentram muitos empréstimos (cauda longa), sem que os
+        # populares sejam sempre os de ID baixo
+        por_popularidade = self.aleatorio.sample(livros, len(livros))
+        pesos = [1 / (posicao + 50) ** 0.8 for posicao in range(len(livros))]
+        escolhidos = self.aleatorio.choices(por_popularidade, weights=pesos, k=quantidade)
+        meta_ativos = round(len(livros) * FRACAO_ATIVOS)
+        com_emprestimo_ativo = set()
+
+        emprestimos = []
+        for livro in escolhidos:
+            data = self.hoje - datetime.timedelta(days=self.aleatorio.randint(0, DIAS_DE_HISTORICO))
+            prevista = data + PRAZO_DEVOLUCAO
+            emprestimo = Emprestimo(
+                livro=livro,
+                leitor=self.aleatorio.choice(leitores),
+                funcionario=self.aleatorio.choice(funcionarios),
+                data_emprestimo=data,
+                data_devolucao_prevista=prevista,
+            )
+            recente = (self.hoje - data).days <= 45
+            if recente and livro.pk not in com_emprestimo_ativo and len(com_emprestimo_ativo) < meta_ativos:
+                # Ainda com o leitor; parte dos atrasados já passou pelo sweep_overdue
+                com_emprestimo_ativo.add(livro.pk)
+                emprestimo.status = 'ATRASADO' if prevista < self.hoje and self.aleatorio.random() < 0.5 else 'EMPRESTADO'
+            else:
+                # A maioria devolve no prazo; uns 15% atrasam até três semanas
+                dias = self.aleatorio.randint(1, 14) if self.aleatorio.random() < 0.85 else self.aleatorio.randint(15, 35)
+                emprestimo.status = 'DEVOLVIDO'
+                emprestimo.data_devolucao_real = min(self.hoje, data + datetime.timedelta(days=dias))
+            emprestimos.append(emprestimo)
+
+        criados = Emprestimo.objects.bulk_create(emprestimos, batch_size=self.lote)
+        # Colunas desnormalizadas que emprestimos.emprestar() manteria
+        ids = sorted(com_emprestimo_ativo)
+        ativo_do_livro = Emprestimo.objects.ativos().filter(livro=OuterRef('pk')).values('pk')[:1]
+        for inicio in range(0, len(ids), self.lote):
+            Livro.objects.filter(pk__in=ids[inicio:inicio + self.lote]).update(
+                status='emprestado', emprestimo_atual=Subquery(ativo_do_livro)
+            )
+        ativos_por_leitor = Counter(emprestimo.leitor_id for emprestimo in criados if emprestimo.status != 'DEVOLVIDO')
+        leitores_por_total = defaultdict(list)
+        for leitor_id, total in ativos_por_leitor.items():
+            leitores_por_total[total].append(leitor_id)
+        for total, leitores_ids in leitores_por_total.items():
+            for inicio in range(0, len(leitores_ids), self.lote):
+                Leitor.objects.filter(pk__in=leitores_ids[inicio:inicio + self.lote]).update(emprestimos_ativos=total)
+        return criados
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from biblioteca.models import Emprestimo, ExecucaoTarefa
+
+NOME_TAREFA = 'sweep_overdue'
+
+
+class Command(BaseCommand):
+    help = (
+        "Marca como 'ATRASADO' os empréstimos cuja devolução prevista já passou. "
+        "Feito para rodar uma vez por dia pelo agendador (ex: cron às 00:05: "
+        "`python manage.py sweep_overdue`). Guarda o último dia processado, então "
+        "rodar de novo no mesmo dia não faz nada; use --force para repetir."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Empréstimos atualizados por transação.")
+        parser.add_argument('--force', action='store_true', help="Processa mesmo que o dia já tenha sido varrido.")
+
+    def handle(self, *args, **options):
+        hoje = timezone.localdate()
+        lote = max(1, options['batch_size'])
+
+        execucao, _ = ExecucaoTarefa.objects.get_or_create(nome=NOME_TAREFA)
+        if execucao.ultima_data and execucao.ultima_data >= hoje and not options['force']:
+            self.stdout.write(f"Dia {hoje:%d/%m/%Y} já processado. Nada a fazer.")
+            return
+
+        inicio = time.monotonic()
+        total = 0
+        while True:
+            # Lotes curtos: cada transação segura o lock de escrita do SQLite
+            # só pelo tempo de atualizar `lote` linhas.
+            with transaction.atomic():
+                ids = list(
+                    Emprestimo.objects.filter(status='EMPRESTADO', data_devolucao_prevista__lt=hoje)
+                    .order_by()
+                    .values_list('id', flat=True)[:lote]
+                )
+                if not ids:
+                    break
+                # O filtro por status torna a atualização segura se duas
+                # execuções rodarem ao mesmo tempo: ninguém é marcado duas vezes.
+                total += Emprestimo.objects.filter(id__in=ids, status='EMPRESTADO').update(status='ATRASADO')
+
+        execucao.ultima_data = hoje
+        execucao.save(update_fields=['ultima_data', 'data_atualizacao'])
+
+        duracao = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} empréstimo(s) marcados como atrasados em {duracao:.2f}s (dia {hoje:%d/%m/%Y})."
+        ))
@@ -0,0 +1,81 @@
+import threading
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from biblioteca import emprestimos
+from biblioteca.models import STATUS_ATIVOS, Emprestimo, Leitor, Livro
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de concorrência do serviço de empréstimos: dispara N empréstimos "
+        "simultâneos do mesmo livro (uma thread e uma conexão por balcão) e confere "
+        "que exatamente um foi gravado. Por padrão cria um livro e um leitor "
+        "temporários e apaga tudo no final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=10, help="Balcões emprestando ao mesmo tempo.")
+        parser.add_argument('--livro', type=int, help="ID de um livro disponível (padrão: cria um temporário).")
+
+    def handle(self, *args, **options):
+        total = max(2, options['threads'])
+        sufixo = uuid.uuid4().hex[:10]
+        temporario = options['livro'] is None
+
+        if temporario:
+            livro = Livro.objects.create(nome=f'Teste de concorrência {sufixo}', isbn=sufixo, autor='Teste')
+        else:
+            livro = Livro.objects.filter(pk=options['livro'], status='disponivel').first()
+            if livro is None:
+                raise CommandError("Livro não encontrado ou não está disponível.")
+        leitor = Leitor.objects.create(nome=f'Teste {sufixo}', cpf=sufixo, email=f'{sufixo}@teste.invalid')
+
+        barreira = threading.Barrier(total)
+        resultados = []
+
+        def balcao():
+            try:
+                barreira.wait()
+                emprestimos.emprestar(Livro.objects.get(pk=livro.pk), leitor, None)
+                resultados.append('emprestado')
+            except emprestimos.LivroIndisponivel:
+                resultados.append('recusado')
+            except OperationalError as erro:
+                # Ex: "database is locked" se a espera passar do timeout do SQLite
+                resultados.append(f'erro: {erro}')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=balcao) for _ in range(total)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ativos = list(Emprestimo.objects.filter(livro=livro, status__in=STATUS_ATIVOS))
+        livro.refresh_from_db()
+        leitor.refresh_from_db()
+        try:
+            for resultado in sorted(set(resultados)):
+                self.stdout.write(f"{resultados.count(resultado):>4} x {resultado}")
+            if (
+                resultados.count('emprestado') != 1 or len(ativos) != 1 or livro.status != 'emprestado'
+                or livro.emprestimo_atual_id != ativos[0].pk or leitor.emprestimos_ativos != 1
+            ):
+                raise CommandError(
+                    f"Falhou: {resultados.count('emprestado')} empréstimo(s) aceitos, {len(ativos)} ativo(s) "
+                    f"no banco, livro '{livro.status}' apontando para o empréstimo {livro.emprestimo_atual_id}, "
+                    f"leitor com {leitor.emprestimos_ativos} ativo(s)."
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"OK: {total} balcões, 1 empréstimo gravado e {total - 1} recusados ou bloqueados."
+            ))
+        finally:
+            for emprestimo in ativos:
+                emprestimos.excluir(emprestimo)
+            leitor.delete()
+            if temporario:
+                livro.delete()
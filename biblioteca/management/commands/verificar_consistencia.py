@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from biblioteca import contadores
+
+# Quantos IDs divergentes listar por tabela
+AMOSTRA = 10
+
+
+class Command(BaseCommand):
+    help = (
+        "Confere as colunas desnormalizadas contra os empréstimos: Livro.emprestimo_atual e "
+        "Livro.status, Leitor.emprestimos_ativos e os contadores do painel. Sem --corrigir só "
+        "relata e termina com erro se houver divergência (para rodar agendado); com --corrigir "
+        "regrava os valores a partir dos empréstimos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corrigir', action='store_true', help="Acerta as divergências encontradas.")
+
+    def handle(self, *args, **options):
+        divergencias = 0
+        for rotulo, consulta in (
+            ('Livros (emprestimo_atual/status)', contadores.livros_divergentes()),
+            ('Leitores (emprestimos_ativos)', contadores.leitores_divergentes()),
+        ):
+            ids = list(consulta.order_by('pk').values_list('pk', flat=True))
+            divergencias += len(ids)
+            if ids:
+                amostra = ', '.join(map(str, ids[:AMOSTRA])) + (' ...' if len(ids) > AMOSTRA else '')
+                self.stdout.write(self.style.WARNING(f"{rotulo}: {len(ids)} divergente(s), IDs {amostra}"))
+            else:
+                self.stdout.write(f"{rotulo}: OK")
+
+        painel = contadores.obter()
+        totais = contadores.calcular_totais()
+        diferentes = {campo: valor for campo, valor in totais.items() if getattr(painel, campo) != valor}
+        divergencias += len(diferentes)
+        if diferentes:
+            for campo, valor in diferentes.items():
+                self.stdout.write(self.style.WARNING(f"Painel {campo}: {getattr(painel, campo)}, contagem real {valor}"))
+        else:
+            self.stdout.write("Contadores do painel: OK")
+
+        if not divergencias:
+            self.stdout.write(self.style.SUCCESS("Nenhuma divergência."))
+            return
+        if not options['corrigir']:
+            raise CommandError(f"{divergencias} divergência(s); rode de novo com --corrigir para acertar.")
+
+        livros, leitores = contadores.corrigir_emprestimos_ativos()
+        if diferentes:
+            contadores.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f"Corrigidos {livros} livro(s), {leitores} leitor(es)"
+            f"{' e os contadores do painel' if diferentes else ''}."
+        ))
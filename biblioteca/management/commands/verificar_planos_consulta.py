@@ -0,0 +1,112 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from biblioteca.models import Emprestimo, EmprestimoArquivado, Funcionario, Leitor, Livro
+
+# Linha do EXPLAIN QUERY PLAN que varre uma tabela: é varredura completa
+# quando o resto da linha não diz qual índice percorre. "SCAN x USING
+# (COVERING) INDEX y" e tabelas virtuais (FTS, "SCAN x VIRTUAL TABLE INDEX")
+# são aceitos.
+VARREDURA = re.compile(r'\bSCAN (?:TABLE )?(\w+)(.*)$')
+COM_INDICE = re.compile(r'^\s*(?:USING (?:COVERING )?INDEX|VIRTUAL TABLE INDEX)\b')
+
+
+def varredura_completa(linha):
+    """Nome da tabela varrida sem índice nesta linha do plano, ou None."""
+    m = VARREDURA.search(linha.rstrip())
+    if m and not COM_INDICE.match(m.group(2)):
+        return m.group(1)
+    return None
+
+
+def consultas_monitoradas(using):
+    """
+    As consultas das views mais acessadas, montadas do mesmo jeito que nas
+    views. Cada uma deve ser resolvida por índice, sem varrer a tabela toda.
+    """
+    hoje = timezone.now().date()
+    tamanho = 26  # uma página de paginar() + 1
+    emprestimos = Emprestimo.objects.using(using)
+    arquivados = EmprestimoArquivado.objects.using(using)
+    livros = Livro.objects.using(using)
+
+    consultas = {
+        'varredura de atrasos (sweep_overdue)': emprestimos.filter(
+            status='EMPRESTADO', data_devolucao_prevista__lt=hoje
+        ).order_by().values('id'),
+        'relatorio_leitores_atrasados': emprestimos.atrasados(hoje)
+        .select_related('livro', 'leitor')
+        .order_by('leitor__nome', 'data_devolucao_prevista'),
+        'relatorio_livros_emprestados': emprestimos.filter(
+            status__in=['EMPRESTADO', 'ATRASADO']
+        ).select_related('livro', 'leitor'),
+        'relatorio_historico_livro': emprestimos.filter(livro_id=1)
+        .select_related('leitor', 'funcionario')
+        .order_by('-data_emprestimo', '-id')[:tamanho],
+        'relatorio_historico_livro (arquivados)': arquivados.filter(livro_id=1)
+        .select_related('leitor', 'funcionario')
+        .order_by('-data_emprestimo', '-id')[:tamanho],
+        'consultar_emprestimos (historico, arquivados)': arquivados
+        .select_related('livro', 'leitor', 'funcionario')
+        .order_by('-data_emprestimo', '-id')[:tamanho],
+        'archive_emprestimos': emprestimos.devolvidos()
+        .filter(data_devolucao_real__lt=hoje)
+        .order_by('data_devolucao_real').values('pk')[:2000],
+        'acervo_view': livros.order_by('nome', 'id')[:tamanho],
+        'consultar_leitor': Leitor.objects.using(using).order_by('nome', 'id')[:tamanho],
+        'consultar_funcionario': Funcionario.objects.using(using).order_by('nome', 'id')[:tamanho],
+    }
+    abas = {
+        'andamento': emprestimos.em_andamento(hoje),
+        'atrasados': emprestimos.atrasados(hoje),
+        'historico': emprestimos.devolvidos(),
+    }
+    for aba, queryset in abas.items():
+        consultas[f'consultar_emprestimos ({aba})'] = (
+            queryset.select_related('livro', 'leitor', 'funcionario')
+            .order_by('-data_emprestimo', '-id')[:tamanho]
+        )
+    for status in ('disponivel', 'emprestado'):
+        consultas[f'consultar_livro ({status})'] = livros.filter(status=status).order_by('nome', 'id')[:tamanho]
+    return consultas
+
+
+class Command(BaseCommand):
+    help = (
+        "Roda EXPLAIN QUERY PLAN nas consultas das views mais acessadas e falha "
+        "se alguma fizer varredura completa de tabela. Rode num banco populado "
+        "(cópia do banco de produção ou gerado com `seed_biblioteca`) para validar os índices."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--verbose-plans', action='store_true', help="Mostra o plano de todas as consultas.")
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if connections[using].vendor != 'sqlite':
+            raise CommandError("Esta verificação só entende o EXPLAIN QUERY PLAN do SQLite.")
+
+        falhas = []
+        for nome, queryset in consultas_monitoradas(using).items():
+            plano = queryset.explain()
+            varridas = [
+                tabela
+                for linha in plano.splitlines()
+                for tabela in [varredura_completa(linha)]
+                if tabela
+            ]
+            if varridas:
+                falhas.append(nome)
+                self.stdout.write(self.style.ERROR(f"[SCAN] {nome}: {', '.join(varridas)}"))
+            else:
+                self.stdout.write(f"[ok]   {nome}")
+            if varridas or options['verbose_plans']:
+                self.stdout.write(f"{plano}\n")
+
+        if falhas:
+            raise CommandError(f"{len(falhas)} consulta(s) sem índice: {', '.join(falhas)}")
+        self.stdout.write(self.style.SUCCESS("Todas as consultas monitoradas usam índice."))
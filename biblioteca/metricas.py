@@ -0,0 +1,160 @@
+# biblioteca/metricas.py
+"""
+Medição por requisição (ligada com BIBLIOTECA_METRICAS=1).
+
+O MetricasMiddleware (middleware.py) abre uma Medicao para cada requisição
+e, ao final, registra:
+- view resolvida (ex: consultar_emprestimos) e status
+- número de consultas SQL e tempo no banco, via connection.execute_wrapper
+- tempo de renderização dos templates (backend DjangoTemplatesMedidos)
+- latência total
+
+Os números vão para o cabeçalho Server-Timing (visível na aba Rede do
+navegador), para uma linha JSON no logger 'biblioteca.metricas' e para as
+últimas AMOSTRAS_POR_VIEW requisições de cada view, guardadas na memória do
+processo, de onde a página /metricas/ calcula p50 e p95. Com vários
+processos cada um tem o seu resumo.
+
+O tempo de template inclui as consultas que o próprio template dispara (ex:
+um queryset avaliado no {% for %}); o tempo de SQL conta todas elas. Em
+respostas em streaming (exportações) a medição para quando o envio começa.
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.template.backends.django import DjangoTemplates
+
+AMOSTRAS_POR_VIEW = 500
+
+logger = logging.getLogger('biblioteca.metricas')
+
+_medicao = contextvars.ContextVar('biblioteca_medicao', default=None)
+_amostras = defaultdict(lambda: deque(maxlen=AMOSTRAS_POR_VIEW))
+_trava = threading.Lock()
+
+
+class Medicao:
+    __slots__ = ('inicio', 'consultas', 'tempo_sql', 'tempo_template')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tempo_sql = 0.0
+        self.tempo_template = 0.0
+
+
+def iniciar():
+    """Abre a medição da requisição atual; devolve (medicao, token para encerrar)."""
+    medicao = Medicao()
+    return medicao, _medicao.set(medicao)
+
+
+def encerrar(token):
+    _medicao.reset(token)
+
+
+def medir_consulta(execute, sql, params, many, context):
+    """execute_wrapper: conta a consulta e o tempo gasto no banco."""
+    medicao = _medicao.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.consultas += 1
+        medicao.tempo_sql += time.perf_counter() - inicio
+
+
+def cabecalho_server_timing(view, medicao, total):
+    return (
+        f'db;dur={medicao.tempo_sql * 1000:.1f};desc="{medicao.consultas} consultas", '
+        f'tpl;dur={medicao.tempo_template * 1000:.1f};desc="templates", '
+        f'total;dur={total * 1000:.1f};desc="{view}"'
+    )
+
+
+def registrar(view, metodo, status, medicao, total):
+    """Guarda a amostra no resumo do processo e escreve a linha de log."""
+    amostra = (total, medicao.tempo_sql, medicao.tempo_template, medicao.consultas)
+    with _trava:
+        _amostras[view].append(amostra)
+    logger.info(json.dumps({
+        'view': view,
+        'metodo': metodo,
+        'status': status,
+        'consultas': medicao.consultas,
+        'sql_ms': round(medicao.tempo_sql * 1000, 2),
+        'template_ms': round(medicao.tempo_template * 1000, 2),
+        'total_ms': round(total * 1000, 2),
+    }))
+
+
+def _percentil(ordenados, fracao):
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+def resumo():
+    """p50/p95 por view (em ms) das amostras guardadas, da view mais lenta para a mais rápida."""
+    with _trava:
+        copia = {view: list(amostras) for view, amostras in _amostras.items()}
+    linhas = []
+    for view, amostras in copia.items():
+        totais = sorted(amostra[0] for amostra in amostras)
+        sqls = sorted(amostra[1] for amostra in amostras)
+        templates = sorted(amostra[2] for amostra in amostras)
+        linhas.append({
+            'view': view,
+            'amostras': len(amostras),
+            'total_p50': _percentil(totais, 0.50) * 1000,
+            'total_p95': _percentil(totais, 0.95) * 1000,
+            'sql_p50': _percentil(sqls, 0.50) * 1000,
+            'sql_p95': _percentil(sqls, 0.95) * 1000,
+            'template_p50': _percentil(templates, 0.50) * 1000,
+            'template_p95': _percentil(templates, 0.95) * 1000,
+            'consultas_max': max(amostra[3] for amostra in amostras),
+        })
+    return sorted(linhas, key=lambda linha: linha['total_p95'], reverse=True)
+
+
+def limpar():
+    with _trava:
+        _amostras.clear()
+
+
+class _TemplateMedido:
+    """Envolve o Template do backend e soma o tempo de render() na medição."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, nome):
+        return getattr(self.template, nome)
+
+    def render(self, context=None, request=None):
+        medicao = _medicao.get()
+        if medicao is None:
+            return self.template.render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            medicao.tempo_template += time.perf_counter() - inicio
+
+
+class DjangoTemplatesMedidos(DjangoTemplates):
+    """
+    Backend de templates do Django que mede render(). Só o template pedido
+    pela view passa por aqui ({% include %} e {% extends %} ficam dentro do
+    mesmo render), então o tempo não é contado duas vezes.
+    """
+
+    def from_string(self, template_code):
+        return _TemplateMedido(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TemplateMedido(super().get_template(template_name))
@@ -0,0 +1,137 @@
+# biblioteca/middleware.py
+"""
+Middlewares da biblioteca.
+
+funcionario_logado_middleware: o login guarda só o ID na sessão, e o
+middleware coloca em `request.funcionario` um objeto preguiçoso (como o
+`request.user` do Django): a consulta ao banco só acontece se alguém usar o
+funcionário, e no máximo uma vez por requisição. Sem ninguém logado (ou com
+o funcionário excluído) ele vale None, então use `if request.funcionario:`;
+para gravar numa chave estrangeira use `obter_funcionario(request)`, que
+devolve a própria instância.
+
+MetricasMiddleware: medição de SQL, templates e latência por requisição
+(ver metricas.py), ligada com BIBLIOTECA_METRICAS=1.
+
+arquivos_estaticos_middleware: serve o STATIC_ROOT gerado pelo collectstatic,
+com as versões .br/.gz e cache longo (ver estaticos.py).
+
+compressao_middleware: gzip/brotli das respostas dinâmicas (ver
+compressao.py), desligado com BIBLIOTECA_COMPRESSAO=0.
+"""
+import time
+
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.functional import SimpleLazyObject
+
+from . import compressao, estaticos, metricas
+from .models import Funcionario
+
+CHAVE_SESSAO = 'funcionario_logado_id'
+
+
+def obter_funcionario(request):
+    """Funcionário logado ou None, buscado no máximo uma vez por requisição."""
+    if not hasattr(request, '_funcionario_logado'):
+        pk = request.session.get(CHAVE_SESSAO)
+        request._funcionario_logado = Funcionario.objects.filter(pk=pk).first() if pk is not None else None
+    return request._funcionario_logado
+
+
+def _anexar_funcionario(request):
+    request.funcionario = SimpleLazyObject(lambda: obter_funcionario(request))
+
+
+@sync_and_async_middleware
+def funcionario_logado_middleware(get_response):
+    # Só anexa o objeto preguiçoso, sem tocar no banco: roda igual em WSGI e
+    # ASGI, sem a troca de thread do MiddlewareMixin no modo assíncrono
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            _anexar_funcionario(request)
+            return await get_response(request)
+    else:
+        def middleware(request):
+            _anexar_funcionario(request)
+            return get_response(request)
+    return middleware
+
+
+class MetricasMiddleware:
+    """
+    Fica no topo do MIDDLEWARE para que o total inclua os outros middlewares
+    (sessão, funcionário logado). É só síncrono: o execute_wrapper vale para a
+    conexão da thread. Sob ASGI o Django roda as views assíncronas na mesma
+    thread da medição, o que tira a vantagem delas; ligue só para diagnóstico.
+    """
+
+    def __init__(self, get_response):
+        if not settings.BIBLIOTECA_METRICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medicao, token = metricas.iniciar()
+        try:
+            with connection.execute_wrapper(metricas.medir_consulta):
+                response = self.get_response(request)
+        finally:
+            metricas.encerrar(token)
+        total = time.perf_counter() - medicao.inicio
+
+        rota = request.resolver_match
+        view = (rota.view_name if rota else None) or '(sem rota)'
+        response['Server-Timing'] = metricas.cabecalho_server_timing(view, medicao, total)
+        metricas.registrar(view, request.method, response.status_code, medicao, total)
+        return response
+
+
+@sync_and_async_middleware
+def arquivos_estaticos_middleware(get_response):
+    # Primeiro do MIDDLEWARE: um arquivo estático sai sem passar por sessão,
+    # banco ou métricas. Sem collectstatic (STATIC_ROOT vazio) ele se retira.
+    prefixo = urlsplit(settings.STATIC_URL).path
+    arquivos = estaticos.indexar(settings.STATIC_ROOT, prefixo)
+    if not arquivos:
+        raise MiddlewareNotUsed
+
+    def procurar(request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(prefixo):
+            return arquivos.get(request.path)
+        return None
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            arquivo = procurar(request)
+            if arquivo is not None:
+                return await sync_to_async(estaticos.responder)(request, arquivo, ler=True)
+            return await get_response(request)
+    else:
+        def middleware(request):
+            arquivo = procurar(request)
+            if arquivo is not None:
+                return estaticos.responder(request, arquivo)
+            return get_response(request)
+    return middleware
+
+
+@sync_and_async_middleware
+def compressao_middleware(get_response):
+    # Fica acima da sessão no MIDDLEWARE: comprime o corpo final e vê o
+    # Vary: Cookie que ela acrescenta
+    if not settings.BIBLIOTECA_COMPRESSAO:
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return compressao.comprimir_resposta(request, await get_response(request))
+    else:
+        def middleware(request):
+            return compressao.comprimir_resposta(request, get_response(request))
+    return middleware
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0004_emprestimo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(fields=['-data_emprestimo', '-id'], name='emprestimo_data_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='funcionario',
+            index=models.Index(fields=['nome', 'id'], name='funcionario_nome_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leitor',
+            index=models.Index(fields=['nome', 'id'], name='leitor_nome_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livro',
+            index=models.Index(fields=['nome', 'id'], name='livro_nome_id_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Tabela FTS5 que espelha os campos pesquisáveis de Livro. O rowid é o id do
+# livro e o ISBN é indexado sem hífens. Só é criada no SQLite; em outros bancos
+# a busca usa o caminho com icontains (ver biblioteca/busca.py).
+CRIAR_FTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS biblioteca_livro_fts USING fts5(
+        nome, autor, isbn, genero,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS biblioteca_livro_fts_ai AFTER INSERT ON biblioteca_livro BEGIN
+        INSERT INTO biblioteca_livro_fts(rowid, nome, autor, isbn, genero)
+        VALUES (new.id, new.nome, new.autor, replace(new.isbn, '-', ''), coalesce(new.genero, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS biblioteca_livro_fts_ad AFTER DELETE ON biblioteca_livro BEGIN
+        DELETE FROM biblioteca_livro_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS biblioteca_livro_fts_au
+    AFTER UPDATE OF nome, autor, isbn, genero ON biblioteca_livro BEGIN
+        DELETE FROM biblioteca_livro_fts WHERE rowid = old.id;
+        INSERT INTO biblioteca_livro_fts(rowid, nome, autor, isbn, genero)
+        VALUES (new.id, new.nome, new.autor, replace(new.isbn, '-', ''), coalesce(new.genero, ''));
+    END
+    """,
+    """
+    INSERT INTO biblioteca_livro_fts(rowid, nome, autor, isbn, genero)
+    SELECT id, nome, autor, replace(isbn, '-', ''), coalesce(genero, '') FROM biblioteca_livro
+    """,
+]
+
+REMOVER_FTS = [
+    "DROP TRIGGER IF EXISTS biblioteca_livro_fts_au",
+    "DROP TRIGGER IF EXISTS biblioteca_livro_fts_ad",
+    "DROP TRIGGER IF EXISTS biblioteca_livro_fts_ai",
+    "DROP TABLE IF EXISTS biblioteca_livro_fts",
+]
+
+
+def criar_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CRIAR_FTS:
+        schema_editor.execute(sql)
+
+
+def remover_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in REMOVER_FTS:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0005_indices_paginacao'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_fts, remover_fts),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:42
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _normalizar_texto(valor):
+    if not valor:
+        return ''
+    decomposto = unicodedata.normalize('NFKD', str(valor))
+    sem_acentos = ''.join(ch for ch in decomposto if not unicodedata.combining(ch))
+    return ' '.join(sem_acentos.lower().split())
+
+
+def preencher_campos_normalizados(apps, schema_editor):
+    for nome_modelo in ('Leitor', 'Funcionario'):
+        modelo = apps.get_model('biblioteca', nome_modelo)
+        alterados = []
+        for obj in modelo.objects.only('id', 'nome', 'cpf', 'email').iterator(chunk_size=2000):
+            obj.nome_normalizado = _normalizar_texto(obj.nome)
+            obj.cpf_normalizado = re.sub(r'\D', '', obj.cpf or '')
+            obj.email_normalizado = (obj.email or '').strip().lower()
+            alterados.append(obj)
+            if len(alterados) >= 2000:
+                modelo.objects.bulk_update(alterados, ['nome_normalizado', 'cpf_normalizado', 'email_normalizado'])
+                alterados = []
+        if alterados:
+            modelo.objects.bulk_update(alterados, ['nome_normalizado', 'cpf_normalizado', 'email_normalizado'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0006_livro_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='funcionario',
+            name='cpf_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=14),
+        ),
+        migrations.AddField(
+            model_name='funcionario',
+            name='email_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='funcionario',
+            name='nome_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='leitor',
+            name='cpf_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=14),
+        ),
+        migrations.AddField(
+            model_name='leitor',
+            name='email_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='leitor',
+            name='nome_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(preencher_campos_normalizados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0007_campos_normalizados_busca'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(fields=['status', '-data_emprestimo', '-id'], name='emprestimo_status_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(fields=['status', 'data_devolucao_prevista'], name='emprestimo_status_prev_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(fields=['livro', '-data_emprestimo', '-id'], name='emprestimo_livro_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livro',
+            index=models.Index(fields=['status', 'nome', 'id'], name='livro_status_nome_idx'),
+        ),
+    ]
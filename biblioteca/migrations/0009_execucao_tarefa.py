@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0008_indices_consultas_frequentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecucaoTarefa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=50, unique=True)),
+                ('ultima_data', models.DateField(blank=True, null=True)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Execução de tarefa',
+                'verbose_name_plural': 'Execuções de tarefas',
+            },
+        ),
+    ]
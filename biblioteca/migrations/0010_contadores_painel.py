@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0009_execucao_tarefa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadoresPainel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('livros', models.BigIntegerField(default=0)),
+                ('leitores', models.BigIntegerField(default=0)),
+                ('funcionarios', models.BigIntegerField(default=0)),
+                ('emprestimos_ativos', models.BigIntegerField(default=0)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contadores do painel',
+                'verbose_name_plural': 'Contadores do painel',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0010_contadores_painel'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='emprestimo',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('EMPRESTADO', 'ATRASADO'))), fields=('livro',), name='emprestimo_um_ativo_por_livro'),
+        ),
+    ]
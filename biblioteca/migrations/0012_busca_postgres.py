@@ -0,0 +1,70 @@
+from django.db import migrations
+
+# Busca nativa do PostgreSQL (ver biblioteca/busca.py). Nada é feito nos
+# outros bancos: o SQLite continua com a tabela FTS5 da migração 0006.
+#
+# - biblioteca_busca: cópia da configuração 'simple' (sem stemming nem
+#   stopwords, como o tokenizador do FTS5) que remove acentos com unaccent
+# - índice GIN sobre o tsvector ponderado de Livro (nome, autor, isbn sem
+#   hífens e gênero); a expressão é a mesma de busca.VETOR_LIVRO_PG
+# - índices GIN de trigramas em nome_normalizado de Leitor e Funcionario,
+#   para a busca por qualquer parte do nome
+#
+# pg_trgm e unaccent são extensões "trusted" desde o PostgreSQL 13: o dono do
+# banco pode criá-las. Se o servidor não as tiver instaladas (pacote contrib),
+# a configuração fica sem unaccent e os índices de trigramas não são criados;
+# a busca continua funcionando, só diferencia acentos e nomes voltam a ser
+# buscados por prefixo.
+VETOR_LIVRO = (
+    "setweight(to_tsvector('biblioteca_busca'::regconfig, nome), 'A') || "
+    "setweight(to_tsvector('biblioteca_busca'::regconfig, autor), 'B') || "
+    "setweight(to_tsvector('biblioteca_busca'::regconfig, replace(isbn, '-', '')), 'C') || "
+    "setweight(to_tsvector('biblioteca_busca'::regconfig, coalesce(genero, '')), 'D')"
+)
+
+INDICES_TRIGRAMA = [
+    ('leitor_nome_trgm_idx', 'biblioteca_leitor'),
+    ('funcionario_nome_trgm_idx', 'biblioteca_funcionario'),
+]
+
+
+def criar_busca_postgres(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM pg_available_extensions WHERE name IN ('pg_trgm', 'unaccent')")
+        extensoes = {linha[0] for linha in cursor.fetchall()}
+    for extensao in sorted(extensoes):
+        schema_editor.execute(f'CREATE EXTENSION IF NOT EXISTS {extensao}')
+
+    schema_editor.execute('CREATE TEXT SEARCH CONFIGURATION biblioteca_busca (COPY = pg_catalog.simple)')
+    if 'unaccent' in extensoes:
+        schema_editor.execute(
+            'ALTER TEXT SEARCH CONFIGURATION biblioteca_busca '
+            'ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple'
+        )
+    schema_editor.execute(f'CREATE INDEX livro_busca_gin_idx ON biblioteca_livro USING gin (({VETOR_LIVRO}))')
+    if 'pg_trgm' in extensoes:
+        for nome, tabela in INDICES_TRIGRAMA:
+            schema_editor.execute(f'CREATE INDEX {nome} ON {tabela} USING gin (nome_normalizado gin_trgm_ops)')
+
+
+def remover_busca_postgres(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # As extensões ficam: outros objetos do banco podem depender delas
+    for nome, _tabela in INDICES_TRIGRAMA:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nome}')
+    schema_editor.execute('DROP INDEX IF EXISTS livro_busca_gin_idx')
+    schema_editor.execute('DROP TEXT SEARCH CONFIGURATION IF EXISTS biblioteca_busca')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0011_emprestimo_ativo_unico'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_busca_postgres, remover_busca_postgres),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+STATUS_ATIVOS = ('EMPRESTADO', 'ATRASADO')
+
+
+def preencher_emprestimos_ativos(apps, schema_editor):
+    Emprestimo = apps.get_model('biblioteca', 'Emprestimo')
+    Livro = apps.get_model('biblioteca', 'Livro')
+    Leitor = apps.get_model('biblioteca', 'Leitor')
+    ativos = Emprestimo.objects.filter(status__in=STATUS_ATIVOS)
+    # Um UPDATE por tabela, só nas linhas que têm empréstimo ativo
+    Livro.objects.filter(pk__in=ativos.values('livro_id')).update(
+        emprestimo_atual=Subquery(ativos.filter(livro=OuterRef('pk')).values('pk')[:1])
+    )
+    Leitor.objects.filter(pk__in=ativos.values('leitor_id')).update(emprestimos_ativos=Subquery(
+        ativos.filter(leitor=OuterRef('pk')).order_by().values('leitor').annotate(total=Count('pk')).values('total')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0012_busca_postgres'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leitor',
+            name='emprestimos_ativos',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='livro',
+            name='emprestimo_atual',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='biblioteca.emprestimo'),
+        ),
+        migrations.RunPython(preencher_emprestimos_ativos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:58
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0013_emprestimo_atual_e_ativos_por_leitor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contadorespainel',
+            name='emprestimos_arquivados',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(fields=['status', 'data_devolucao_real'], name='emprestimo_status_real_idx'),
+        ),
+        migrations.CreateModel(
+            name='EmprestimoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('data_emprestimo', models.DateField()),
+                ('data_devolucao_prevista', models.DateField()),
+                ('data_devolucao_real', models.DateField()),
+                ('status', models.CharField(choices=[('EMPRESTADO', 'Emprestado'), ('DEVOLVIDO', 'Devolvido'), ('ATRASADO', 'Atrasado')], default='DEVOLVIDO', max_length=20)),
+                ('data_criacao', models.DateTimeField()),
+                ('data_atualizacao', models.DateTimeField()),
+                ('data_arquivamento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('funcionario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='emprestimos_arquivados', to='biblioteca.funcionario')),
+                ('leitor', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='emprestimos_arquivados', to='biblioteca.leitor')),
+                ('livro', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='emprestimos_arquivados', to='biblioteca.livro')),
+            ],
+            options={
+                'verbose_name': 'Empréstimo arquivado',
+                'verbose_name_plural': 'Empréstimos arquivados',
+                'ordering': ['-data_emprestimo'],
+                'indexes': [models.Index(fields=['-data_emprestimo', '-id'], name='arquivado_data_id_idx'), models.Index(fields=['livro', '-data_emprestimo', '-id'], name='arquivado_livro_data_idx')],
+            },
+        ),
+    ]
@@ -4,6 +4,26 @@ from django.contrib.auth.models import AbstractUser, BaseUserManager # Usaremos
 from django.utils import timezone
 import datetime
 
+from .busca import normalizar_texto, somente_digitos
+
+def preencher_campos_normalizados(obj, kwargs):
+    """
+    Atualiza as colunas de busca (nome/CPF/e-mail normalizados) de Leitor e
+    Funcionario antes do save(). Se o save vier com update_fields, inclui
+    nele as colunas normalizadas dos campos alterados.
+    """
+    obj.nome_normalizado = normalizar_texto(obj.nome)
+    obj.cpf_normalizado = somente_digitos(obj.cpf)
+    obj.email_normalizado = (obj.email or '').strip().lower()
+
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None:
+        update_fields = set(update_fields)
+        for campo in ('nome', 'cpf', 'email'):
+            if campo in update_fields:
+                update_fields.add(f'{campo}_normalizado')
+        kwargs['update_fields'] = update_fields
+
 # Se você quiser usar seu próprio modelo de usuário para funcionários
 # com mais campos, você pode estender AbstractUser. Por simplicidade,
 # vamos usar um modelo de Funcionario separado por enquanto, e para autenticação
@@ -20,16 +40,28 @@ class Funcionario(models.Model):
     cpf = models.CharField(max_length=14, unique=True)
     endereco = models.CharField(max_length=200, blank=True, null=True)
     data_nascimento = models.DateField(blank=True, null=True)
+    # Colunas de busca: sem acentos, minúsculas e sem pontuação (preenchidas no save)
+    nome_normalizado = models.CharField(max_length=100, editable=False, db_index=True, default='')
+    cpf_normalizado = models.CharField(max_length=14, editable=False, db_index=True, default='')
+    email_normalizado = models.CharField(max_length=254, editable=False, db_index=True, default='')
     # Adicione campos de auditoria
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        preencher_campos_normalizados(self, kwargs)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.nome
 
     class Meta:
         verbose_name = "Funcionário"
         verbose_name_plural = "Funcionários"
+        indexes = [
+            # Índice da paginação por cursor (ordenação por nome, id)
+            models.Index(fields=['nome', 'id'], name='funcionario_nome_id_idx'),
+        ]
 
 # Outros modelos como Leitor, Livro, Emprestimo, Acervo virão depois.
 
@@ -40,16 +72,30 @@ class Leitor(models.Model):
     telefone = models.CharField(max_length=20, blank=True, null=True)
     endereco = models.CharField(max_length=200, blank=True, null=True)
     data_nascimento = models.DateField(blank=True, null=True)
+    # Colunas de busca: sem acentos, minúsculas e sem pontuação (preenchidas no save)
+    nome_normalizado = models.CharField(max_length=100, editable=False, db_index=True, default='')
+    cpf_normalizado = models.CharField(max_length=14, editable=False, db_index=True, default='')
+    email_normalizado = models.CharField(max_length=254, editable=False, db_index=True, default='')
+    # Empréstimos ativos agora, mantido pelas operações de emprestimos.py:
+    # listagens e o limite por leitor leem esta coluna em vez de contar
+    emprestimos_ativos = models.IntegerField(default=0, editable=False)
     # Campos de auditoria (opcional, mas boa prática)
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        preencher_campos_normalizados(self, kwargs)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.nome
 
     class Meta:
         verbose_name = "Leitor"
         verbose_name_plural = "Leitores"
+        indexes = [
+            models.Index(fields=['nome', 'id'], name='leitor_nome_id_idx'),
+        ]
 
 
 
@@ -70,6 +116,12 @@ class Livro(models.Model):
         choices=STATUS_CHOICES,
         default='disponivel',
     )
+    # Empréstimo ativo do livro (None quando disponível), gravado junto com o
+    # status pelas operações de emprestimos.py: com quem está o livro é um
+    # join pela chave primária, sem procurar entre os empréstimos
+    emprestimo_atual = models.ForeignKey(
+        'Emprestimo', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+',
+    )
     # Campos de auditoria
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
@@ -80,9 +132,50 @@ class Livro(models.Model):
     class Meta:
         verbose_name = "Livro"
         verbose_name_plural = "Livros"
+        indexes = [
+            models.Index(fields=['nome', 'id'], name='livro_nome_id_idx'),
+            # Abas de consultar_livro: WHERE status = ? ORDER BY nome, id
+            models.Index(fields=['status', 'nome', 'id'], name='livro_status_nome_idx'),
+        ]
 
 # ... (EMPRESTIMOS) ...
 
+# Status de um empréstimo que ainda não foi devolvido
+STATUS_ATIVOS = ('EMPRESTADO', 'ATRASADO')
+
+
+def filtros_situacao_emprestimo(hoje=None):
+    """
+    Filtros de situação calculados na leitura. Um empréstimo 'EMPRESTADO' cuja
+    devolução prevista já passou conta como atrasado mesmo que o comando
+    sweep_overdue ainda não tenha gravado 'ATRASADO' nele.
+    """
+    hoje = hoje or timezone.localdate()
+    return {
+        'andamento': models.Q(status='EMPRESTADO', data_devolucao_prevista__gte=hoje),
+        'atrasados': (
+            models.Q(status='ATRASADO')
+            | models.Q(status='EMPRESTADO', data_devolucao_prevista__lt=hoje)
+        ),
+        'historico': models.Q(status='DEVOLVIDO'),
+    }
+
+
+class EmprestimoQuerySet(models.QuerySet):
+
+    def ativos(self):
+        return self.filter(status__in=STATUS_ATIVOS)
+
+    def atrasados(self, hoje=None):
+        return self.filter(filtros_situacao_emprestimo(hoje)['atrasados'])
+
+    def em_andamento(self, hoje=None):
+        return self.filter(filtros_situacao_emprestimo(hoje)['andamento'])
+
+    def devolvidos(self):
+        return self.filter(status='DEVOLVIDO')
+
+
 class Emprestimo(models.Model):
     """
     Modelo para registrar o empréstimo de um livro para um leitor.
@@ -108,16 +201,142 @@ class Emprestimo(models.Model):
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
 
+    objects = EmprestimoQuerySet.as_manager()
+
+    # Ver EmprestimoArquivado: as telas de histórico listam os dois juntos
+    arquivado = False
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Guarda o status lido do banco para os contadores do painel saberem,
+        # no post_save, se o empréstimo deixou de estar ativo
+        instancia._status_original = dict(zip(field_names, values)).get('status')
+        return instancia
+
     def save(self, *args, **kwargs):
         # Define a data de devolução prevista para 14 dias após o empréstimo
         if not self.id:
             self.data_devolucao_prevista = self.data_emprestimo + datetime.timedelta(days=14)
         super().save(*args, **kwargs)
 
+    @property
+    def esta_atrasado(self):
+        if self.status == 'ATRASADO':
+            return True
+        return self.status == 'EMPRESTADO' and self.data_devolucao_prevista < timezone.localdate()
+
     def __str__(self):
         return f"{self.livro.nome} emprestado para {self.leitor.nome}"
 
     class Meta:
         verbose_name = "Empréstimo"
         verbose_name_plural = "Empréstimos"
-        ordering = ['-data_emprestimo']
\ No newline at end of file
+        ordering = ['-data_emprestimo']
+        indexes = [
+            models.Index(fields=['-data_emprestimo', '-id'], name='emprestimo_data_id_idx'),
+            # Abas de consultar_emprestimos: WHERE status = ? ORDER BY data_emprestimo DESC, id DESC
+            models.Index(fields=['status', '-data_emprestimo', '-id'], name='emprestimo_status_data_idx'),
+            # Varredura de atrasos: WHERE status = 'EMPRESTADO' AND data_devolucao_prevista < hoje
+            models.Index(fields=['status', 'data_devolucao_prevista'], name='emprestimo_status_prev_idx'),
+            # Arquivamento (archive_emprestimos): WHERE status = 'DEVOLVIDO' AND
+            # data_devolucao_real < corte ORDER BY data_devolucao_real
+            models.Index(fields=['status', 'data_devolucao_real'], name='emprestimo_status_real_idx'),
+            # Histórico por livro: WHERE livro_id = ? ORDER BY data_emprestimo DESC, id DESC
+            models.Index(fields=['livro', '-data_emprestimo', '-id'], name='emprestimo_livro_data_idx'),
+        ]
+        constraints = [
+            # Um exemplar só pode ter um empréstimo ativo (índice único parcial)
+            models.UniqueConstraint(
+                fields=['livro'],
+                condition=models.Q(status__in=STATUS_ATIVOS),
+                name='emprestimo_um_ativo_por_livro',
+            ),
+        ]
+
+
+class EmprestimoArquivado(models.Model):
+    """
+    Empréstimo devolvido que saiu da tabela Emprestimo pelo comando
+    archive_emprestimos (ver emprestimos.arquivar). Guarda o mesmo id e as
+    mesmas datas do original. A tabela só recebe inserções: nada aqui é
+    editado ou excluído pelo sistema. A aba de histórico de
+    consultar_emprestimos e o relatório de histórico do livro leem as duas
+    tabelas juntas (paginacao.paginar_varias).
+    """
+    # O id do empréstimo original; os dois nunca se repetem porque o id de
+    # Emprestimo não é reaproveitado (AUTOINCREMENT no SQLite, sequência no Postgres)
+    id = models.BigIntegerField(primary_key=True)
+
+    livro = models.ForeignKey(Livro, on_delete=models.PROTECT, related_name='emprestimos_arquivados')
+    leitor = models.ForeignKey(Leitor, on_delete=models.PROTECT, related_name='emprestimos_arquivados')
+    funcionario = models.ForeignKey(
+        Funcionario, on_delete=models.SET_NULL, null=True, related_name='emprestimos_arquivados'
+    )
+
+    data_emprestimo = models.DateField()
+    data_devolucao_prevista = models.DateField()
+    data_devolucao_real = models.DateField()
+    status = models.CharField(max_length=20, choices=Emprestimo.STATUS_CHOICES, default='DEVOLVIDO')
+
+    data_criacao = models.DateTimeField()
+    data_atualizacao = models.DateTimeField()
+    data_arquivamento = models.DateTimeField(default=timezone.now)
+
+    arquivado = True
+    # Só empréstimos devolvidos são arquivados
+    esta_atrasado = False
+
+    def __str__(self):
+        return f"{self.livro.nome} emprestado para {self.leitor.nome}"
+
+    class Meta:
+        verbose_name = "Empréstimo arquivado"
+        verbose_name_plural = "Empréstimos arquivados"
+        ordering = ['-data_emprestimo']
+        indexes = [
+            # Aba de histórico de consultar_emprestimos
+            models.Index(fields=['-data_emprestimo', '-id'], name='arquivado_data_id_idx'),
+            # Histórico por livro
+            models.Index(fields=['livro', '-data_emprestimo', '-id'], name='arquivado_livro_data_idx'),
+        ]
+
+
+class ExecucaoTarefa(models.Model):
+    """
+    Controle das tarefas agendadas (ex: sweep_overdue): guarda o último dia
+    processado para que rodar o comando de novo no mesmo dia não faça nada.
+    """
+    nome = models.CharField(max_length=50, unique=True)
+    ultima_data = models.DateField(null=True, blank=True)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nome} ({self.ultima_data or 'nunca executada'})"
+
+    class Meta:
+        verbose_name = "Execução de tarefa"
+        verbose_name_plural = "Execuções de tarefas"
+
+
+class ContadoresPainel(models.Model):
+    """
+    Totais exibidos no dashboard (home_view), mantidos pelos sinais em
+    biblioteca/signals.py. Existe uma única linha (pk=1), lida numa consulta
+    só. Se os números divergirem, `python manage.py rebuild_counters` recalcula.
+    """
+    livros = models.BigIntegerField(default=0)
+    leitores = models.BigIntegerField(default=0)
+    funcionarios = models.BigIntegerField(default=0)
+    emprestimos_ativos = models.BigIntegerField(default=0)
+    # Mantido pelo archive_emprestimos; a aba de histórico soma este total
+    # ao dos devolvidos que ainda estão em Emprestimo
+    emprestimos_arquivados = models.BigIntegerField(default=0)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return "Contadores do painel"
+
+    class Meta:
+        verbose_name = "Contadores do painel"
+        verbose_name_plural = "Contadores do painel"
@@ -0,0 +1,229 @@
+# biblioteca/paginacao.py
+"""
+Paginação por cursor (keyset) para as listagens do sistema.
+
+Em vez de OFFSET, cada página é buscada a partir dos valores da última (ou da
+primeira) linha exibida, ex: WHERE (nome, id) > ('Dom Casmurro', 42).
+Assim a página N custa o mesmo que a página 1, desde que exista um índice
+sobre os campos da ordenação.
+
+paginar_varias pagina vários querysets como uma lista só (ex: Emprestimo e
+EmprestimoArquivado): cada um busca no máximo uma página pelo próprio índice
+e as linhas são intercaladas em Python, sem UNION no banco.
+"""
+import base64
+import json
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+TAMANHO_PADRAO = 25
+TAMANHO_MAXIMO = 100
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(valores):
+    dados = json.dumps(valores, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, model, ordenacao):
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+    except (ValueError, TypeError):
+        raise CursorInvalido(cursor)
+    if not isinstance(valores, list) or len(valores) != len(ordenacao):
+        raise CursorInvalido(cursor)
+
+    # Converte de volta para o tipo do campo (ex: string ISO -> date).
+    # Anotações (ex: a relevância da busca) não são campos e ficam como estão.
+    convertidos = []
+    for campo, valor in zip(ordenacao, valores):
+        try:
+            field = model._meta.get_field(campo.lstrip('-'))
+        except FieldDoesNotExist:
+            convertidos.append(valor)
+            continue
+        try:
+            convertidos.append(field.to_python(valor))
+        except Exception:
+            raise CursorInvalido(cursor)
+    return convertidos
+
+
+def _filtro_keyset(ordenacao, valores, para_tras=False):
+    """
+    Monta o equivalente a (a, b, c) > (va, vb, vc) respeitando a direção de
+    cada campo: a > va OR (a = va AND b > vb) OR (a = va AND b = vb AND c > vc).
+    """
+    filtro = Q()
+    iguais = {}
+    for campo, valor in zip(ordenacao, valores):
+        nome = campo.lstrip('-')
+        decrescente = campo.startswith('-')
+        maior = decrescente == para_tras
+        operador = 'gt' if maior else 'lt'
+        filtro |= Q(**iguais, **{f'{nome}__{operador}': valor})
+        iguais[nome] = valor
+    return filtro
+
+
+def _inverter(ordenacao):
+    return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in ordenacao]
+
+
+def tamanho_da_pagina(request, padrao=None):
+    padrao = padrao or getattr(settings, 'PAGINACAO_TAMANHO', TAMANHO_PADRAO)
+    maximo = getattr(settings, 'PAGINACAO_TAMANHO_MAXIMO', TAMANHO_MAXIMO)
+    try:
+        tamanho = int(request.GET.get('tamanho', padrao))
+    except (TypeError, ValueError):
+        tamanho = padrao
+    return max(1, min(tamanho, maximo))
+
+
+class PaginaCursor:
+    """
+    Resultado de uma paginação por cursor. `itens` é uma lista já avaliada,
+    então o template pode usar `{% if %}` e `{% for %}` sem novas consultas.
+    """
+
+    def __init__(self, request, itens, ordenacao, tem_proxima, tem_anterior):
+        self.request = request
+        self.itens = itens
+        self.ordenacao = ordenacao
+        self.tem_proxima = tem_proxima
+        self.tem_anterior = tem_anterior
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self):
+        return len(self.itens)
+
+    def __bool__(self):
+        return bool(self.itens)
+
+    def _chave(self, obj):
+        return [getattr(obj, campo.lstrip('-')) for campo in self.ordenacao]
+
+    def _url(self, parametro, obj):
+        params = self.request.GET.copy()
+        params.pop('depois', None)
+        params.pop('antes', None)
+        params[parametro] = codificar_cursor(self._chave(obj))
+        return f'?{params.urlencode()}'
+
+    @property
+    def cursor_proximo(self):
+        if self.tem_proxima and self.itens:
+            return codificar_cursor(self._chave(self.itens[-1]))
+        return None
+
+    @property
+    def cursor_anterior(self):
+        if self.tem_anterior and self.itens:
+            return codificar_cursor(self._chave(self.itens[0]))
+        return None
+
+    @property
+    def url_proxima(self):
+        if self.tem_proxima and self.itens:
+            return self._url('depois', self.itens[-1])
+        return None
+
+    @property
+    def url_anterior(self):
+        if self.tem_anterior and self.itens:
+            return self._url('antes', self.itens[0])
+        return None
+
+    @property
+    def url_primeira(self):
+        params = self.request.GET.copy()
+        params.pop('depois', None)
+        params.pop('antes', None)
+        return f'?{params.urlencode()}'
+
+
+def _preparar(request, queryset, ordenacao, tamanho):
+    """Monta a consulta da página; devolve (consulta, para_tras, tem_cursor)."""
+    depois = request.GET.get('depois')
+    antes = request.GET.get('antes')
+    model = queryset.model
+
+    try:
+        if antes:
+            valores = decodificar_cursor(antes, model, ordenacao)
+            consulta = (
+                queryset.filter(_filtro_keyset(ordenacao, valores, para_tras=True))
+                .order_by(*_inverter(ordenacao))[:tamanho + 1]
+            )
+            return consulta, True, True
+
+        if depois:
+            valores = decodificar_cursor(depois, model, ordenacao)
+            queryset = queryset.filter(_filtro_keyset(ordenacao, valores))
+    except CursorInvalido:
+        # Cursor adulterado ou antigo: volta para a primeira página
+        depois = None
+
+    return queryset.order_by(*ordenacao)[:tamanho + 1], False, bool(depois)
+
+
+def _montar_pagina(request, linhas, ordenacao, tamanho, para_tras, tem_cursor):
+    if para_tras:
+        tem_anterior = len(linhas) > tamanho
+        return PaginaCursor(request, linhas[:tamanho][::-1], ordenacao, True, tem_anterior)
+    tem_proxima = len(linhas) > tamanho
+    return PaginaCursor(request, linhas[:tamanho], ordenacao, tem_proxima, tem_cursor)
+
+
+def paginar(request, queryset, ordenacao, tamanho=None):
+    """
+    Pagina `queryset` pela tupla `ordenacao` (ex: ('nome', 'id') ou
+    ('-data_emprestimo', '-id')). O último campo deve ser único para que os
+    cursores sejam estáveis. Lê `depois`, `antes` e `tamanho` de request.GET.
+    """
+    ordenacao = list(ordenacao)
+    tamanho = tamanho or tamanho_da_pagina(request)
+    consulta, para_tras, tem_cursor = _preparar(request, queryset, ordenacao, tamanho)
+    return _montar_pagina(request, list(consulta), ordenacao, tamanho, para_tras, tem_cursor)
+
+
+def _ordenar(linhas, ordenacao):
+    # Do campo menos para o mais importante: o sort é estável, também com reverse
+    for campo in reversed(ordenacao):
+        linhas.sort(key=attrgetter(campo.lstrip('-')), reverse=campo.startswith('-'))
+
+
+def paginar_varias(request, querysets, ordenacao, tamanho=None):
+    """
+    Como `paginar`, mas sobre a junção de `querysets` de models com os campos
+    da `ordenacao`. O último campo deve ser único entre todos eles, e nenhum
+    pode ser nulo. Uma consulta de até tamanho + 1 linhas por queryset.
+    """
+    ordenacao = list(ordenacao)
+    tamanho = tamanho or tamanho_da_pagina(request)
+    linhas = []
+    for queryset in querysets:
+        consulta, para_tras, tem_cursor = _preparar(request, queryset, ordenacao, tamanho)
+        linhas.extend(consulta)
+    _ordenar(linhas, _inverter(ordenacao) if para_tras else ordenacao)
+    return _montar_pagina(request, linhas, ordenacao, tamanho, para_tras, tem_cursor)
+
+
+async def apaginar(request, queryset, ordenacao, tamanho=None):
+    """Versão assíncrona de `paginar`, para views `async def` (ORM assíncrono)."""
+    ordenacao = list(ordenacao)
+    tamanho = tamanho or tamanho_da_pagina(request)
+    consulta, para_tras, tem_cursor = _preparar(request, queryset, ordenacao, tamanho)
+    linhas = [obj async for obj in consulta]
+    return _montar_pagina(request, linhas, ordenacao, tamanho, para_tras, tem_cursor)
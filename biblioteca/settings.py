@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,9 +43,23 @@ INSTALLED_APPS = [
     'biblioteca',
 ]
 
+# Medição por requisição (biblioteca/metricas.py): cabeçalho Server-Timing,
+# log JSON no logger 'biblioteca.metricas' e resumo p50/p95 em /metricas/.
+# Desligada, o MetricasMiddleware se remove da pilha (MiddlewareNotUsed).
+BIBLIOTECA_METRICAS = os.environ.get('BIBLIOTECA_METRICAS') == '1'
+
+# gzip/brotli das páginas e exportações (ver biblioteca/compressao.py).
+# BIBLIOTECA_COMPRESSAO=0 desliga, para quando um proxy na frente já comprime.
+BIBLIOTECA_COMPRESSAO = os.environ.get('BIBLIOTECA_COMPRESSAO', '1') == '1'
+
 MIDDLEWARE = [
+    # Serve o STATIC_ROOT (ver estaticos.py); só entra depois do collectstatic
+    'biblioteca.middleware.arquivos_estaticos_middleware',
+    'biblioteca.middleware.MetricasMiddleware',
+    'biblioteca.middleware.compressao_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'biblioteca.middleware.funcionario_logado_middleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -56,7 +71,11 @@ ROOT_URLCONF = 'biblioteca.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Com as métricas ligadas, o backend também mede o tempo de render()
+        'BACKEND': (
+            'biblioteca.metricas.DjangoTemplatesMedidos' if BIBLIOTECA_METRICAS
+            else 'django.template.backends.django.DjangoTemplates'
+        ),
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,12 +94,70 @@ WSGI_APPLICATION = 'biblioteca.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# Perfil de produção do SQLite (ligue com BIBLIOTECA_SQLITE_PRODUCAO=1).
+# Os PRAGMAs rodam a cada nova conexão:
+# - WAL: leitores não bloqueiam o escritor e vice-versa
+# - synchronous=NORMAL: seguro com WAL e bem mais barato que FULL
+# - busy_timeout: espera o lock em vez de falhar com "database is locked"
+# - mmap_size / cache_size / temp_store: leitura mapeada em memória (256 MB),
+#   cache de páginas de ~64 MB e tabelas temporárias em RAM
+# BEGIN IMMEDIATE faz cada transaction.atomic() pegar o lock de escrita no
+# início, evitando o impasse de duas transações que leem e depois tentam
+# escrever (que o busy_timeout não resolve). Compare os dois perfis com
+# `python manage.py benchmark_sqlite`.
+SQLITE_OPCOES_PRODUCAO = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA busy_timeout=5000;'
+        'PRAGMA mmap_size=268435456;'
+        'PRAGMA cache_size=-64000;'
+        'PRAGMA temp_store=MEMORY;'
+    ),
+    'transaction_mode': 'IMMEDIATE',
 }
+SQLITE_PRODUCAO = os.environ.get('BIBLIOTECA_SQLITE_PRODUCAO') == '1'
+
+# O banco é escolhido por variáveis de ambiente:
+# - BIBLIOTECA_DB=sqlite (padrão): arquivo db.sqlite3, ou BIBLIOTECA_SQLITE_PATH
+# - BIBLIOTECA_DB=postgres: POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD,
+#   POSTGRES_HOST (nome, IP ou diretório do socket) e POSTGRES_PORT
+# No Postgres cada processo reaproveita a conexão por CONN_MAX_AGE segundos
+# (BIBLIOTECA_DB_CONN_MAX_AGE, padrão 60), testando-a antes de reusar. Com
+# BIBLIOTECA_DB_POOL=1 usa o pool do psycopg 3 (pacote psycopg[pool]), entre
+# BIBLIOTECA_DB_POOL_MIN e BIBLIOTECA_DB_POOL_MAX conexões por processo; o pool
+# exige CONN_MAX_AGE=0. Para levar os dados do SQLite para o Postgres, rode
+# `migrate` no Postgres e depois `python manage.py migrar_sqlite_para_postgres`.
+BIBLIOTECA_DB = os.environ.get('BIBLIOTECA_DB', 'sqlite')
+
+if BIBLIOTECA_DB == 'postgres':
+    POSTGRES_POOL = os.environ.get('BIBLIOTECA_DB_POOL') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'biblioteca'),
+            'USER': os.environ.get('POSTGRES_USER', 'biblioteca'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if POSTGRES_POOL else int(os.environ.get('BIBLIOTECA_DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': not POSTGRES_POOL,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('BIBLIOTECA_DB_POOL_MIN', '2')),
+                    'max_size': int(os.environ.get('BIBLIOTECA_DB_POOL_MAX', '10')),
+                },
+            } if POSTGRES_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BIBLIOTECA_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': SQLITE_OPCOES_PRODUCAO if SQLITE_PRODUCAO else {},
+        }
+    }
 
 
 # Password validation
@@ -124,7 +201,77 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles' # Para `collectstatic` em produção
 
+# Nomes com hash do conteúdo (bootstrap.min.3a1b2c.css) e versões .gz/.br
+# gravadas pelo collectstatic; servidos pelo arquivos_estaticos_middleware
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'biblioteca.estaticos.ArmazenamentoEstatico'},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Paginação por cursor das listagens (biblioteca/paginacao.py)
+# O usuário pode pedir outro tamanho com ?tamanho=, limitado ao máximo.
+PAGINACAO_TAMANHO = 25
+PAGINACAO_TAMANHO_MAXIMO = 100
+
+# Cache da página pública do acervo (biblioteca/cache_acervo.py).
+# Em memória local por padrão; com vários processos (gunicorn -w N), troque
+# pelo FileBasedCache para que a versão do catálogo seja compartilhada:
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': BASE_DIR / 'cache',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'biblioteca',
+    }
+}
+ACERVO_CACHE_ALIAS = 'default'
+ACERVO_CACHE_TIMEOUT = 600  # segundos
+
+# Armazenamento das sessões (BIBLIOTECA_SESSOES). Toda view protegida lê a
+# sessão; com o padrão 'db' isso é uma consulta por página.
+# - cached_db: lê do cache acima e só vai ao banco quando a sessão não está
+#   lá (as gravações vão aos dois). Com LocMemCache cada processo aquece o
+#   seu próprio cache; com vários processos use um cache compartilhado.
+# - cookie: os dados ficam no cookie, assinado com a SECRET_KEY. Nenhuma
+#   consulta, mas o logout só vale para aquele navegador (uma cópia antiga do
+#   cookie continua válida até expirar) e tudo precisa caber em ~4 KB.
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+}[os.environ.get('BIBLIOTECA_SESSOES', 'db')]
+
+# As linhas JSON das métricas (uma por requisição) vão para o stderr
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'mensagem': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'metricas': {'class': 'logging.StreamHandler', 'formatter': 'mensagem'},
+    },
+    'loggers': {
+        'biblioteca.metricas': {'handlers': ['metricas'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Modo de implantação ASGI (uvicorn/daphne biblioteca.asgi:application).
+# O asgi.py liga esta variável; com ela o /acervo/ e as sugestões da busca
+# usam as views `async def` (ORM assíncrono) em vez das síncronas, que sob
+# ASGI ocupariam uma thread do pool sync_to_async por requisição.
+BIBLIOTECA_ASGI = os.environ.get('BIBLIOTECA_ASGI') == '1'
+
+# Máximo de empréstimos ativos por leitor (BIBLIOTECA_LIMITE_EMPRESTIMOS);
+# 0, o padrão, é sem limite. Conferido no contador Leitor.emprestimos_ativos
+# (ver biblioteca/emprestimos.py).
+BIBLIOTECA_LIMITE_EMPRESTIMOS = int(os.environ.get('BIBLIOTECA_LIMITE_EMPRESTIMOS', '0'))
+
+# Idade mínima, em dias desde a devolução, para o comando archive_emprestimos
+# mover um empréstimo para EmprestimoArquivado (BIBLIOTECA_ARQUIVAR_APOS_DIAS).
+BIBLIOTECA_ARQUIVAR_APOS_DIAS = int(os.environ.get('BIBLIOTECA_ARQUIVAR_APOS_DIAS', '180'))
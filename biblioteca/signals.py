@@ -0,0 +1,58 @@
+# biblioteca/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache_acervo, contadores
+from .models import STATUS_ATIVOS, Emprestimo, Funcionario, Leitor, Livro
+
+CAMPO_POR_MODELO = {
+    Livro: 'livros',
+    Leitor: 'leitores',
+    Funcionario: 'funcionarios',
+}
+
+
+@receiver(post_save, sender=Livro)
+@receiver(post_save, sender=Leitor)
+@receiver(post_save, sender=Funcionario)
+def contar_cadastro(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        contadores.ajustar(**{CAMPO_POR_MODELO[sender]: 1})
+
+
+@receiver(post_delete, sender=Livro)
+@receiver(post_delete, sender=Leitor)
+@receiver(post_delete, sender=Funcionario)
+def descontar_cadastro(sender, instance, **kwargs):
+    contadores.ajustar(**{CAMPO_POR_MODELO[sender]: -1})
+
+
+@receiver(post_save, sender=Emprestimo)
+def contar_emprestimo(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    ativo_antes = not created and getattr(instance, '_status_original', None) in STATUS_ATIVOS
+    ativo_agora = instance.status in STATUS_ATIVOS
+    contadores.ajustar(emprestimos_ativos=int(ativo_agora) - int(ativo_antes))
+    instance._status_original = instance.status
+
+
+@receiver(post_delete, sender=Emprestimo)
+def descontar_emprestimo(sender, instance, **kwargs):
+    # emprestimos.excluir/excluir_consulta descontam por conta própria
+    if instance.status in STATUS_ATIVOS and contadores.ajuste_automatico():
+        contadores.ajustar(emprestimos_ativos=-1)
+
+
+@receiver(post_save, sender=Livro)
+def invalidar_acervo_ao_salvar(sender, instance, raw=False, **kwargs):
+    # Só invalida depois do commit, para ninguém cachear a versão antiga
+    # do catálogo com a nova chave enquanto a transação está aberta
+    if not raw:
+        transaction.on_commit(lambda: cache_acervo.invalidar(instance.data_atualizacao))
+
+
+@receiver(post_delete, sender=Livro)
+def invalidar_acervo_ao_excluir(sender, instance, **kwargs):
+    transaction.on_commit(cache_acervo.invalidar)
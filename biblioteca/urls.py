@@ -46,17 +46,30 @@ urlpatterns = [
     path('emprestimo/', views.emprestimo_index, name='emprestimo_index'),
     path('emprestimo/cadastrar/', views.cadastrar_emprestimo, name='cadastrar_emprestimo'),
     path('emprestimo/consultar/', views.consultar_emprestimos, name='consultar_emprestimos'),
+    path('emprestimo/lote/emprestar/', views.emprestar_lote, name='emprestar_lote'),
+    path('emprestimo/lote/devolver/', views.devolver_lote, name='devolver_lote'),
+    path('emprestimo/buscar/leitores/', views.buscar_leitores, name='buscar_leitores'),
+    path('emprestimo/buscar/livros/', views.buscar_livros_disponiveis, name='buscar_livros_disponiveis'),
     path('emprestimo/atualizar/<int:pk>/', views.atualizar_emprestimo, name='atualizar_emprestimo'),
     path('emprestimo/excluir/<int:pk>/', views.excluir_emprestimo, name='excluir_emprestimo'),
 
     # --- NOVA URL PARA RELATÓRIOS ---
     path('relatorio/', views.relatorio_index, name='relatorio_index'),
     path('relatorio/livros_emprestados/', views.relatorio_livros_emprestados, name='relatorio_livros_emprestados'),
+    path('relatorio/buscar/livros/', views.buscar_livros_catalogo, name='buscar_livros_catalogo'),
     path('relatorio/historico_livro/', views.relatorio_historico_livro, name='relatorio_historico_livro'),
     path('relatorio/leitores_atrasados/', views.relatorio_leitores_atrasados, name='relatorio_leitores_atrasados'),
+    path('relatorio/<slug:relatorio>/exportar/<str:formato>/', views.relatorio_exportar, name='relatorio_exportar'),
+    path('metricas/', views.metricas_view, name='metricas'),
 
      # --- NOVA URL PÚBLICA PARA O ACERVO ---
-    path('acervo/', views.acervo_view, name='acervo'),
+    # No modo ASGI (asgi.py) as views assíncronas atendem o acervo
+    path('acervo/', views.acervo_async if settings.BIBLIOTECA_ASGI else views.acervo_view, name='acervo'),
+    path(
+        'acervo/sugestoes/',
+        views.acervo_sugestoes_async if settings.BIBLIOTECA_ASGI else views.acervo_sugestoes,
+        name='acervo_sugestoes',
+    ),
 
     
 ]
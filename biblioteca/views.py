@@ -1,12 +1,27 @@
 # biblioteca/views.py
+import datetime
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.db.models import Count, F, Q, Sum
 from django.contrib import messages # Para mensagens de feedback ao usuário
 # from django.contrib.auth import authenticate, login, logout # Será usado para o sistema de autenticação real do Django
 from .models import Funcionario, Leitor, Livro
 from .forms import FuncionarioForm, LeitorForm, LivroForm
+from . import contadores, emprestimos, metricas
+from .cache_acervo import cache_do_acervo
+from .compressao import etag_fraco
+from .exportacao import resposta_exportacao
+from .busca import abuscar_livros, buscar_livros, buscar_pessoas
+from .facetas import contar_facetas
+from .middleware import obter_funcionario
+from .paginacao import apaginar, paginar, paginar_varias
 from django.utils import timezone
 
+# Quantidade de sugestões devolvidas pelos endpoints de autocompletar
+LIMITE_SUGESTOES = 8
+
 # --- Views de Autenticação (Login e Logout) ---
 # Usando a simulação do seu HTML por enquanto.
 # O ideal é integrar com o sistema de autenticação do Django (django.contrib.auth)
@@ -55,19 +70,16 @@ def home_view(request):
     """
     Exibe o dashboard principal com estatísticas da biblioteca.
     """
-    # Realiza as contagens no banco de dados
-    total_livros = Livro.objects.count()
-    total_leitores = Leitor.objects.count()
-    total_funcionarios = Funcionario.objects.count()
-    
-    # Conta apenas os empréstimos que não foram devolvidos
-    emprestimos_ativos = Emprestimo.objects.filter(status__in=['EMPRESTADO', 'ATRASADO']).count()
+    # Lê os totais já contados (uma linha, uma consulta) em vez de quatro
+    # COUNT(*); os sinais em signals.py mantêm esses números em dia
+    totais = contadores.obter()
 
     context = {
-        'total_livros': total_livros,
-        'total_leitores': total_leitores,
-        'total_funcionarios': total_funcionarios,
-        'emprestimos_ativos': emprestimos_ativos,
+        'total_livros': totais.livros,
+        'total_leitores': totais.leitores,
+        'total_funcionarios': totais.funcionarios,
+        # Conta apenas os empréstimos que não foram devolvidos
+        'emprestimos_ativos': totais.emprestimos_ativos,
     }
     
     return render(request, 'home.html', context)
@@ -94,19 +106,20 @@ def cadastrar_funcionario(request):
     return render(request, 'funcionario/cadastrar_funcionario.html', {'form': form})
 
 @funcionario_login_required
+@etag_fraco
 def consultar_funcionario(request):
     query = request.GET.get('q')
     funcionarios = Funcionario.objects.all().order_by('nome')
 
     if query:
-        # Filtra por nome OU email que contenham o termo da busca
-        funcionarios = funcionarios.filter(
-            Q(nome__icontains=query) | Q(email__icontains=query)
-        )
-        if not funcionarios.exists():
-            messages.info(request, f"Nenhum funcionário encontrado para a busca: '{query}'.")
+        # Busca indexada: CPF (dígitos), e-mail (com '@') ou início do nome
+        funcionarios = buscar_pessoas(funcionarios, query)
 
-    return render(request, 'funcionario/consultar_funcionario.html', {'funcionarios': funcionarios, 'query': query})
+    pagina = paginar(request, funcionarios, ('nome', 'id'))
+    if query and not pagina.itens and not pagina.tem_anterior:
+        messages.info(request, f"Nenhum funcionário encontrado para a busca: '{query}'.")
+
+    return render(request, 'funcionario/consultar_funcionario.html', {'funcionarios': pagina.itens, 'pagina': pagina, 'query': query})
 
 @funcionario_login_required
 def atualizar_funcionario(request, pk): # 'pk' para Primary Key do funcionário
@@ -154,19 +167,20 @@ def cadastrar_leitor(request):
     return render(request, 'leitor/cadastrar_leitor.html', {'form': form})
 
 @funcionario_login_required
+@etag_fraco
 def consultar_leitor(request):
     query = request.GET.get('q')
     leitores = Leitor.objects.all().order_by('nome')
 
     if query:
-        # Filtra por nome OU CPF que contenham o termo da busca
-        leitores = leitores.filter(
-            Q(nome__icontains=query) | Q(cpf__icontains=query)
-        )
-        if not leitores.exists():
-            messages.info(request, f"Nenhum leitor encontrado para a busca: '{query}'.")
+        # Busca indexada: CPF com ou sem pontuação, e-mail ou início do nome
+        leitores = buscar_pessoas(leitores, query)
 
-    return render(request, 'leitor/consultar_leitor.html', {'leitores': leitores, 'query': query})
+    pagina = paginar(request, leitores, ('nome', 'id'))
+    if query and not pagina.itens and not pagina.tem_anterior:
+        messages.info(request, f"Nenhum leitor encontrado para a busca: '{query}'.")
+
+    return render(request, 'leitor/consultar_leitor.html', {'leitores': pagina.itens, 'pagina': pagina, 'query': query})
 
 @funcionario_login_required
 def atualizar_leitor(request, pk): # 'pk' para Primary Key do leitor
@@ -217,6 +231,7 @@ def cadastrar_livro(request):
 # biblioteca/views.py
 
 @funcionario_login_required
+@etag_fraco
 def consultar_livro(request):
     """
     Painel de gerenciamento de livros com busca e abas para filtrar por status.
@@ -226,30 +241,37 @@ def consultar_livro(request):
     status_selecionado = request.GET.get('status', 'disponivel') # Padrão é 'disponivel'
 
     # Começa com todos os livros
-    livros_list = Livro.objects.all().order_by('nome')
+    livros_list = Livro.objects.all()
+    ordenacao = ('nome', 'id')
 
-    # 1. Aplica o filtro de busca primeiro, se houver
+    # 1. Aplica o filtro de busca primeiro, se houver (FTS5 por relevância,
+    # ou icontains quando o índice não está disponível)
     if query:
-        livros_list = livros_list.filter(
-            Q(nome__icontains=query) | Q(isbn__icontains=query) | Q(autor__icontains=query)
-        )
+        livros_list, ordenacao = buscar_livros(livros_list, query, campos_fallback=('nome', 'isbn', 'autor'))
     
-    # Contagens para as abas (baseadas na lista completa ou na busca)
-    count_disponiveis = livros_list.filter(status='disponivel').count()
-    count_emprestados = livros_list.filter(status='emprestado').count()
+    # Contagens para as abas (baseadas na lista completa ou na busca),
+    # as duas numa única consulta
+    contagens = contar_facetas(livros_list, {
+        'disponiveis': Q(status='disponivel'),
+        'emprestados': Q(status='emprestado'),
+    })
     
     # 2. Aplica o filtro de status (aba selecionada)
     if status_selecionado == 'emprestados':
-        livros_filtrados = livros_list.filter(status='emprestado')
+        # Com quem está cada livro vem pelo emprestimo_atual, no mesmo SELECT
+        livros_filtrados = livros_list.filter(status='emprestado').select_related('emprestimo_atual__leitor')
     else: # 'disponivel'
         livros_filtrados = livros_list.filter(status='disponivel')
 
+    pagina = paginar(request, livros_filtrados, ordenacao)
+
     context = {
-        'livros': livros_filtrados,
+        'livros': pagina.itens,
+        'pagina': pagina,
         'query': query,
         'status_selecionado': status_selecionado,
-        'count_disponiveis': count_disponiveis,
-        'count_emprestados': count_emprestados,
+        'count_disponiveis': contagens['disponiveis'],
+        'count_emprestados': contagens['emprestados'],
     }
     
     return render(request, 'livro/consultar_livro.html', context)
@@ -299,18 +321,6 @@ def cadastrar_livro(request):
         form = LivroForm()
     return render(request, 'livro/cadastrar_livro.html', {'form': form})
 
-@funcionario_login_required
-def consultar_livro(request):
-    query = request.GET.get('q')
-    livros = Livro.objects.all()
-
-    if query:
-        livros = livros.filter(Q(nome__icontains=query) | Q(isbn__icontains=query))
-        if not livros.exists():
-            messages.info(request, f"Nenhum livro (obra) encontrado para a busca: '{query}'.")
-    
-    return render(request, 'livro/consultar_livro.html', {'livros': livros, 'query': query})
-
 @funcionario_login_required
 def atualizar_livro(request, pk):
     livro = get_object_or_404(Livro, pk=pk)
@@ -348,8 +358,8 @@ def emprestimo_index(request):
 
 # biblioteca/views.py
 
-from .models import Funcionario, Leitor, Livro, Emprestimo # Verifique se Emprestimo está importado
-from .forms import FuncionarioForm, LeitorForm, LivroForm, EmprestimoForm # Adicione EmprestimoForm
+from .models import Funcionario, Leitor, Livro, Emprestimo, EmprestimoArquivado, filtros_situacao_emprestimo # Verifique se Emprestimo está importado
+from .forms import FuncionarioForm, LeitorForm, LivroForm, EmprestimoForm, EmprestimoLoteForm, DevolucaoLoteForm, HistoricoLivroForm, rotulo_leitor, rotulo_livro # Adicione EmprestimoForm
 
 # ... (outras views) ...
 
@@ -358,34 +368,136 @@ def cadastrar_emprestimo(request):
     if request.method == 'POST':
         form = EmprestimoForm(request.POST)
         if form.is_valid():
-            # Não salva o objeto no banco ainda, apenas cria uma instância
-            emprestimo = form.save(commit=False)
-            
-            # --- Adiciona a lógica de negócio ---
-            
-            # 1. Associa o funcionário logado ao empréstimo
-            try:
-                funcionario_logado_id = request.session.get('funcionario_logado_id')
-                emprestimo.funcionario = Funcionario.objects.get(pk=funcionario_logado_id)
-            except Funcionario.DoesNotExist:
+            # 1. O funcionário logado fica registrado no empréstimo (carregado
+            # uma vez por requisição pelo funcionario_logado_middleware)
+            funcionario = obter_funcionario(request)
+            if funcionario is None:
                 messages.error(request, "Erro: Funcionário logado não encontrado.")
                 return render(request, 'emprestimo/cadastrar_emprestimo.html', {'form': form})
 
-            # 2. Salva o empréstimo no banco de dados
-            emprestimo.save()
-            
-            # 3. Atualiza o status do livro para 'emprestado'
-            livro_emprestado = emprestimo.livro
-            livro_emprestado.status = 'emprestado'
-            livro_emprestado.save()
-            
-            messages.success(request, f"Empréstimo do livro '{livro_emprestado.nome}' registrado com sucesso!")
+            # 2. Reserva o livro e cria o empréstimo numa só transação; se outro
+            # balcão emprestou o mesmo livro nesse meio tempo, nada é gravado
+            livro = form.cleaned_data['livro']
+            try:
+                emprestimos.emprestar(livro, form.cleaned_data['leitor'], funcionario)
+            except emprestimos.ErroEmprestimo as erro:
+                form.add_error('livro', str(erro))
+                return render(request, 'emprestimo/cadastrar_emprestimo.html', {'form': form})
+
+            messages.success(request, f"Empréstimo do livro '{livro.nome}' registrado com sucesso!")
             return redirect('consultar_emprestimos') # Redireciona para a lista de empréstimos
     else:
         form = EmprestimoForm() # Cria um formulário vazio para uma requisição GET
         
     return render(request, 'emprestimo/cadastrar_emprestimo.html', {'form': form})
 
+
+@funcionario_login_required
+def emprestar_lote(request):
+    """
+    Empresta vários livros para um leitor numa única operação (tudo ou nada),
+    exibindo o resultado de cada livro.
+    """
+    itens = None
+    if request.method == 'POST':
+        form = EmprestimoLoteForm(request.POST)
+        if form.is_valid():
+            leitor = form.cleaned_data['leitor']
+            try:
+                itens = emprestimos.emprestar_lote(form.cleaned_data['livros'], leitor, obter_funcionario(request))
+            except emprestimos.ErroLote as erro:
+                messages.error(request, str(erro))
+                itens = erro.itens
+            else:
+                messages.success(request, f"{len(itens)} livro(s) emprestado(s) para {leitor.nome}.")
+                form = EmprestimoLoteForm()
+    else:
+        form = EmprestimoLoteForm()
+
+    return render(request, 'emprestimo/emprestar_lote.html', {'form': form, 'itens': itens})
+
+
+@funcionario_login_required
+def devolver_lote(request):
+    """
+    Lista os empréstimos ativos de um leitor (?leitor=ID) para devolver os
+    marcados de uma só vez (tudo ou nada).
+    """
+    form = DevolucaoLoteForm(request.GET if 'leitor' in request.GET else None)
+    leitor = form.cleaned_data['leitor'] if form.is_valid() else None
+    itens = None
+
+    if request.method == 'POST' and leitor:
+        ids = request.POST.getlist('emprestimos')
+        escolhidos = list(Emprestimo.objects.filter(pk__in=ids, leitor=leitor).select_related('livro'))
+        if not ids:
+            messages.warning(request, "Marque ao menos um empréstimo para devolver.")
+        elif len(escolhidos) != len(set(ids)):
+            messages.error(request, "Algum dos empréstimos marcados não pertence a este leitor.")
+        else:
+            try:
+                itens = emprestimos.devolver_lote(escolhidos)
+            except emprestimos.ErroLote as erro:
+                messages.error(request, str(erro))
+                itens = erro.itens
+            else:
+                messages.success(request, f"{len(itens)} devolução(ões) registrada(s) para {leitor.nome}.")
+
+    ativos = None
+    if leitor:
+        ativos = Emprestimo.objects.ativos().filter(leitor=leitor).select_related('livro').order_by(
+            'data_devolucao_prevista', 'id'
+        )
+
+    context = {'form': form, 'leitor': leitor, 'ativos': ativos, 'itens': itens}
+    return render(request, 'emprestimo/devolver_lote.html', context)
+
+
+def _termo_de_busca(request):
+    """Termo das buscas de autocompletar; None se for curto demais para consultar."""
+    termo = request.GET.get('q', '').strip()
+    return termo if len(termo) >= 2 else None
+
+
+@funcionario_login_required
+def buscar_leitores(request):
+    """
+    Sugestões (JSON) de leitores por nome ou CPF, para o campo de leitor do
+    empréstimo. Usa os índices de prefixo de buscar_pessoas.
+    """
+    termo = _termo_de_busca(request)
+    if termo is None:
+        return JsonResponse({'resultados': []})
+    leitores = buscar_pessoas(Leitor.objects.all(), termo).order_by('nome_normalizado', 'id')
+    return JsonResponse({'resultados': [
+        {'id': leitor.id, 'texto': rotulo_leitor(leitor)}
+        for leitor in leitores.only('id', 'nome', 'cpf')[:LIMITE_SUGESTOES]
+    ]})
+
+
+def _sugestoes_livros(request, livros):
+    """Sugestões (JSON) de livros por título ou ISBN (índice FTS)."""
+    termo = _termo_de_busca(request)
+    if termo is None:
+        return JsonResponse({'resultados': []})
+    livros, ordenacao = buscar_livros(livros, termo, campos_fallback=('nome', 'isbn'))
+    return JsonResponse({'resultados': [
+        {'id': livro.id, 'texto': rotulo_livro(livro)}
+        for livro in livros.order_by(*ordenacao).only('id', 'nome', 'isbn')[:LIMITE_SUGESTOES]
+    ]})
+
+
+@funcionario_login_required
+def buscar_livros_disponiveis(request):
+    """Sugestões para o campo de livro do empréstimo (só os disponíveis)."""
+    return _sugestoes_livros(request, Livro.objects.filter(status='disponivel'))
+
+
+@funcionario_login_required
+def buscar_livros_catalogo(request):
+    """Sugestões entre todos os livros, para os relatórios."""
+    return _sugestoes_livros(request, Livro.objects.all())
+
 # biblioteca/views.py
 
 # ... (outras views) ...
@@ -393,54 +505,65 @@ def cadastrar_emprestimo(request):
 # biblioteca/views.py
 
 @funcionario_login_required
+@etag_fraco
 def consultar_emprestimos(request):
     """
     Painel de gerenciamento de empréstimos com abas para filtrar por status.
     """
-    # Lógica para atualizar o status dos atrasados (que já temos)
-    hoje = timezone.now().date()
-    Emprestimo.objects.filter(data_devolucao_prevista__lt=hoje, status='EMPRESTADO').update(status='ATRASADO')
+    # A view só lê: os atrasos são gravados pelo comando agendado sweep_overdue
+    # e, enquanto ele não roda, calculados aqui pela data de devolução prevista
+    filtros = filtros_situacao_emprestimo(timezone.localdate())
 
     # Pega o parâmetro 'aba' da URL para saber qual filtro aplicar
     aba_selecionada = request.GET.get('aba', 'andamento') # Padrão é 'andamento'
+    if aba_selecionada not in filtros:
+        aba_selecionada = 'andamento'
 
-    # Começa com todos os empréstimos e depois filtra
+    # Começa com todos os empréstimos e depois filtra pela aba
     todos_emprestimos = Emprestimo.objects.select_related('livro', 'leitor', 'funcionario').all()
-
-    if aba_selecionada == 'atrasados':
-        emprestimos_filtrados = todos_emprestimos.filter(status='ATRASADO')
-    elif aba_selecionada == 'historico':
-        emprestimos_filtrados = todos_emprestimos.filter(status='DEVOLVIDO')
-    else: # 'andamento'
-        emprestimos_filtrados = todos_emprestimos.filter(status='EMPRESTADO')
+    emprestimos_filtrados = todos_emprestimos.filter(filtros[aba_selecionada])
+
+    # Contagens das três abas numa única consulta
+    contagens = contar_facetas(Emprestimo.objects.all(), filtros)
+    # Os arquivados vêm do painel, sem contar a tabela do arquivo
+    arquivados = contadores.obter().emprestimos_arquivados
+
+    # Pagina pela mesma ordenação padrão do modelo, com o id como desempate
+    ordenacao = ('-data_emprestimo', '-id')
+    if aba_selecionada == 'historico':
+        # Os devolvidos antigos estão em EmprestimoArquivado (archive_emprestimos)
+        pagina = paginar_varias(request, [
+            emprestimos_filtrados,
+            EmprestimoArquivado.objects.select_related('livro', 'leitor', 'funcionario'),
+        ], ordenacao)
+    else:
+        pagina = paginar(request, emprestimos_filtrados, ordenacao)
     
     context = {
-        'emprestimos': emprestimos_filtrados,
+        'emprestimos': pagina.itens,
+        'pagina': pagina,
         'aba_selecionada': aba_selecionada,
         # Contagens para exibir nas abas
-        'count_andamento': todos_emprestimos.filter(status='EMPRESTADO').count(),
-        'count_atrasados': todos_emprestimos.filter(status='ATRASADO').count(),
-        'count_historico': todos_emprestimos.filter(status='DEVOLVIDO').count(),
+        'count_andamento': contagens['andamento'],
+        'count_atrasados': contagens['atrasados'],
+        'count_historico': contagens['historico'] + arquivados,
     }
     
     return render(request, 'emprestimo/consultar_emprestimos.html', context)
 
 @funcionario_login_required
 def atualizar_emprestimo(request, pk):
-    emprestimo = get_object_or_404(Emprestimo, pk=pk)
+    emprestimo = get_object_or_404(Emprestimo.objects.select_related('livro', 'leitor'), pk=pk)
     
     if request.method == 'POST':
-        # 1. Mudar o status do empréstimo
-        emprestimo.status = 'DEVOLVIDO'
-        emprestimo.data_devolucao_real = timezone.now().date()
-        emprestimo.save()
-
-        # 2. Mudar o status do livro de volta para 'disponível'
-        livro = emprestimo.livro
-        livro.status = 'disponivel'
-        livro.save()
-        
-        messages.success(request, f"Devolução do livro '{livro.nome}' registrada com sucesso!")
+        # Marca o empréstimo como devolvido e libera o livro na mesma transação
+        try:
+            emprestimos.devolver(emprestimo)
+        except emprestimos.ErroEmprestimo as erro:
+            messages.error(request, str(erro))
+            return redirect('consultar_emprestimos')
+
+        messages.success(request, f"Devolução do livro '{emprestimo.livro.nome}' registrada com sucesso!")
         return redirect('consultar_emprestimos')
 
     # Se a requisição for GET, apenas mostra a página de confirmação
@@ -455,14 +578,8 @@ def excluir_emprestimo(request, pk):
     emprestimo = get_object_or_404(Emprestimo, pk=pk)
 
     if request.method == 'POST':
-        livro = emprestimo.livro
-        emprestimo.delete()
-        
-        # Opcional, mas recomendado: verificar se o livro deveria voltar a ser disponível
-        # Esta lógica pode ser mais complexa se o livro tiver outros empréstimos
-        # Por simplicidade, vamos assumir que ele volta a ser disponível
-        livro.status = 'disponivel'
-        livro.save()
+        # Se o empréstimo ainda estava ativo, o livro volta a ficar disponível
+        emprestimos.excluir(emprestimo)
 
         messages.success(request, "Registro de empréstimo excluído com sucesso.")
         return redirect('consultar_emprestimos')
@@ -476,12 +593,9 @@ def relatorio_index(request):
     """
     Renderiza a Central de Relatórios com dados prévios (ex: contagem de atrasos).
     """
-    # Lógica para atualizar o status dos atrasados
-    hoje = timezone.now().date()
-    Emprestimo.objects.filter(data_devolucao_prevista__lt=hoje, status='EMPRESTADO').update(status='ATRASADO')
-
-    # Contagem de empréstimos atrasados para exibir no card
-    count_atrasados = Emprestimo.objects.filter(status='ATRASADO').count()
+    # Contagem de empréstimos atrasados para exibir no card (somente leitura;
+    # quem grava 'ATRASADO' é o comando agendado sweep_overdue)
+    count_atrasados = Emprestimo.objects.atrasados().count()
 
     context = {
         'count_atrasados': count_atrasados,
@@ -490,79 +604,162 @@ def relatorio_index(request):
     return render(request, 'relatorio/relatorio.html', context)
 
 @funcionario_login_required
+@etag_fraco
 def relatorio_livros_emprestados(request):
     """
     Busca e exibe todos os empréstimos com status 'EMPRESTADO' ou 'ATRASADO'.
     """
-    # Filtramos o modelo Emprestimo para pegar apenas os que nos interessam
-    emprestimos_ativos = Emprestimo.objects.filter(
-        status__in=['EMPRESTADO', 'ATRASADO']
-    ).select_related('livro', 'leitor')
-
     context = {
-        'emprestimos': emprestimos_ativos
+        'emprestimos': _consulta_livros_emprestados()
     }
     
     return render(request, 'relatorio/livros_emprestados.html', context)
 
 @funcionario_login_required
+@etag_fraco
 def relatorio_historico_livro(request):
     """
-    Relatório que permite ao usuário selecionar um livro e ver todo o seu
-    histórico de empréstimos.
+    Relatório que permite ao usuário buscar um livro e ver o seu histórico
+    de empréstimos, em páginas, com um resumo no topo.
     """
-    # Pega o ID do livro da URL (ex: ?livro_id=5)
-    livro_id = request.GET.get('livro_id')
-    
-    # Busca todos os livros para popular o menu de seleção
-    todos_livros = Livro.objects.all().order_by('nome')
-    
+    # O livro vem da URL (ex: ?livro_id=5); o campo de busca só consulta os
+    # livros que casam com o que foi digitado, em vez de listar o acervo
+    form = HistoricoLivroForm(request.GET if 'livro_id' in request.GET else None)
+
     livro_selecionado = None
-    emprestimos = None
+    pagina = None
+    resumo = None
 
-    if livro_id:
-        # Se um livro foi selecionado, busca seu histórico
-        livro_selecionado = get_object_or_404(Livro, pk=livro_id)
-        emprestimos = Emprestimo.objects.filter(
-            livro=livro_selecionado
-        ).select_related('leitor', 'funcionario').order_by('-data_emprestimo')
+    if form.is_valid():
+        livro_selecionado = form.cleaned_data['livro_id']
+        resumo = _resumo_historico_livro(livro_selecionado)
+        # Usa o índice (livro, -data_emprestimo, -id) de cada tabela
+        pagina = paginar_varias(request, _consultas_historico_livro(livro_selecionado), ('-data_emprestimo', '-id'))
 
     context = {
-        'todos_livros': todos_livros,
+        'form': form,
         'livro_selecionado': livro_selecionado,
-        'emprestimos': emprestimos
+        'emprestimos': pagina.itens if pagina else None,
+        'pagina': pagina,
+        'resumo': resumo,
     }
     
     return render(request, 'relatorio/historico_livro.html', context)
 
 @funcionario_login_required
+@etag_fraco
 def relatorio_leitores_atrasados(request):
     """
-    Atualiza e exibe todos os leitores com empréstimos atrasados.
+    Exibe todos os leitores com empréstimos atrasados.
     """
-    # 1. Atualiza o status de empréstimos que se tornaram atrasados
-    # Pega a data de hoje
-    hoje = timezone.now().date()
-    # Busca empréstimos que estão 'EMPRESTADO' mas a data de devolução já passou
-    emprestimos_para_atualizar = Emprestimo.objects.filter(
-        data_devolucao_prevista__lt=hoje, 
-        status='EMPRESTADO'
-    )
-    # Atualiza o status de todos eles para 'ATRASADO'
-    emprestimos_para_atualizar.update(status='ATRASADO')
-
-    # 2. Busca todos os empréstimos que agora estão com status 'ATRASADO'
-    leitores_com_atraso = Emprestimo.objects.filter(
-        status='ATRASADO'
-    ).select_related('livro', 'leitor').order_by('leitor__nome', 'data_devolucao_prevista')
-
     context = {
-        'emprestimos_atrasados': leitores_com_atraso
+        'emprestimos_atrasados': _consulta_leitores_atrasados()
     }
     
     return render(request, 'relatorio/leitores_atrasados.html', context)
 
+@funcionario_login_required
+def metricas_view(request):
+    """
+    p50/p95 de latência, SQL e templates por view, das últimas requisições
+    deste processo (ver biblioteca/metricas.py). POST zera as amostras.
+    """
+    if request.method == 'POST':
+        metricas.limpar()
+        messages.info(request, "Amostras de desempenho zeradas.")
+        return redirect('metricas')
+
+    context = {
+        'ligadas': settings.BIBLIOTECA_METRICAS,
+        'linhas': metricas.resumo(),
+        'amostras_por_view': metricas.AMOSTRAS_POR_VIEW,
+    }
+    return render(request, 'relatorio/metricas.html', context)
+
+# --- Consultas dos relatórios (compartilhadas entre a página e a exportação) ---
+
+def _consulta_livros_emprestados():
+    # Filtramos o modelo Emprestimo para pegar apenas os que nos interessam
+    return Emprestimo.objects.filter(
+        status__in=['EMPRESTADO', 'ATRASADO']
+    ).select_related('livro', 'leitor')
+
+def _consultas_historico_livro(livro):
+    # Os empréstimos ainda em Emprestimo e os já arquivados, na mesma ordem
+    return [
+        modelo.objects.filter(
+            livro=livro
+        ).select_related('leitor', 'funcionario').order_by('-data_emprestimo', '-id')
+        for modelo in (Emprestimo, EmprestimoArquivado)
+    ]
+
+def _resumo_historico_livro(livro, hoje=None):
+    """
+    Totais do histórico de um livro, com uma consulta em Emprestimo e outra
+    no arquivo: empréstimos, duração média dos já devolvidos (em dias) e
+    quantas vezes houve atraso (devolvido depois da data prevista ou
+    atrasado agora).
+    """
+    devolvido = Q(data_devolucao_real__isnull=False)
+    atraso = Q(data_devolucao_real__gt=F('data_devolucao_prevista')) | filtros_situacao_emprestimo(hoje)['atrasados']
+    resumo = {'total': 0, 'devolvidos': 0, 'vezes_atrasado': 0, 'duracao': datetime.timedelta()}
+    for modelo in (Emprestimo, EmprestimoArquivado):
+        # Soma e contagem em vez da média, para juntar as duas tabelas
+        parcial = modelo.objects.filter(livro=livro).aggregate(
+            total=Count('id'),
+            devolvidos=Count('id', filter=devolvido),
+            duracao=Sum(F('data_devolucao_real') - F('data_emprestimo'), filter=devolvido),
+            vezes_atrasado=Count('id', filter=atraso),
+        )
+        for chave, valor in parcial.items():
+            if valor is not None:
+                resumo[chave] += valor
+    resumo['dias_em_media'] = (
+        round(resumo['duracao'].total_seconds() / 86400 / resumo['devolvidos'], 1) if resumo['devolvidos'] else None
+    )
+    return resumo
+
+def _consulta_leitores_atrasados():
+    # Atrasados = já marcados pelo sweep_overdue + os que venceram desde a
+    # última execução (calculados pela data de devolução prevista)
+    return Emprestimo.objects.atrasados().select_related(
+        'livro', 'leitor'
+    ).order_by('leitor__nome', 'data_devolucao_prevista')
+
+@funcionario_login_required
+def relatorio_exportar(request, relatorio, formato):
+    """
+    Exporta um relatório em CSV ou XLSX, enviando as linhas em streaming
+    (memória constante, seja qual for o tamanho do relatório).
+    """
+    if formato not in ('csv', 'xlsx'):
+        raise Http404("Formato de exportação inválido.")
+
+    if relatorio == 'livros_emprestados':
+        queryset = _consulta_livros_emprestados()
+        cabecalho = ['Livro', 'Autor', 'Leitor', 'Data do Empréstimo', 'Devolução Prevista']
+        campos = ['livro__nome', 'livro__autor', 'leitor__nome', 'data_emprestimo', 'data_devolucao_prevista']
+    elif relatorio == 'leitores_atrasados':
+        queryset = _consulta_leitores_atrasados()
+        cabecalho = ['Leitor', 'Telefone do Leitor', 'Livro em Atraso', 'Devolução Prevista']
+        campos = ['leitor__nome', 'leitor__telefone', 'livro__nome', 'data_devolucao_prevista']
+    elif relatorio == 'historico_livro':
+        # O mesmo formulário da página: livro_id não numérico ou inexistente dá 404
+        form = HistoricoLivroForm(request.GET)
+        if not form.is_valid():
+            raise Http404("Livro não encontrado.")
+        livro = form.cleaned_data['livro_id']
+        queryset = _consultas_historico_livro(livro)
+        cabecalho = ['Leitor', 'Funcionário que Emprestou', 'Data do Empréstimo', 'Data da Devolução', 'Status']
+        campos = ['leitor__nome', 'funcionario__nome', 'data_emprestimo', 'data_devolucao_real', 'status']
+    else:
+        raise Http404("Relatório não encontrado.")
 
+    nome_arquivo = f"{relatorio}_{timezone.localdate():%Y%m%d}"
+    return resposta_exportacao(formato, nome_arquivo, cabecalho, queryset, campos, ordenacao=('-data_emprestimo', '-id'))
+
+
+@cache_do_acervo
 def acervo_view(request):
     """
     Exibe o acervo público de livros e permite a busca por nome ou autor.
@@ -572,16 +769,71 @@ def acervo_view(request):
     
     # Começa com todos os livros do acervo
     livros = Livro.objects.all().order_by('nome')
+    ordenacao = ('nome', 'id')
 
     if query:
-        # Se houver uma busca, filtra os livros por nome OU autor
-        livros = livros.filter(
-            Q(nome__icontains=query) | Q(autor__icontains=query)
-        )
+        # Se houver uma busca, usa o índice FTS5 (nome, autor, isbn, gênero)
+        # ordenado por relevância; sem FTS, filtra por nome OU autor
+        livros, ordenacao = buscar_livros(livros, query, campos_fallback=('nome', 'autor'))
+
+    # Exibe o acervo em páginas, navegando por cursor
+    pagina = paginar(request, livros, ordenacao)
 
     context = {
-        'livros': livros,
+        'livros': pagina.itens,
+        'pagina': pagina,
         'query': query # Envia o termo de busca de volta para o template
     }
     
-    return render(request, 'acervo.html', context)
\ No newline at end of file
+    return render(request, 'acervo.html', context)
+
+
+@cache_do_acervo
+async def acervo_async(request):
+    """
+    Versão assíncrona da acervo_view, usada no modo ASGI (BIBLIOTECA_ASGI).
+    A busca e a página são avaliadas com o ORM assíncrono, sem ocupar uma
+    thread do pool sync_to_async enquanto esperam o banco.
+    """
+    query = request.GET.get('q')
+
+    livros = Livro.objects.all()
+    ordenacao = ('nome', 'id')
+    if query:
+        livros, ordenacao = await abuscar_livros(livros, query, campos_fallback=('nome', 'autor'))
+
+    pagina = await apaginar(request, livros, ordenacao)
+
+    context = {
+        'livros': pagina.itens,
+        'pagina': pagina,
+        'query': query
+    }
+    # Os livros já foram carregados e a sessão já foi lida pelo
+    # cache_do_acervo: renderizar o template não faz consultas.
+    return render(request, 'acervo.html', context)
+
+
+def _consulta_sugestoes(livros, ordenacao):
+    return livros.order_by(*ordenacao).values('id', 'nome', 'autor')[:LIMITE_SUGESTOES]
+
+
+def acervo_sugestoes(request):
+    """
+    Sugestões (JSON) para o autocompletar da busca do acervo, pelo mesmo
+    índice de busca da página. Termos com menos de 2 letras não consultam.
+    """
+    termo = request.GET.get('q', '').strip()
+    if len(termo) < 2:
+        return JsonResponse({'resultados': []})
+    livros, ordenacao = buscar_livros(Livro.objects.all(), termo, campos_fallback=('nome', 'autor'))
+    return JsonResponse({'resultados': list(_consulta_sugestoes(livros, ordenacao))})
+
+
+async def acervo_sugestoes_async(request):
+    """Versão assíncrona de acervo_sugestoes, para o modo ASGI."""
+    termo = request.GET.get('q', '').strip()
+    if len(termo) < 2:
+        return JsonResponse({'resultados': []})
+    livros, ordenacao = await abuscar_livros(Livro.objects.all(), termo, campos_fallback=('nome', 'autor'))
+    return JsonResponse({'resultados': [livro async for livro in _consulta_sugestoes(livros, ordenacao)]})